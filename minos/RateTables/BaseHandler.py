@@ -1,8 +1,12 @@
+import hashlib
+import json
+import pickle
 import pandas as pd
 import numpy as np
-from os.path import exists
+from os.path import exists, splitext
 from os import remove
-from minos.utils import get_nearest
+from minos.utils import get_nearest, hash_file
+
 
 class BaseHandler:
     def __init__(self, configuration):
@@ -11,32 +15,70 @@ class BaseHandler:
         self.rate_table_dir = 'persistent_data/'
         self.rate_table_path = None
         self.rate_table = None
+        self.source_file = None
+
+    @property
+    def cache_path(self):
+        """ Binary (pickle) cache of the built rate table. Saved next to rate_table_path."""
+        return splitext(self.rate_table_path)[0] + '.pkl'
+
+    def cache_parameters(self):
+        """ Everything the built rate table depends on. The cache is rebuilt if any of these change.
+
+        Subclasses with other inputs (e.g. parity data for fertility) should extend this.
+        """
+        source_file = self.source_file
+        return {'rate_table': type(self).__name__,
+                'filename': self.filename,
+                'source_file': hash_file(source_file) if source_file and exists(source_file) else None,
+                'year_start': self.configuration['time']['start']['year'],
+                'year_end': self.configuration['time']['end']['year'],
+                'age_start': self.configuration.population.age_start,
+                'age_end': self.configuration.population.age_end}
+
+    def cache_key(self):
+        """ Hash of cache_parameters."""
+        parameters = json.dumps(self.cache_parameters(), sort_keys=True, default=str)
+        return hashlib.blake2b(parameters.encode(), digest_size=16).hexdigest()
 
     def set_rate_table(self):
-        if not exists(self.rate_table_path):
+        key = self.cache_key()
+        self.rate_table = self.read_cache(key)
+        if self.rate_table is None:
             self._build()
-            self.cache()
-        else:
-            print('Fetching rate table from cache {}'.format(self.rate_table_path))
-            self.rate_table = pd.read_csv(self.rate_table_path, index_col=[0])
+            self.cache(key=key, overwrite=True)
+
+    def read_cache(self, key):
+        """ Rate table from the binary cache. None if there isn't one or it was built from other inputs."""
+        if not exists(self.cache_path):
+            return None
+        with open(self.cache_path, 'rb') as cache_file:
+            cached = pickle.load(cache_file)
+        if cached.get('key') != key:
+            print('Rate table cache {} is out of date, rebuilding'.format(self.cache_path))
+            return None
+        print('Fetching rate table from cache {}'.format(self.cache_path))
+        return cached['rate_table']
 
     def set_matrix_tables(self):
         self._build()
 
-    def cache(self, overwrite=False):
-        if not exists(self.rate_table_path) or overwrite:
+    def cache(self, key=None, overwrite=False):
+        if not exists(self.cache_path) or overwrite:
             print('Caching rate table...')
-            self.rate_table.to_csv(self.rate_table_path, index=False)
-            print('Cached to {}'.format(self.rate_table_path))
+            with open(self.cache_path, 'wb') as cache_file:
+                pickle.dump({'key': key or self.cache_key(), 'rate_table': self.rate_table}, cache_file,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            print('Cached to {}'.format(self.cache_path))
         else:
-            print('File already exists at {}'.format(self.rate_table_path))
+            print('File already exists at {}'.format(self.cache_path))
 
     def clear_cache(self):
-        if exists(self.rate_table_path):
-            print('Removing {}'.format(self.rate_table_path))
-            remove(self.rate_table_path)
+        if exists(self.cache_path):
+            print('Removing {}'.format(self.cache_path))
+            remove(self.cache_path)
         else:
-            print('No file at {} found, did not remove'.format(self.rate_table_path))
+            print('No file at {} found, did not remove'.format(self.cache_path))
 
     def _build(self):
         pass
@@ -76,68 +118,47 @@ class BaseHandler:
         years = list(range(year_start, year_end))
         print("\n## years after checking:", years)
 
-        # loop over the observed values to fill the new dataframe
-        list_dic = []
-        for loc in unique_locations:
-
-            sub_loc_df = df[df['REGION.name'] == loc]
-
-            for eth in unique_ethnicity:
-
-                sub_loc_eth_df = sub_loc_df[sub_loc_df['ETH.group'] == eth]
-
-                for sex in unique_sex:
-
-                    # columns are separated for male and female rates
-                    if sex == 1:
-                        column_suffix = 'M'
-                        sex = "Male"  # TODO robs a moron. Either force numerics in rate tables or strings.
-
-                    else:
-                        column_suffix = 'F'
-                        sex = "Female"
+        # rate columns for each sex and age (eg 'M50.51' for a male between 50 and 51 yo)
+        sexes = ["Male" if sex == 1 else "Female" for sex in unique_sex]  # TODO robs a moron. Either force numerics in rate tables or strings.
+        ages = np.arange(age_start, age_end)
+        columns = [BaseHandler.rate_column('M' if sex == 1 else 'F', age) for sex in unique_sex for age in ages]
+
+        # one row of rates for each region, ethnicity and year. Combinations with more or less than one row get 0.
+        keys = ['REGION.name', 'ETH.group', 'year']
+        wide = df[~df.duplicated(keys, keep=False)].set_index(keys)[columns]
+        grid = pd.MultiIndex.from_product([unique_locations, unique_ethnicity, years], names=keys)
+        values = wide.reindex(grid).to_numpy(copy=True)
+        found = grid.isin(wide.index)
+        if not found.all():
+            print('Problem, more or less than one value in {} categories'.format((~found).sum() * len(columns)))
+        values[~found] = 0
+
+        # reshape from (region, ethnicity, year) x (sex, age) to the row order region, ethnicity, sex, age, year.
+        n_loc, n_eth, n_year, n_sex, n_age = len(unique_locations), len(unique_ethnicity), len(years), len(sexes), len(ages)
+        values = values.reshape(n_loc, n_eth, n_year, n_sex, n_age).transpose(0, 1, 3, 4, 2).ravel()
+        n_rows = values.size
+        age = np.tile(np.repeat(ages, n_year), n_loc * n_eth * n_sex)
+        year = np.tile(np.asarray(years, dtype=int), n_rows // max(n_year, 1))
+
+        return pd.DataFrame({'region': np.repeat(unique_locations, n_rows // max(n_loc, 1)),
+                             'ethnicity': np.tile(np.repeat(unique_ethnicity, n_sex * n_age * n_year), n_loc),
+                             'age_start': age,
+                             'age_end': age + 1,
+                             'sex': np.tile(np.repeat(sexes, n_age * n_year), n_loc * n_eth),
+                             'year_start': year,
+                             'year_end': year + 1,
+                             'mean_value': values})
 
-                    for age in range(age_start, age_end):
-
-                        # cater for particular cases (age less than 1 and more than 100).
-                        if age == -1:
-                            column = column_suffix + 'B.0'
-                        elif age == 100:
-                            column = column_suffix + '100.101p'
-                        else:
-                            # columns parsed to the right name (eg 'M.50.51' for a male between 50 and 51 yo)
-                            column = column_suffix + str(age) + '.' + str(age + 1)
-
-                        # HR 21/04/23 Old block not including year
-                        # if sub_loc_eth_df[column].shape[0] == 1:
-                        #     value = sub_loc_eth_df[column].values[0]
-                        # else:
-                        #     value = 0
-                        #     print('Problem, more or less than one value in this category')
-                        #
-                        # # create the rate row.
-                        # dict = {'region': loc, 'ethnicity': eth, 'age_start': age, 'age_end': age + 1, 'sex': sex,
-                        #         'year_start': year_start, 'year_end': year_end, 'mean_value': value}
-                        # list_dic.append(dict)
-
-                        # HR 21/04/23 New block to include year
-                        for year in years:
-
-                            # Get sub-dataframe for year
-                            sub_loc_eth_year_df = sub_loc_eth_df[sub_loc_eth_df['year'] == year]
-
-                            if sub_loc_eth_year_df[column].shape[0] == 1:
-                                value = sub_loc_eth_year_df[column].values[0]
-                            else:
-                                value = 0
-                                print('Problem, more or less than one value in this category')
-
-                            # create the rate row.
-                            dict = {'region': loc, 'ethnicity': eth, 'age_start': age, 'age_end': age + 1, 'sex': sex,
-                                    'year_start': year, 'year_end': year + 1, 'mean_value': value}
-                            list_dic.append(dict)
-
-        return pd.DataFrame(list_dic)
+    @staticmethod
+    def rate_column(column_suffix, age):
+        """ Name of the rate column for a sex (M or F) and age."""
+        # cater for particular cases (age less than 1 and more than 100).
+        if age == -1:
+            return column_suffix + 'B.0'
+        elif age == 100:
+            return column_suffix + '100.101p'
+        # columns parsed to the right name (eg 'M50.51' for a male between 50 and 51 yo)
+        return column_suffix + str(age) + '.' + str(age + 1)
 
     @staticmethod
     def compute_migration_rates(df_migration_numbers, df_population_total, year_start, year_end, age_start, age_end,
@@ -165,51 +186,49 @@ class BaseHandler:
         unique_locations = np.unique(df_migration_numbers['LAD.code'])
         unique_ethnicity = np.unique(df_migration_numbers['ETH.group'])
 
-        # loop over the observed values to fill the ne dataframe
-        list_dic = []
-        for loc in unique_locations:
-
-            sub_loc_df = df_migration_numbers[df_migration_numbers['LAD.code'] == loc]
-            sub_loc_df_total = df_population_total[df_population_total['LAD'] == loc]
-
-            for eth in unique_ethnicity:
-
-                sub_loc_eth_df = sub_loc_df[sub_loc_df['ETH.group'] == eth]
-                sub_loc_eth_df_total = sub_loc_df_total[
-                    (sub_loc_df_total['ETH'] == eth + "_UK") | (sub_loc_df_total['ETH'] == eth + "_NonUK")]
-
-                for sex in unique_sex:
-
-                    # columns are separated for male and female rates
-                    if sex == 1:
-                        column_suffix = 'M'
-                    else:
-                        column_suffix = 'F'
-
-                    for age in range(age_start, age_end):
-
-                        # cater for particular cases (age less than 1 and more than 100).
-                        if age == -1:
-                            column = column_suffix + 'B.0'
-                            column_total = 'B'
-                        elif age == 100:
-                            column = column_suffix + '100.101p'
-                        else:
-                            # columns parsed to the right name (eg 'M.50.51' for a male between 50 and 51 yo)
-                            column = column_suffix + str(age) + '.' + str(age + 1)
-                            column_total = column_suffix + str(age)
-
-                        if sub_loc_eth_df[column].shape[0] == 1 and sub_loc_eth_df_total[column_total].sum() != 0:
-                            if normalize:
-                                value = sub_loc_eth_df[column].values[0] / sub_loc_eth_df_total[column_total].sum()
-                            else:
-                                value = sub_loc_eth_df[column].values[0]
-                        else:
-                            value = 0
-
-                        # create the rate row.
-                        dict = {'location': loc, 'ethnicity': eth, 'age_start': age, 'age_end': age + 1, 'sex': sex,
-                                'year_start': year_start, 'year_end': year_end, 'mean_value': value}
-                        list_dic.append(dict)
-
-        return pd.DataFrame(list_dic)
+        # migration and population total columns for each sex and age.
+        ages = np.arange(age_start, age_end)
+        columns = []
+        columns_total = []
+        for sex in unique_sex:
+            column_suffix = 'M' if sex == 1 else 'F'
+            for age in ages:
+                columns.append(BaseHandler.rate_column(column_suffix, age))
+                if age == -1:
+                    columns_total.append('B')
+                elif age == 100:
+                    # there is no 100+ population column, the age 99 population is used as before.
+                    columns_total.append(column_suffix + '99')
+                else:
+                    columns_total.append(column_suffix + str(age))
+
+        # one row of migration numbers for each location and ethnicity. Population totals summed over UK and non UK
+        # born ethnic groups.
+        keys = ['LAD.code', 'ETH.group']
+        grid = pd.MultiIndex.from_product([unique_locations, unique_ethnicity], names=keys)
+        wide = df_migration_numbers[~df_migration_numbers.duplicated(keys, keep=False)].set_index(keys)[columns]
+        found = grid.isin(wide.index)
+        values = wide.reindex(grid).to_numpy(dtype=float)
+
+        population_eth = df_population_total['ETH'].str.extract(r'^(.*)_(?:UK|NonUK)$')[0]
+        total = df_population_total.groupby([df_population_total['LAD'], population_eth])[list(set(columns_total))].sum()
+        total = total.reindex(grid, fill_value=0)[columns_total].to_numpy(dtype=float)
+
+        valid = found[:, np.newaxis] & (total != 0)
+        if normalize:
+            values = np.divide(values, total, out=np.zeros_like(values), where=valid)
+        values = np.where(valid, values, 0)
+
+        # row order location, ethnicity, sex, age.
+        n_sex, n_age = len(unique_sex), len(ages)
+        values = values.ravel()
+        age = np.tile(ages, len(grid) * n_sex)
+
+        return pd.DataFrame({'location': np.repeat(unique_locations, len(unique_ethnicity) * n_sex * n_age),
+                             'ethnicity': np.tile(np.repeat(unique_ethnicity, n_sex * n_age), len(unique_locations)),
+                             'age_start': age,
+                             'age_end': age + 1,
+                             'sex': np.tile(np.repeat(unique_sex, n_age), len(grid)),
+                             'year_start': year_start,
+                             'year_end': year_end,
+                             'mean_value': values})
@@ -7,7 +7,7 @@ from os.path import dirname as up
 from os.path import exists
 from os import remove
 import numpy as np
-from minos.utils import extend_series, get_nearest
+from minos.utils import extend_series, get_nearest, hash_file
 from minos.data_generation import generate_composite_vars
 
 
@@ -330,6 +330,13 @@ class FertilityRateTable(BaseHandler):
         # print("Max. parity:", self.parity_max)
         self._parity_added = False
 
+    def cache_parameters(self):
+        # parity data and maximum parity are also used to build the table.
+        parameters = super().cache_parameters()
+        parameters['parity_max'] = self.parity_max
+        parameters['parity_file'] = hash_file(PARITY_DEFAULT) if exists(PARITY_DEFAULT) else None
+        return parameters
+
     def _build(self):
         # HR 21/04/23 Try and load from source file, otherwise create from primary data
         try:
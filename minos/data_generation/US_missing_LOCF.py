@@ -1,77 +1,83 @@
 """ File for missing data correction using last observation carried forward.
 
-Note this is quite slow to do. Lambda functions aren't terrible but this can probably be improved.
+Observations are carried within each individual's (pidp) rows. Data are sorted by pidp and time once and the
+first/last row of each individual found, so filling and interpolation run over whole columns with NumPy rather than a
+function per pidp group.
 """
 
 import pandas as pd
 import numpy as np
 import US_utils
 import US_missing_description
-from multiprocessing import Pool, cpu_count
-from functools import partial
 from scipy import interpolate
 
-def applyParallelLOCF(dfGrouped, func, **kwargs):
-    """ Apply pandas.apply() methods in parallel on groupby object.
+def segment_bounds(groups):
+    """ First and last position of the group of each row.
 
     Parameters
     ----------
-    dfGrouped : pandas.groupby
-        Groupby object in pandas sorted by pidp and interview year (time) usually.
-    func : function
-        Function to apply in parallel over groupby object
+    groups : pd.Series
+        Group of each row e.g. pidp. Rows of a group must be next to each other, e.g. after sorting by pidp and time.
     Returns
     -------
-    dfGrouped : pandas.groupby
-        Object with func applied.
+    starts, ends : np.ndarray
+        Position of the first and last row of each row's group.
     """
-    with Pool(cpu_count()) as p:
-        ret_list = p.map(partial(func, **kwargs), [group for name, group in dfGrouped])
-    return pd.concat(ret_list)
+    groups = groups.to_numpy()
+    positions = np.arange(len(groups))
+    first = np.ones(len(groups), dtype=bool)
+    first[1:] = groups[1:] != groups[:-1]
+    last = np.ones(len(groups), dtype=bool)
+    last[:-1] = first[1:]
+    starts = np.maximum.accumulate(np.where(first, positions, 0))
+    ends = np.minimum.accumulate(np.where(last, positions, len(groups))[::-1])[::-1]
+    return starts, ends
+
+def previous_valid(valid, starts):
+    """ Position of the last valid row at or before each row in the same group. -1 if there isn't one."""
+    positions = np.arange(len(valid))
+    previous = np.maximum.accumulate(np.where(valid, positions, -1))
+    return np.where(previous >= starts, previous, -1)
+
+def next_valid(valid, ends):
+    """ Position of the first valid row at or after each row in the same group. -1 if there isn't one."""
+    positions = np.arange(len(valid))
+    following = np.minimum.accumulate(np.where(valid, positions, len(valid))[::-1])[::-1]
+    return np.where(following <= ends, following, -1)
+
+def carry_observations(values, starts, ends, direction="forward"):
+    """ Replace missing values with the last (forward) or next (back) observed value of the same group.
+
+    Matches pandas replace(US_utils.missing_types, method="ffill"/"bfill") applied to each group separately. NaN
+    values count as observations. Missing values with nothing to carry take the first (forward) or last (back) value
+    of the group, which is itself missing.
 
-def ffill_groupby(pid_groupby):
-    """ forward fill groupby object
-
-    Parameters
-    ----------
-    pid_groupby : pandas.groupby
-        Pandas groupby object with data sorted by some set of variables. pidp and interview year (time) usually.
-
-    Returns
-    -------
-    pid_groupby : Object with forward filled variables.
-    """
-    return pid_groupby.apply(lambda x: x.replace(US_utils.missing_types, method="ffill"))
-
-def bfill_groupby(pid_groupby):
-    """ back fill groupby object
-
-    Parameters
-    ----------
-    pid_groupby : Pandas groupby object with data sorted by some set of variables. pidp and interview year (time) usually.
-
-    Returns
-    -------
-    pid_groupby : Object with back filled variables.
-    """
-    return pid_groupby.apply(lambda x: x.replace(US_utils.missing_types, method="bfill"))
-
-def fbfill_groupby(pid_groupby):
-    """ forward and back fill groupby object
     Parameters
     ----------
-    pid_groupby : pandas.groupby
-        Pandas groupby object with data sorted by some set of variables. pidp and interview year (time) usually.
+    values : pd.Series
+        Column sorted so each group is contiguous.
+    starts, ends : np.ndarray
+        Group bounds from segment_bounds.
+    direction : str
+        "forward" or "back".
     Returns
     -------
-    pid_groupby : Object with forward-back filled variables.
+    values : pd.Series
+        Filled column with the same index and dtype.
     """
-    return pid_groupby.apply(lambda x: x.replace(US_utils.missing_types, method="ffill").replace(US_utils.missing_types, method="bfill"))
+    missing = values.isin(US_utils.missing_types).to_numpy()
+    if direction == "forward":
+        source = previous_valid(~missing, starts)
+        source = np.where(source >= 0, source, starts)
+    else:
+        source = next_valid(~missing, ends)
+        source = np.where(source >= 0, source, ends)
+    take = np.where(missing, source, np.arange(len(values)))
+    return values.iloc[take].set_axis(values.index)
+
+def max_carry_forward(data, columns):
+    """ Forward fill the maximum observation of each pidp. The filled variables can only increase over time.
 
-def mffill_groupby(pid_groupby):
-    """
-    Forward fill the maximum observation in groupby object. The filled variable would only be able to increase over
-    time.
     Originally used for education_state, as we have the weird problem that some individuals seem to
     bounce between defined education states and lower levels (often 0).
     Subsequently also found to be an issue for number of children ever had by women (US: lnprnt, Minos: nkids_ind_raw);
@@ -79,22 +85,42 @@ def mffill_groupby(pid_groupby):
 
     Parameters
     ----------
-    pid_groupby : pandas.groupby
-        Pandas groupby object with data sorted by some set of variables. pidp and interview year (time) usually.
+    data : pd.DataFrame
+        Data sorted by pidp and time.
+    columns : list
+        Columns to fill.
     Returns
     -------
-    pid_groupby : Object with maximum observation forward filled objects
+    columns : pd.DataFrame
+        Running maximum of each column by pidp.
     """
-    return pid_groupby.apply(
-        lambda x: pd.DataFrame.cummax(x))
+    return data.groupby("pidp", sort=False)[columns].cummax()
+
+def interpolate_linear(values, starts, ends):
+    """ Linearly interpolate NaN values within each group. Rows are equally spaced.
+
+    Leading and trailing NaNs take the nearest observation of the group, as pandas interpolate(method="linear",
+    limit_direction="both") does. Groups with no observations stay NaN.
+    """
+    valid = ~np.isnan(values)
+    previous = previous_valid(valid, starts)
+    following = next_valid(valid, ends)
+    positions = np.arange(len(values))
+    result = values.copy()
+    between = ~valid & (previous >= 0) & (following >= 0)
+    weight = (positions[between] - previous[between]) / (following[between] - previous[between])
+    result[between] = values[previous[between]] + weight * (values[following[between]] - values[previous[between]])
+    after = ~valid & (previous >= 0) & (following < 0)
+    result[after] = values[previous[after]]
+    before = ~valid & (previous < 0) & (following >= 0)
+    result[before] = values[following[before]]
+    return result
 
 def interpolate(data, interpolate_columns, type='linear'):
     """ Interpolate column based on year time index.
 
-    groupby on pidp
-    sort by time year
-    set index to time year.
-    interpolate linearly using time index.
+    sort by pidp and time year
+    interpolate linearly within each pidp.
     reset index.
     return column.
 
@@ -105,9 +131,15 @@ def interpolate(data, interpolate_columns, type='linear'):
     type : str
         Type of interpolation specified by pandas.interpolate. Defaults to linear but others are available and may be useful.
     """
-    #return pid_groupby.apply(lambda x: x.replace(US_utils.missing_types, method="ffill").replace(US_utils.missing_types, method="bfill"))
-    data = data.sort_values(by=["pidp", "time"])
-    data[interpolate_columns] = data[interpolate_columns].replace(US_utils.missing_types, np.nan)
+    data = data.sort_values(by=["pidp", "time"]).reset_index(drop=True)
+    data[interpolate_columns] = data[interpolate_columns].mask(data[interpolate_columns].isin(US_utils.missing_types))
+    if type == 'linear':
+        starts, ends = segment_bounds(data["pidp"])
+        for column in interpolate_columns:
+            data[column] = interpolate_linear(data[column].to_numpy(dtype=float), starts, ends)
+        return data
+
+    # other pandas interpolation methods by pidp. slower.
     data.index = data['time']
     data_groupby = data.groupby('pidp', sort=False, as_index=False)
     new_columns = data_groupby[interpolate_columns].apply(lambda x: x.interpolate(method=type, limit_direction='both', axis=0))
@@ -201,36 +233,32 @@ def locf(data, f_columns = None, b_columns = None, fb_columns = None, mf_columns
         The data frame with missing data correction done by observation carrying.
 
     """
-    print("Starting locf. Grab a coffee..")
+    print("Starting locf.")
     # sort values by pidp and time. Need chronological order for carrying to make sense.
-    # Also allows for easy replacing of filled data later.
-    data = data.sort_values(by=["pidp", "time"])
+    data = data.sort_values(by=["pidp", "time"]).reset_index(drop=True)
 
-    # Group data into individuals to fill in separately.
-    # Acts as a for loop to fill items by each individual. If you dont this it will try and fill the whole dataframe
-    # at once.
-    pid_groupby = data.groupby(by=["pidp"], sort=False, as_index=False)
+    # Each individual is filled separately. Rather than grouping, find where each individual's rows start and end
+    # once and carry observations within those bounds over whole columns.
+    starts, ends = segment_bounds(data["pidp"])
 
-    print("groupby done. interpolating..")
     # Fill missing data by individual for given carrying type. Forwards, backwards, or forward then backwards.
     # See pandas ffill and bfill functions for more details.
     if f_columns:
         # Forward fill.
-        fill = applyParallelLOCF(pid_groupby[f_columns], ffill_groupby)
-        data[f_columns] = fill[f_columns]
+        for column in f_columns:
+            data[column] = carry_observations(data[column], starts, ends, "forward")
     if b_columns:
         # backward fill. only use this on IMMUTABLE attributes.
-        fill = applyParallelLOCF(pid_groupby[b_columns], bfill_groupby)
-        data[b_columns] = fill[b_columns]
+        for column in b_columns:
+            data[column] = carry_observations(data[column], starts, ends, "back")
     if fb_columns:
         # forwards and backwards fill. again immutables only.
-        fill = applyParallelLOCF(pid_groupby[fb_columns], fbfill_groupby)
-        data[fb_columns] = fill[fb_columns]
+        for column in fb_columns:
+            data[column] = carry_observations(data[column], starts, ends, "forward")
+            data[column] = carry_observations(data[column], starts, ends, "back")
     if mf_columns:
         # Forward fill monotonic
-        fill = applyParallelLOCF(pid_groupby[mf_columns], mffill_groupby)
-        data[mf_columns] = fill[mf_columns]
-    data = data.reset_index(drop=True) # groupby messes with the index. make them unique again.
+        data[mf_columns] = max_carry_forward(data, mf_columns)
     return data
 
 def main(data, save=False):
@@ -1,46 +1,278 @@
 """File for hotdecking US data. Aims to provide a complete dataset for microsimulaton rather than for calibrating transitions
+
+KNN hot-decking (hotdeck_knn) replaces each missing value with the observed value of a similar person (a donor).
+Donors are restricted to the recipient's cell of sex, region and age band. Within a cell the nearest donors on the
+numeric match columns are found with a KD tree and one of the n_neighbors nearest is picked at random, so imputed
+values keep the spread of the observed data rather than shrinking to a mean. Recipients are queried in chunks so memory
+is bounded by chunk_size * n_neighbors rather than growing with the square of the wave size (as KNNImputer does) and
+cells are imputed across a process pool. Recipients whose cell has too few donors are imputed from coarser cells
+(dropping age band, then region, ...).
+
+compare_imputation masks known values and compares runtime and accuracy of mean, LOCF and KNN hot-decking.
+
+Example
+-------
+python minos/data_generation/US_missing_hotdecking.py --columns job_sec SF_12 --workers 8
+python minos/data_generation/US_missing_hotdecking.py --columns job_sec SF_12 --benchmark
 """
 
+import argparse
+from multiprocessing import Pool
+from time import perf_counter
+
 import pandas as pd
 import US_utils
 import numpy as np
-from sklearn.impute import KNNImputer
-import sklearn
+from scipy.spatial import cKDTree
 import US_missing_description
+import US_missing_LOCF
+
+# Donor cells from finest to coarsest. age_band is added from age by hotdeck_knn.
+CELL_COLUMNS = ['sex', 'region', 'age_band']
+
+
+def is_missing(values):
+    """ Missing values of a column. NaN or any of US_utils.missing_types."""
+    return (values.isna() | values.isin(US_utils.missing_types)).to_numpy()
+
 
 def hotdeck_mean(data, columns, types):
     """Mean hotdecking replaces missing values with column means"""
 
     for i, c in enumerate(columns):
-        mean = data.loc[~data[c].isin(US_utils.missing_types)][c].mean()
+        missing = is_missing(data[c])
+        mean = data.loc[~missing, c].mean()
         if types[i] == 'int':
             mean = int(mean)
-        data.loc[data[c].isin(US_utils.missing_types)][c] = mean
+        data.loc[missing, c] = mean
     return data
 
-def hotdeck_knn(data, columns):
+
+def match_features(data, match_columns):
+    """ Standardised match columns for nearest neighbour search. Missing values are set to the column mean (0)."""
+    features = np.zeros((len(data), len(match_columns)))
+    for i, column in enumerate(match_columns):
+        values = data[column].mask(is_missing(data[column])).astype(float)
+        std = values.std()
+        values = (values - values.mean()) / (std if std > 0 else 1)
+        features[:, i] = values.fillna(0).to_numpy()
+    return features
+
+
+def impute_cell(donor_features, donor_values, recipient_features, n_neighbors, chunk_size, seed):
+    """ Impute the recipients of one cell from its donors.
+
+    Parameters
+    ----------
+    donor_features, recipient_features : np.ndarray
+        Standardised match columns of donors and recipients.
+    donor_values : np.ndarray
+        Observed values of the imputed column for each donor.
+    n_neighbors : int
+        Number of nearest donors one is drawn from.
+    chunk_size : int
+        Number of recipients queried at once.
+    seed : np.random.SeedSequence
+        Seed for drawing donors.
+    Returns
+    -------
+    imputed : np.ndarray
+        Value of the drawn donor for each recipient. If there are no match columns donors are drawn uniformly from the
+        cell.
+    """
+    rng = np.random.default_rng(seed)
+    if donor_features.shape[1] == 0:
+        return donor_values[rng.integers(len(donor_values), size=len(recipient_features))]
+    tree = cKDTree(donor_features)
+    k = min(n_neighbors, len(donor_values))
+    imputed = np.empty(len(recipient_features), dtype=donor_values.dtype)
+    for start in range(0, len(recipient_features), chunk_size):
+        chunk = recipient_features[start:start + chunk_size]
+        _, neighbours = tree.query(chunk, k=k)
+        neighbours = np.asarray(neighbours).reshape(len(chunk), k)
+        picks = neighbours[np.arange(len(chunk)), rng.integers(k, size=len(chunk))]
+        imputed[start:start + chunk_size] = donor_values[picks]
+    return imputed
 
 
-    imp = KNNImputer(n_neighbors=5, weights="distance")
-    imp.fit_transform(data)
-    #for i, c in enumerate(columns):
-    #    col = imp.fit_transform(data[["age", c]])
-    #    data[c] = col
+def hotdeck_knn(data, columns, match_columns=('age',), cell_columns=CELL_COLUMNS, age_band_width=10, n_neighbors=5,
+                chunk_size=10000, workers=1, seed=0):
+    """ KNN hot-deck imputation within donor cells.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        US data. Missing values are NaN or any of US_utils.missing_types.
+    columns : list
+        Columns to impute.
+    match_columns : Iterable[str]
+        Numeric columns used to find the nearest donors. A column isn't used to match itself. If no match columns are
+        left donors are drawn uniformly from the recipient's cell.
+    cell_columns : list
+        Columns donors must share with the recipient, finest cell last. age_band is age // age_band_width.
+    age_band_width : int
+        Width in years of the age bands.
+    n_neighbors : int
+        Number of nearest donors one is drawn from. Cells need at least this many donors, except the coarsest
+        (whole data) cell.
+    chunk_size : int
+        Number of recipients queried at once.
+    workers : int
+        Number of processes. 1 imputes in this process.
+    seed : int
+        Seed for drawing donors. Results don't depend on the number of workers.
+    Returns
+    -------
+    data : pd.DataFrame
+        data with missing values of columns imputed where there were any donors.
+    """
+    cells = data[[column for column in cell_columns if column != 'age_band']].copy()
+    if 'age_band' in cell_columns:
+        age = data['age'].mask(is_missing(data['age'])).astype(float)
+        cells['age_band'] = age // age_band_width
+    cells = cells[list(cell_columns)]
+
+    tasks = []
+    targets = []
+    for i, column in enumerate(columns):
+        missing = is_missing(data[column])
+        if not missing.any() or missing.all():
+            continue
+        features = match_features(data, [match for match in match_columns if match != column])
+        values = data[column].to_numpy()
+        remaining = missing.copy()
+        # finest cells first. recipients without enough donors in their cell fall back to coarser cells.
+        for level in range(len(cell_columns), -1, -1):
+            if level > 0:
+                cell_id = cells.groupby(list(cell_columns[:level]), sort=False).ngroup().to_numpy()
+            else:
+                cell_id = np.zeros(len(data), dtype=int)
+            donors = np.flatnonzero(~missing & (cell_id >= 0))
+            donor_cells = pd.Series(donors).groupby(cell_id[donors]).indices
+            recipients = np.flatnonzero(remaining & (cell_id >= 0))
+            recipient_cells = pd.Series(recipients).groupby(cell_id[recipients]).indices
+            for cell, positions in recipient_cells.items():
+                cell_donors = donors[donor_cells[cell]] if cell in donor_cells else donors[:0]
+                if len(cell_donors) < (n_neighbors if level > 0 else 1):
+                    continue
+                cell_recipients = recipients[positions]
+                tasks.append((features[cell_donors], values[cell_donors], features[cell_recipients], n_neighbors,
+                              chunk_size, np.random.SeedSequence([seed, i, level, int(cell)])))
+                targets.append((column, cell_recipients))
+                remaining[cell_recipients] = False
+            if not remaining.any():
+                break
+
+    if workers > 1:
+        with Pool(workers) as pool:
+            results = pool.starmap(impute_cell, tasks)
+    else:
+        results = [impute_cell(*task) for task in tasks]
+
+    for column in columns:
+        column_results = [(recipients, imputed) for (target, recipients), imputed in zip(targets, results)
+                          if target == column]
+        if not column_results:
+            continue
+        values = data[column].to_numpy(copy=True)
+        for recipients, imputed in column_results:
+            values[recipients] = imputed
+        data[column] = values
     return data
 
+
+def compare_imputation(data, columns, mask_fraction=0.1, seed=0, **knn_kwargs):
+    """ Compare mean, LOCF and KNN hot-deck imputation on values known to be correct.
+
+    A fraction of the observed values of each column are set missing and imputed by each method. LOCF carries the
+    individual's observations forwards then backwards so it needs data for several waves.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        US data for one or more waves with pidp and time.
+    columns : list
+        Numeric columns to impute.
+    mask_fraction : float
+        Fraction of observed values set missing.
+    seed : int
+        Seed for choosing values to mask.
+    knn_kwargs
+        Arguments for hotdeck_knn.
+    Returns
+    -------
+    results : pd.DataFrame
+        For each method and column the runtime (whole method), share of masked values imputed, root mean squared
+        error, share imputed exactly and ratio of imputed to true standard deviation.
+    """
+    rng = np.random.default_rng(seed)
+    data = data.sort_values(by=["pidp", "time"]).reset_index(drop=True)
+    truth = {}
+    masked_data = data.copy()
+    for column in columns:
+        observed = np.flatnonzero(~is_missing(data[column]))
+        masked = rng.choice(observed, size=int(len(observed) * mask_fraction), replace=False)
+        truth[column] = (masked, data[column].to_numpy()[masked].astype(float))
+        masked_data.loc[masked, column] = -9
+
+    types = ['int' if np.allclose(values, np.round(values)) else 'float' for _, values in truth.values()]
+    methods = {'mean': lambda frame: hotdeck_mean(frame, columns, types),
+               'locf': lambda frame: US_missing_LOCF.locf(frame, fb_columns=columns),
+               'knn': lambda frame: hotdeck_knn(frame, columns, **knn_kwargs)}
+    results = []
+    for method, function in methods.items():
+        start = perf_counter()
+        imputed = function(masked_data.copy())
+        runtime = perf_counter() - start
+        for column in columns:
+            masked, true_values = truth[column]
+            values = pd.Series(imputed[column].to_numpy()[masked])
+            found = ~is_missing(values)
+            values = values[found].astype(float).to_numpy()
+            true_found = true_values[found]
+            results.append({'method': method,
+                            'column': column,
+                            'runtime': runtime,
+                            'imputed': found.mean(),
+                            'rmse': np.sqrt(np.mean((values - true_found) ** 2)) if len(values) else np.nan,
+                            'exact': np.mean(values == true_found) if len(values) else np.nan,
+                            'std_ratio': values.std() / true_found.std() if len(values) > 1 else np.nan})
+    return pd.DataFrame(results)
+
+
 if __name__ == "__main__":
-    years = [2010]  # np.arange(2008,2019)
+    parser = argparse.ArgumentParser(description="KNN hot-deck imputation of Understanding Society data.")
+    parser.add_argument("-y", "--years", nargs='+', type=int, default=[2010],
+                        help="Years of data/corrected_US to impute.")
+    parser.add_argument("-c", "--columns", nargs='+', default=["job_sec", "SF_12"],
+                        help="Columns to impute.")
+    parser.add_argument("-m", "--match_columns", nargs='+', default=["age", "job_sec", "SF_12"],
+                        help="Numeric columns used to find the nearest donors.")
+    parser.add_argument("-k", "--n_neighbors", type=int, default=5,
+                        help="Number of nearest donors one is drawn from.")
+    parser.add_argument("--chunk_size", type=int, default=10000,
+                        help="Number of recipients queried at once.")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Number of processes.")
+    parser.add_argument("-b", "--benchmark", action='store_true',
+                        help="Compare mean, LOCF and KNN imputation on masked known values instead of imputing.")
+    args = parser.parse_args()
+
+    years = args.years
     file_names = [f"data/corrected_US/{item}_US_cohort.csv" for item in years]
 
     data = US_utils.load_multiple_data(file_names)
     int_columns = ['pidp', 'hidp', 'job_sec', "fridge_freezer", "washing_machine", "tumble_dryer", "dishwasher", "microwave", "heating", "job_duration_m", "job_duration_y", "birth_month"]
     data[int_columns] = data[int_columns].astype(int)
 
-
-    before = US_missing_description.missingness_table(data)
-    data = data.replace(US_utils.missing_types, np.nan)
-    #print(before)
-    print(before.loc["Col Sums"]/len(data))
-    #data = hotdeck_mean(data, ["age", "job_sec"], ['float', 'int'])
-    data = hotdeck_knn(data, ["age", "job_sec"])
-    US_utils.save_multiple_files(data, years, 'data/hotdecking_US/', "")
+    knn_kwargs = {'match_columns': args.match_columns,
+                  'n_neighbors': args.n_neighbors,
+                  'chunk_size': args.chunk_size,
+                  'workers': args.workers}
+    if args.benchmark:
+        print(compare_imputation(data, args.columns, **knn_kwargs))
+    else:
+        before = US_missing_description.missingness_table(data)
+        print(before.loc["Col Sums"]/len(data))
+        data = hotdeck_knn(data, args.columns, **knn_kwargs)
+        US_utils.save_multiple_files(data, years, 'data/hotdecking_US/', "")
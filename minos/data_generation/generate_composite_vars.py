@@ -9,9 +9,9 @@ these functions entirely into R. Some variables are imputed then combined and vi
 
 import pandas as pd
 import numpy as np
-import sys
 
 from minos.data_generation import US_utils
+from minos import equivalent_income
 # import US_missing_description as USmd
 
 # suppressing a warning that isn't a problem
@@ -819,93 +819,10 @@ def calculate_equivalent_income(data):
     #   EquivalentIncome = Income*EXP(X)
     # Each weighting applies to the level
 
-    # First set up dictionaries for each variable to hold its factor weights
-    phys_health_dict = {
-        5: 0,
-        4: -0.116/1.282,
-        3: -0.135/1.282,
-        2: -0.479/1.282,
-        1: -0.837/1.282,
-        -9: -1,
-        -8: -1,
-        -7: -1,
-        -1: -1,
-        -2: -1,
-        -10: -1
-    }
-    men_health_dict = {
-        5: 0,
-        4: -0.14/1.282,
-        3: -0.215/1.282,
-        2: -0.656/1.282,
-        1: -0.877/1.282,
-        -9: -1,
-        -8: -1,
-        -7: -1,
-        -1: -1,
-        -2: -1,
-        -10: -1
-    }
-    loneliness_dict = {
-        1: 0,
-        2: -0.186/1.282,
-        3: -0.591/1.282,
-        -9: -1,
-        -8: -1,
-        -7: -1,
-        -1: -1,
-        -2: -1,
-        -10: -1
-    }
-    employment_dict = {
-        'FT Employed': 0,
-        'PT Employed': 0.033/1.282,
-        'Job Seeking': -0.283/1.282,
-        'FT Education': -0.184/1.282,
-        'Family Care': -0.755/1.282,
-        'Not Working': -0.221/1.282,
-        -9: -1,
-        -8: -1,
-        -7: -1,
-        -1: -1,
-        -2: -1,
-        -10: -1
-    }
-    housing_dict = {
-        'Yes to all': 0,
-        'Yes to some': -0.235/1.282,
-        'No to all': -0.696/1.282,
-        '-9': -1,
-        '-8': -1,
-        '-7': -1,
-        '-1': -1,
-        '-2': -1,
-        '-10': -1
-    }
-    nh_safety_dict = {
-        'Hardly ever': 0,
-        'Some of the time': -0.291/1.282,
-        'Often': -0.599/1.282,
-        '-9': -1,
-        '-8': -1,
-        '-7': -1,
-        '-1': -1,
-        '-2': -1,
-        '-10': -1
-    }
-
-    # Now we add together weights for each factor level to generate the exponent term
-    data['EI_exp_term'] = 0
-    #pop['EI_exp_term'] = pop['EI_exp_term'] + phys_health_dict.get(pop['S7_physical_health'])
-    data['EI_exp_term'] = data['EI_exp_term'] + data.apply(lambda x: phys_health_dict[x['S7_physical_health']], axis=1)
-    data['EI_exp_term'] = data['EI_exp_term'] + data.apply(lambda x: men_health_dict[x['S7_mental_health']], axis=1)
-    data['EI_exp_term'] = data['EI_exp_term'] + data.apply(lambda x: loneliness_dict[x['loneliness']], axis=1)
-    data['EI_exp_term'] = data['EI_exp_term'] + data.apply(lambda x: employment_dict[x['S7_labour_state']], axis=1)
-    data['EI_exp_term'] = data['EI_exp_term'] + data.apply(lambda x: housing_dict[x['S7_housing_quality']], axis=1)
-    data['EI_exp_term'] = data['EI_exp_term'] + data.apply(lambda x: nh_safety_dict[x['S7_neighbourhood_safety']], axis=1)
-
-    # finally do the calculation for equivalent income (EI = income^EI_exp_term)
-    data['equivalent_income'] = data['hh_income'] * np.exp(data['EI_exp_term'])
+    # The weights for each level of each variable are in minos.equivalent_income, shared with the
+    # S7EquivalentIncome module. Missing value codes are given a weight here and replaced with -9 below.
+    data['equivalent_income'] = equivalent_income.calculate_equivalent_income(
+        data, weights=equivalent_income.EQUIVALENT_INCOME_WITH_MISSING)
 
     # If any of the variables involved are missing, then can't do calculation for equivalent income
     # These people will be removed in complete_case anyway so not having a value here won't matter
@@ -918,10 +835,6 @@ def calculate_equivalent_income(data):
     data['equivalent_income'][(data[var_list_num] < 0).any(axis=1)] = -9
     data['equivalent_income'][(data[var_list_str].isin(['-1', '-2', '-7', '-8', '-9', '-10'])).any(axis=1)] = -9
 
-    data.drop(labels=['EI_exp_term'],
-              axis=1,
-              inplace=True)
-
     return data
 
 
@@ -933,6 +846,8 @@ def calculate_children(data,
     ----------
     data : pd.DataFrame
         A DataFrame containing corrected Understanding Society data
+    parity_max : int
+        Maximum number of children. Women with more are set to parity_max.
     Returns
     -------
     data : pd.DataFrame
@@ -950,22 +865,18 @@ def calculate_children(data,
     # Initialise new column
     data['nkids_ind'] = data['nkids_ind_raw']
 
-    pl = str(len(pidps))
-    for i,pidp in enumerate(pidps):
-        sys.stdout.write("\rProcessing pidp " + str(i+1) + " of " + pl + " (females only)")
-        subframe = data[data['pidp'] == pidp][['pidp', 'nkids_ind_raw', 'nkids_ind_new', 'time']]
-        # Calculate number of children if:
-        # 1. Any pregnancies present (i.e. nkids_ind_new == 2)
-        # 2. There are no negative values in nkids_ind_raw (indicating invalid values)
-        if (2 in subframe['nkids_ind_new'].values) and not (subframe['nkids_ind_raw'].lt(0).any()):
-            # Increment values according to cumulative sum
-            # Note specific method avoids Pandas SettingWithCopyWarning
-            # See here: https://stackoverflow.com/questions/20625582/how-to-deal-with-settingwithcopywarning-in-pandas
-            data.loc[subframe.index, 'nkids_ind'] = subframe['nkids_ind_raw'] + (subframe['nkids_ind_new'] == 2).astype(int).cumsum()
-            # print(data[['time', 'pidp', 'nkids_ind_raw', 'nkids_ind_new', 'nkids_ind']].loc[subframe.index])
-        # elif (subframe['nkids_ind_raw'].lt(0).any()):
-        #     print(data[['time', 'pidp', 'nkids_ind_raw', 'nkids_ind_new', 'nkids_ind']].loc[subframe.index])
-    print("")
+    # All rows of any pidp with a female row, kept in data order so the cumulative sums run in wave order.
+    rows = data.loc[data['pidp'].isin(pidps), ['pidp', 'nkids_ind_raw', 'nkids_ind_new']]
+    births = (rows['nkids_ind_new'] == 2).astype(int)
+    births_by_pidp = births.groupby(rows['pidp'], sort=False)
+    # Calculate number of children if:
+    # 1. Any pregnancies present (i.e. nkids_ind_new == 2)
+    # 2. There are no negative values in nkids_ind_raw (indicating invalid values)
+    any_births = births_by_pidp.transform('max') > 0
+    any_invalid = rows['nkids_ind_raw'].lt(0).groupby(rows['pidp'], sort=False).transform('any')
+    update = any_births & ~any_invalid
+    # Increment values according to cumulative sum of pregnancies for each pidp
+    data.loc[update[update].index, 'nkids_ind'] = (rows['nkids_ind_raw'] + births_by_pidp.cumsum())[update]
 
     # Reset any women with more than nmax children to nmax
     data.loc[(data['nkids_ind'] > parity_max) & (data['sex'] == "Female"), 'nkids_ind'] = parity_max
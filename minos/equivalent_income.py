@@ -0,0 +1,166 @@
+"""
+Equivalent income from household income and the SIPHER 7 domains.
+
+Equivalent income adjusts disposable household income by a weight for the level of each SIPHER 7 variable:
+
+    equivalent_income = hh_income * exp(sum of level weights)
+
+The weights used to be held in dictionaries copied into both data generation (calculate_equivalent_income) and the
+simulation (S7EquivalentIncome) and looked up one row at a time with DataFrame.apply. CategoricalWeights holds them
+once as an array of weights per column. Each column is mapped to positions in its array of levels and the weights are
+summed with NumPy, so both callers share the same formula and it runs over millions of rows at once.
+
+Example
+-------
+pop['equivalent_income'] = calculate_equivalent_income(pop)
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import CategoricalDtype
+
+# Weight of each level of each SIPHER 7 variable in the equivalent income exponent.
+EQUIVALENT_INCOME_WEIGHTS = {
+    'S7_physical_health': {5: 0,
+                           4: -0.116/1.282,
+                           3: -0.135/1.282,
+                           2: -0.479/1.282,
+                           1: -0.837/1.282},
+    'S7_mental_health': {5: 0,
+                         4: -0.14/1.282,
+                         3: -0.215/1.282,
+                         2: -0.656/1.282,
+                         1: -0.877/1.282},
+    'loneliness': {1: 0,
+                   2: -0.186/1.282,
+                   3: -0.591/1.282},
+    'S7_labour_state': {'FT Employed': 0,
+                        'PT Employed': 0.033/1.282,
+                        'Job Seeking': -0.283/1.282,
+                        'FT Education': -0.184/1.282,
+                        'Family Care': -0.755/1.282,
+                        'Not Working': -0.221/1.282},
+    'S7_housing_quality': {'Yes to all': 0,
+                           'Yes to some': -0.235/1.282,
+                           'No to all': -0.696/1.282},
+    'S7_neighbourhood_safety': {'Hardly ever': 0,
+                                'Some of the time': -0.291/1.282,
+                                'Often': -0.599/1.282},
+}
+
+# Understanding Society missing value codes. Depending on the column they are read as ints or strings.
+MISSING_CODES = [-1, -2, -7, -8, -9, -10]
+
+
+class CategoricalWeights:
+    """ Weights for the levels of categorical columns summed into one score per row.
+
+    Attributes
+    ----------
+    levels : dict
+        Column name to a pd.Index of its levels.
+    weights : dict
+        Column name to an array of the weight of each level, in the same order as levels.
+    """
+
+    def __init__(self, weights, default_levels=None):
+        """
+        Parameters
+        ----------
+        weights : dict
+            Column name to a dict of level to weight.
+        default_levels : dict
+            Level to weight added to every column that doesn't already have that level e.g. missing value codes.
+        """
+        self.levels = {}
+        self.weights = {}
+        for column, column_weights in weights.items():
+            column_weights = dict(column_weights)
+            for level, weight in (default_levels or {}).items():
+                column_weights.setdefault(level, weight)
+            self.levels[column] = pd.Index(list(column_weights.keys()), dtype=object)
+            self.weights[column] = np.array(list(column_weights.values()), dtype=float)
+
+    @property
+    def columns(self):
+        return list(self.levels.keys())
+
+    def _positions(self, column, values):
+        """ Position of each value of column in its levels. -1 for unknown values."""
+        # look up each distinct value once and index by the value codes. Missing values have code -1.
+        if isinstance(values.dtype, CategoricalDtype):
+            codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values.to_numpy())
+        unique_positions = self.levels[column].get_indexer(pd.Index(np.asarray(uniques), dtype=object))
+        return np.where(codes < 0, -1, unique_positions[codes])
+
+    def lookup(self, column, values):
+        """ Weight of each value of one column.
+
+        Parameters
+        ----------
+        column : str
+            Column the weights are for.
+        values : pd.Series
+            Values of the column.
+        Returns
+        -------
+        weights : np.ndarray
+            Weight of each value.
+        Raises
+        ------
+        ValueError
+            If a value isn't a level of the column.
+        """
+        positions = self._positions(column, values)
+        if (positions < 0).any():
+            unknown = list(pd.unique(values.to_numpy()[positions < 0])[:5])
+            raise ValueError(f"Values {unknown} of {column} have no weight. Known levels are {list(self.levels[column])}.")
+        return self.weights[column][positions]
+
+    def score(self, data):
+        """ Sum of the weights of every column for each row.
+
+        Parameters
+        ----------
+        data : pd.DataFrame
+            Frame with every weighted column.
+        Returns
+        -------
+        score : pd.Series
+            Summed weights indexed like data.
+        """
+        score = np.zeros(len(data))
+        for column in self.columns:
+            score += self.lookup(column, data[column])
+        return pd.Series(score, index=data.index)
+
+
+EQUIVALENT_INCOME = CategoricalWeights(EQUIVALENT_INCOME_WEIGHTS)
+# Data generation runs before complete case/imputation so missing codes are still present. They are given a weight of
+# -1 and their equivalent income is replaced by a missing code afterwards.
+EQUIVALENT_INCOME_WITH_MISSING = CategoricalWeights(EQUIVALENT_INCOME_WEIGHTS,
+                                                    default_levels={level: -1 for code in MISSING_CODES
+                                                                    for level in (code, str(code))})
+
+
+def calculate_equivalent_income(data, weights=EQUIVALENT_INCOME, income_column='hh_income'):
+    """ Equivalent income of each row.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Household income and the SIPHER 7 variables.
+    weights : CategoricalWeights
+        Level weights. EQUIVALENT_INCOME_WITH_MISSING also accepts missing value codes.
+    income_column : str
+        Column of disposable household income.
+    Returns
+    -------
+    equivalent_income : pd.Series
+        income * exp(summed level weights) indexed like data.
+    """
+    equivalent_income = data[income_column] * np.exp(weights.score(data))
+    equivalent_income.name = 'equivalent_income'
+    return equivalent_income
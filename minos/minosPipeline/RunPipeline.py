@@ -2,12 +2,18 @@
 """Script for initiating and running an Minos microsimulation."""
 import logging
 import os
+from copy import deepcopy
 from pathlib import Path
 from rpy2.robjects.packages import importr
 
 from vivarium import InteractiveContext
 
 import minos.utils as utils
+from minos.modules.r_utils import TransitionModelCache
+from minos.modules.household_index import HouseholdIndex
+from minos.modules.population_context import PopulationContext
+from minos.modules.population_schema import PopulationSchema, log_memory_usage
+from minos.modules.profiling import TimeStepProfiler
 
 from minos.modules.ageing import Ageing
 from minos.modules.mortality import Mortality
@@ -204,34 +210,61 @@ def type_check(data):
     return data
 
 
-def RunPipeline(config, intervention=None):
-    """ Run the daedalus Microsimulation pipeline
+def get_rpy2_modules():
+    """ Import the R packages used by the transition models. Only imported once per process, so batch runs (and forked
+    batch workers) share them."""
+    global RPY2_MODULES
+    if RPY2_MODULES is None:
+        RPY2_MODULES = {"base": importr('base'),
+                        "stats": importr('stats'),
+                        "nnet": importr("nnet"),
+                        "ordinal": importr('ordinal'),
+                        "zeroinfl": importr("pscl"),
+                        "bestNormalize": importr("bestNormalize"),
+                        "VGAM": importr("VGAM"),
+                        "lme4": importr("lme4"),
+                        "randomForest": importr("randomForest")
+                        }
+    return RPY2_MODULES
 
-   Parameters
+
+RPY2_MODULES = None
+
+
+def setup_simulation(config, intervention=None, transition_model_cache=None):
+    """ Build the vivarium simulation for a config and run the pre_setup and setup methods of every module.
+
+    Parameters
     ----------
     config : ConfigTree
         Config file to run the pipeline
-    run_output_dir : String
-        Directory
+    intervention : str
+        (Optional) Name of intervention component to add.
+    transition_model_cache : TransitionModelCache
+        (Optional) Cache of loaded transition models. Pass the same cache to repeated runs so models are only read once.
     Returns
     --------
-     A dataframe with the resulting simulation
+    simulation : vivarium.InteractiveContext
+        Simulation ready to run.
+    transition_model_cache : TransitionModelCache
+        Cache of transition models used by the simulation.
     """
     # Check modules are valid and convert to modules
     components_raw = config['components']
-    if intervention is not None:
+    if intervention is not None and intervention not in components_raw:
         #components_raw += intervention
         components_raw.append(intervention)
 
     component_priority_map, component_name_map = get_priorities()
-    components = [component_name_map[c] for c in components_raw if c in component_name_map]
-    components_invalid = [component_name_map[c] for c in components_raw if c not in component_name_map]
+    components_valid = [c for c in components_raw if c in component_name_map]
+    components_invalid = [c for c in components_raw if c not in component_name_map]
+    # Copy the component instances so repeated runs in one process (batch mode) each get freshly initialised modules.
+    components = [deepcopy(component_name_map[c]) for c in components_valid]
 
     print("Components below were not recognised and were removed from simulation:\n", components_invalid)
     print("Priorities for components are below; change in components map if incorrect:")
-    map_rev = {v: k for k, v in component_name_map.items()}
-    for c in components:
-        print(c, component_priority_map[map_rev[c]])
+    for name, c in zip(components_valid, components):
+        print(c, component_priority_map[name])
 
     # Initiate vivarium simulation object but DO NOT setup yet.
     simulation = InteractiveContext(components=components,
@@ -251,18 +284,24 @@ def RunPipeline(config, intervention=None):
     # simulation.component_priority_map = component_priority_map
     simulation._data.write("component_priority_map", component_priority_map)
 
-    rpy2_modules = {"base": importr('base'),
-                    "stats": importr('stats'),
-                    "nnet": importr("nnet"),
-                    "ordinal": importr('ordinal'),
-                    "zeroinfl": importr("pscl"),
-                    "bestNormalize": importr("bestNormalize"),
-                    "VGAM": importr("VGAM"),
-                    "lme4": importr("lme4"),
-                    "randomForest": importr("randomForest")
-                    }
     simulation._data.write("rpy2_modules",
-                           rpy2_modules)
+                           get_rpy2_modules())
+
+    # Shared cache of loaded transition models so each model is only read from disk once per run (or batch of runs).
+    if transition_model_cache is None:
+        cache_size = config.transition_model_cache_size if 'transition_model_cache_size' in config.keys() else 32
+        transition_model_cache = TransitionModelCache(maxsize=cache_size)
+    simulation._data.write("transition_model_cache", transition_model_cache)
+    # Household membership index. Filled when the population is loaded and kept up to date by the modules.
+    simulation._data.write("household_index", HouseholdIndex())
+    # Alive mask shared by the modules. Maintained by Mortality.
+    simulation._data.write("population_context", PopulationContext())
+    # Optional compact dtypes for the population frame. Categories are fitted when the population is loaded.
+    schema = PopulationSchema() if 'compact_dtypes' in config.keys() and config.compact_dtypes else None
+    simulation._data.write("population_schema", schema)
+    # Optional per module time step profiling.
+    profiler = TimeStepProfiler() if 'profile' in config.keys() and config.profile else None
+    simulation._data.write("time_step_profiler", profiler)
 
     logging.info("Components included:")
     # Run pre-setup method for each module.
@@ -280,6 +319,26 @@ def RunPipeline(config, intervention=None):
     # Run setup method for each module.
     simulation.setup()
 
+    return simulation, transition_model_cache
+
+
+def RunPipeline(config, intervention=None, transition_model_cache=None):
+    """ Run the daedalus Microsimulation pipeline
+
+   Parameters
+    ----------
+    config : ConfigTree
+        Config file to run the pipeline
+    run_output_dir : String
+        Directory
+    transition_model_cache : TransitionModelCache
+        (Optional) Cache of loaded transition models. Pass the same cache to repeated runs so models are only read once.
+    Returns
+    --------
+     A dataframe with the resulting simulation
+    """
+    simulation, transition_model_cache = setup_simulation(config, intervention, transition_model_cache)
+
     # Print time when modules are setup and the simulation starts.
     config_time = utils.get_time()
     print(f'Simulation loop start at {config_time}')
@@ -287,6 +346,8 @@ def RunPipeline(config, intervention=None):
     ###
     # Save population BEFORE start of the simulation. This is for comparisons and change from baseline
     pop = simulation.get_population()
+    if simulation._data.load("population_schema") is not None:
+        log_memory_usage(pop)
     pop = utils.get_age_bucket(pop)
 
     # Force type casting for certain problem variables
@@ -295,7 +356,7 @@ def RunPipeline(config, intervention=None):
     # File name and save
     output_data_filename = get_output_data_filename(config)
     output_file_path = os.path.join(config.run_output_dir, output_data_filename)
-    pop.to_csv(output_file_path)
+    output_file_path = utils.write_population(pop, output_file_path, get_output_format(config))
     print("Saved initial data to: ", output_file_path)
     logging.info(f"Saved initial data to: {output_file_path}")
 
@@ -323,10 +384,19 @@ def RunPipeline(config, intervention=None):
         output_data_filename = get_output_data_filename(config, year)
 
         output_file_path = os.path.join(config.run_output_dir, output_data_filename)
-        pop.to_csv(output_file_path)
+        output_file_path = utils.write_population(pop, output_file_path, get_output_format(config))
         print("Saved data to: ", output_file_path)
         logging.info(f"Saved data to: {output_file_path}")
 
+        # Save the time step profile so far (profile: True in the config).
+        profiler = simulation._data.load("time_step_profiler")
+        if profiler is not None:
+            profile_name = 'time_step_profile'
+            if 'run_ID' in config.keys():
+                profile_name = f"{str(config.run_ID).zfill(4)}_{config.run_ID_names}_{profile_name}"
+            profile_csv, _ = profiler.write(config.run_output_dir, profile_name)
+            logging.info(f"Saved time step profile to: {profile_csv}")
+
         # Print some summary stats on the simulation.
         print('alive', len(pop[pop['alive'] == 'alive']))
         logging.info(f"Total alive: {len(pop[pop['alive'] == 'alive'])}")
@@ -343,6 +413,9 @@ def RunPipeline(config, intervention=None):
         #for component in components:
         #    component.plot(pop, config)
 
+    print(f"Transition model cache: {transition_model_cache.hits} hits, {transition_model_cache.misses} misses")
+    logging.info(f"Transition model cache: {transition_model_cache.hits} hits, {transition_model_cache.misses} misses")
+
     return simulation
 
 
@@ -357,6 +430,13 @@ def get_output_data_filename(config, year=0):
         output_data_filename += str(config.run_ID_names) + '_'
 
     # Now add year to output file name
-    output_data_filename += f"{config.time.start.year + year}.csv"
+    output_data_filename += f"{config.time.start.year + year}{utils.OUTPUT_FORMATS[get_output_format(config)]}"
+
+    return(output_data_filename)
+
 
-    return(output_data_filename)
\ No newline at end of file
+def get_output_format(config):
+    # Population output format (csv, parquet or feather). Defaults to csv.
+    if 'output_format' in config.keys():
+        return config.output_format
+    return 'csv'
@@ -7,6 +7,7 @@ import numpy as np
 import pandas as pd
 import minos.modules.r_utils as r_utils
 from minos.modules.base_module import Base
+from minos.equivalent_income import calculate_equivalent_income
 import matplotlib.pyplot as plt
 from seaborn import histplot
 
@@ -89,7 +90,7 @@ class S7EquivalentIncome(Base):
             The event time_step that called this function.
         """
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         self.year = event.time.year
 
         ## Predict next income value
@@ -117,72 +118,9 @@ class S7EquivalentIncome(Base):
         # This is a deterministic calculation based on the values from each of the SIPHER7 variables
         # Each level of each variable is assigned a weight, which are then used to modify the value for disposable
         # income to generate a value that is based on both the income and characteristics of a persons life
-
-        # This was first done by one-hot encoding each of the S7 variables, but this would be clunky and inefficient
-        # I'm going to try and do it slightly more efficiently
-
-        # The goal here is to calculate an exponent term for modifying income to equivalent income:
         #   EquivalentIncome = Income*EXP(X)
-        # Each weighting applies to the level
-
-        # First set up dictionaries for each variable to hold its factor weights
-        phys_health_dict = {
-            5: 0,
-            4: -0.116/1.282,
-            3: -0.135/1.282,
-            2: -0.479/1.282,
-            1: -0.837/1.282
-        }
-        men_health_dict = {
-            5: 0,
-            4: -0.14/1.282,
-            3: -0.215/1.282,
-            2: -0.656/1.282,
-            1: -0.877/1.282
-        }
-        loneliness_dict = {
-            1: 0,
-            2: -0.186/1.282,
-            3: -0.591/1.282
-        }
-        employment_dict = {
-            'FT Employed': 0,
-            'PT Employed': 0.033/1.282,
-            'Job Seeking': -0.283/1.282,
-            'FT Education': -0.184/1.282,
-            'Family Care': -0.755/1.282,
-            'Not Working': -0.221/1.282
-        }
-        housing_dict = {
-            'Yes to all': 0,
-            'Yes to some': -0.235/1.282,
-            'No to all': -0.696/1.282
-        }
-        nh_safety_dict = {
-            'Hardly ever': 0,
-            'Some of the time': -0.291/1.282,
-            'Often': -0.599/1.282
-        }
-
-        ### REMOVE THIS PROPERLY SOON!
-        # We have a single value of -2 for S7_physical_health which doesn't fit the bill, I'm just replacing it for
-        # now but should handle this properly soon in either complete_case or imputation
-        #pop['S7_physical_health'][pop['S7_physical_health'] == -2] = 1
-
-        # Now we add together weights for each factor level to generate the exponent term
-        pop['EI_exp_term'] = 0
-        #pop['EI_exp_term'] = pop['EI_exp_term'] + phys_health_dict.get(pop['S7_physical_health'])
-        pop['EI_exp_term'] = pop['EI_exp_term'] + pop.apply(lambda x: phys_health_dict[x['S7_physical_health']], axis=1)
-        pop['EI_exp_term'] = pop['EI_exp_term'] + pop.apply(lambda x: men_health_dict[x['S7_mental_health']], axis=1)
-        pop['EI_exp_term'] = pop['EI_exp_term'] + pop.apply(lambda x: loneliness_dict[x['loneliness']], axis=1)
-        pop['EI_exp_term'] = pop['EI_exp_term'] + pop.apply(lambda x: employment_dict[x['S7_labour_state']], axis=1)
-        pop['EI_exp_term'] = pop['EI_exp_term'] + pop.apply(lambda x: housing_dict[x['S7_housing_quality']], axis=1)
-        pop['EI_exp_term'] = pop['EI_exp_term'] + pop.apply(lambda x: nh_safety_dict[x['S7_neighbourhood_safety']], axis=1)
-
-        # finally do the calculation for equivalent income (EI = income^EI_exp_term)
-        pop['equivalent_income'] = pop['hh_income'] * np.exp(pop['EI_exp_term'])
-
-        return pop['equivalent_income']
+        # The weights are in minos.equivalent_income, shared with composite generation.
+        return calculate_equivalent_income(pop)
 
     def plot(self, pop, config):
 
@@ -87,16 +87,13 @@ class S7Housing(Base):
         # Draw individuals next states randomly from this distribution.
         # Adjust other variables according to changes in state. E.g. a birth would increase child counter by one.
 
-        pop = self.population_view.get(event.index, query="alive=='alive'")
+        pop = self.get_alive_population(event.index)
         self.year = event.time.year
 
         housing_prob_df = self.calculate_housing(pop)
 
-        housing_prob_df["S7_housing_quality"] = self.random.choice(housing_prob_df.index,
-                                                                list(housing_prob_df.columns),
-                                                                housing_prob_df) + 1
-
-        housing_prob_df.index = housing_prob_df.index.astype(int)
+        housing_prob_df.index = pop.index
+        housing_prob_df["S7_housing_quality"] = self.sample_categories(housing_prob_df, pop.index) + 1
 
         # convert numeric prediction into string factors (low, medium, high)
         housing_factor_dict = {1: 'No to all',
@@ -124,9 +121,9 @@ class S7Housing(Base):
             year = 2019
         else:
             year = min(self.year, 2019)
-        transition_model = r_utils.load_transitions(f"S7_housing_quality/clm/S7_housing_quality_{year}_{year+1}", self.rpy2Modules, path=self.transition_dir)
+        transition_model = self.transition_utils.load_transitions(f"S7_housing_quality/clm/S7_housing_quality_{year}_{year+1}", self.rpy2Modules, path=self.transition_dir, cache=self.transition_model_cache)
         # returns probability matrix (3xn) of next ordinal state.
-        prob_df = r_utils.predict_next_timestep_clm(transition_model, self.rpy2Modules, pop, 'S7_housing_quality')
+        prob_df = self.transition_utils.predict_next_timestep_clm(transition_model, self.rpy2Modules, pop, 'S7_housing_quality')
         return prob_df
 
     def plot(self, pop, config):
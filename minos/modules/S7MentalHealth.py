@@ -88,16 +88,13 @@ class S7MentalHealth(Base):
         self.year = event.time.year
 
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
 
         # Predict next neighbourhood value
         men_health_prob_df = self.calculate_S7_mental_health(pop)
 
-        men_health_prob_df["S7_mental_health"] = self.random.choice(men_health_prob_df.index,
-                                                                       list(men_health_prob_df.columns),
-                                                                       men_health_prob_df) + 1
-
-        men_health_prob_df.index = men_health_prob_df.index.astype(int)
+        men_health_prob_df.index = pop.index
+        men_health_prob_df["S7_mental_health"] = self.sample_categories(men_health_prob_df, pop.index) + 1
 
         # Draw individuals next states randomly from this distribution.
         # Update population with new income
@@ -120,8 +117,8 @@ class S7MentalHealth(Base):
         else:
             year = min(self.year, 2020)
         
-        transition_model = r_utils.load_transitions(f"S7_mental_health/clm/S7_mental_health_{year}_{year+1}", self.rpy2Modules, path=self.transition_dir)
-        return r_utils.predict_next_timestep_clm(transition_model, self.rpy2Modules, pop, 'S7_mental_health')
+        transition_model = self.transition_utils.load_transitions(f"S7_mental_health/clm/S7_mental_health_{year}_{year+1}", self.rpy2Modules, path=self.transition_dir, cache=self.transition_model_cache)
+        return self.transition_utils.predict_next_timestep_clm(transition_model, self.rpy2Modules, pop, 'S7_mental_health')
 
     def plot(self, pop, config):
 
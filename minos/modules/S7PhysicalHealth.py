@@ -89,16 +89,13 @@ class S7PhysicalHealth(Base):
         self.year = event.time.year
 
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
 
         # Predict next neighbourhood value
         phys_health_prob_df = self.calculate_S7_physical_health(pop)
 
-        phys_health_prob_df["S7_physical_health"] = self.random.choice(phys_health_prob_df.index,
-                                                                              list(phys_health_prob_df.columns),
-                                                                              phys_health_prob_df) + 1
-
-        phys_health_prob_df.index = phys_health_prob_df.index.astype(int)
+        phys_health_prob_df.index = pop.index
+        phys_health_prob_df["S7_physical_health"] = self.sample_categories(phys_health_prob_df, pop.index) + 1
 
         # Draw individuals next states randomly from this distribution.
         # Update population with new income
@@ -121,8 +118,8 @@ class S7PhysicalHealth(Base):
         else:
             year = min(self.year, 2020)
 
-        transition_model = r_utils.load_transitions(f"S7_physical_health/clm/S7_physical_health_{year}_{year+1}", self.rpy2Modules, path=self.transition_dir)
-        return r_utils.predict_next_timestep_clm(transition_model, self.rpy2Modules, pop, 'S7_physical_health')
+        transition_model = self.transition_utils.load_transitions(f"S7_physical_health/clm/S7_physical_health_{year}_{year+1}", self.rpy2Modules, path=self.transition_dir, cache=self.transition_model_cache)
+        return self.transition_utils.predict_next_timestep_clm(transition_model, self.rpy2Modules, pop, 'S7_physical_health')
 
     def plot(self, pop, config):
 
@@ -130,6 +130,11 @@ class FertilityAgeSpecificRates(Base):
         # add new columns to population frame.
         self.population_view.update(pop_update)
 
+    def select_women(self, alive_index):
+        """ Alive women. Sex doesn't change so the index is cached in the population context until someone dies or
+        is added."""
+        return alive_index[self.population_view.get(alive_index)['sex'].to_numpy() == 'Female']
+
     def on_time_step(self, event):
         """Produces new children and updates parent status on time steps.
 
@@ -143,7 +148,11 @@ class FertilityAgeSpecificRates(Base):
         # Currently people who are just added to the population arent in this index and wont be considered for births.
 
         nine_months_ago = pd.Timestamp(event.time - PREGNANCY_DURATION)
-        population = self.population_view.get(event.index, query='alive == "alive" and sex == "Female"')
+        women = self.population_context.subset('alive_female', event.index, self.select_women)
+        if women is None:
+            population = self.population_view.get(event.index, query='alive == "alive" and sex == "Female"')
+        else:
+            population = self.population_view.get(women)
         can_have_children = population.last_birth_time < nine_months_ago
         eligible_women = population[can_have_children]
         # calculate rates of having children and randomly draw births
@@ -305,10 +314,11 @@ class nkidsFertilityAgeSpecificRates(Base):
             The event time_step that called this function.
         """
         # Get a view on all living people.
-        population = self.population_view.get(event.index, query='alive == "alive"')
+        population = self.get_alive_population(event.index)
         population['has_newborn'] = False
         # resetting nkids in repl populations.
-        population['nkids'] = population.groupby('hidp')['nkids'].transform("max")
+        self.household_index.update(population['hidp'])
+        population['nkids'] = self.household_index.household_max(population['nkids'])
 
         # not needed due to yearly increments.
         #nine_months_ago = pd.Timestamp(event.time - PREGNANCY_DURATION)
@@ -323,8 +333,8 @@ class nkidsFertilityAgeSpecificRates(Base):
         had_children = self.randomness.filter_for_rate(who_women, rate_series).copy()
 
         # 1. Find everyone in a household who has had children by hidp and increment nkids by 1
-        had_children_hidps = population.loc[had_children, 'hidp'] # Get all HIDPs of people who've had children
-        who_had_children_households = population.loc[population['hidp'].isin(had_children_hidps),].index # Get all HIDPs who live in HH that has had a child
+        had_children_households = self.household_index.household_any(population.index.to_series().isin(had_children)) # Everyone who lives in a HH with someone who has had a child
+        who_had_children_households = population.loc[had_children_households,].index
         population.loc[who_had_children_households, 'nkids'] += 1
         population.loc[who_had_children_households, 'has_newborn'] = True
         population.loc[who_had_children_households, 'child_ages'] = population.loc[who_had_children_households, 'child_ages'].apply(lambda x: self.add_new_child_to_chain(x)) # add new child to children ages chain.
@@ -4,6 +4,96 @@ import pandas as pd
 import logging
 import numpy as np
 
+
+def parse_child_ages(chains):
+    """ Parse child age chains e.g. 12_4_3 into an array of ages.
+
+    Parameters
+    ----------
+    chains : pd.Series
+        Child age chains. Missing or empty chains have no children.
+    Returns
+    -------
+    ages : np.ndarray
+        Float array with a row per chain and a column per child. Rows are padded with NaN.
+    """
+    chains = chains.where(chains.notna() & (chains != ""))
+    if chains.isna().all():
+        return np.full((len(chains), 0), np.nan)
+    split = chains.astype(object).str.split("_", expand=True)
+    return split.apply(pd.to_numeric).to_numpy(dtype=float)
+
+
+def render_child_ages(ages):
+    """ Inverse of parse_child_ages. Join each row of ages into a chain. Rows without children get NaN.
+
+    Parameters
+    ----------
+    ages : np.ndarray
+        Float array of ages padded with NaN.
+    Returns
+    -------
+    chains : np.ndarray
+        Object array of chains.
+    """
+    # move children to the front of each row keeping their order so chains are joined left to right.
+    ages = np.take_along_axis(ages, np.argsort(np.isnan(ages), axis=1, kind="stable"), axis=1)
+    valid = ~np.isnan(ages)
+    parts = np.nan_to_num(ages).astype(int).astype(str)
+    chains = np.full(ages.shape[0], "", dtype=parts.dtype)
+    for j in range(ages.shape[1]):
+        joined = parts[:, j] if j == 0 else np.char.add(np.char.add(chains, "_"), parts[:, j])
+        chains = np.where(valid[:, j], joined, chains)
+    return np.where(valid.any(axis=1), chains.astype(object), np.nan)
+
+
+class ChildAgeChains:
+    """ Numeric child ages of each simulant alongside the child_ages chains they were rendered as.
+
+    Parsing the chain strings is the expensive part of ageing children. Chains are only parsed for simulants whose
+    chain has changed since the last time step (e.g. births added by fertility or new replenished simulants).
+    """
+
+    def __init__(self):
+        self.index = pd.Index([], dtype="int64")
+        self.chains = np.array([], dtype=object)
+        self.ages = np.full((0, 0), np.nan)
+
+    def get_ages(self, chains):
+        """ Ages of the children in chains, reusing the parsed ages of any unchanged chains.
+
+        Parameters
+        ----------
+        chains : pd.Series
+            Current child age chains indexed by simulant.
+        Returns
+        -------
+        ages : np.ndarray
+            Float array of ages with a row for each chain, padded with NaN.
+        """
+        positions = self.index.get_indexer(chains.index)
+        values = chains.to_numpy(dtype=object)
+        changed = positions < 0
+        known = np.flatnonzero(~changed)
+        cached = self.chains[positions[known]]
+        missing = pd.isna(values[known])
+        changed[known] = ~((cached == values[known]) | (missing & pd.isna(cached)))
+
+        parsed = parse_child_ages(chains[changed])
+        width = max(self.ages.shape[1], parsed.shape[1])
+        ages = np.full((len(chains), width), np.nan)
+        ages[known, :self.ages.shape[1]] = self.ages[positions[known]]
+        ages[changed, :parsed.shape[1]] = parsed
+        ages[changed, parsed.shape[1]:] = np.nan
+        return ages
+
+    def set_ages(self, index, ages, chains):
+        """ Record the ages and chains of the population after a time step."""
+        self.index = index
+        self.ages = ages
+        self.chains = chains
+
+
 class Ageing(Base):
 
     def setup(self, builder):
@@ -30,6 +120,9 @@ class Ageing(Base):
         # Shorthand methods for readability.
         self.population_view = builder.population.get_view(view_columns)  # view simulants
 
+        # Numeric child ages. Filled on the first time step as the population is loaded after setup.
+        self.child_age_chains = ChildAgeChains()
+
         # Register ageing, updating time and replenishment events on time_step.
         # builder.event.register_listener('time_step', self.on_time_step, priority=self.priority)
         super().setup(builder)
@@ -42,7 +135,7 @@ class Ageing(Base):
             some time point at which to run the method.
         """
         # get alive people and add time in years to their age.
-        population = self.population_view.get(event.index, query="alive == 'alive'")
+        population = self.get_alive_population(event.index)
         population['age'] += event.step_size / pd.Timedelta(days=365.25)
 
 
@@ -53,7 +146,8 @@ class Ageing(Base):
         # realign children age chains for new repl population. They don't have unique hidps yet.
         # TODO remove this if/when we update household ids in repl.
         # do this by getting the oldest ALIVE member of a household and give everyone in the household that age chain.
-        population['child_ages'] = population.groupby('hidp')['child_ages'].transform("first")
+        self.household_index.update(population['hidp'])
+        population['child_ages'] = self.household_index.household_first(population['child_ages'])
         # update children age chains.
         population = self.update_child_ages(population)
 
@@ -67,6 +161,9 @@ class Ageing(Base):
     def update_child_ages(self, pop):
         """ Update age chains for all households with alive individuals.
 
+        Every child is a year older and children who turn 16 leave the chain. This is done on the numeric ages held in
+        self.child_age_chains and chains are rendered back to strings once at the end.
+
         Parameters
         ----------
         pop: pd.DataFrame
@@ -75,41 +172,16 @@ class Ageing(Base):
         -------
         pop: pd.DataFrame
         """
-        pop['age_nkids_tuple'] = pop['child_ages'].apply(lambda x: self.increment_age_chains(x))
-                                                    #pd.DataFrame(.to_list(), index=pop.index)
-        pop[['child_ages', 'nkids']] = pop['age_nkids_tuple'].tolist()
-        pop['nkids'] = pop['nkids'].astype(float)
+        ages = self.child_age_chains.get_ages(pop['child_ages'])
+        # increment each item by one. remove item if item is over 16.
+        ages = np.where(ages < 15, ages + 1, np.nan)
+        chains = render_child_ages(ages)
+        self.child_age_chains.set_ages(pop.index, ages, chains)
+
+        pop['child_ages'] = chains
+        pop['nkids'] = (~np.isnan(ages)).sum(axis=1).astype(float)
         return pop
 
-    def increment_age_chains(self, age_chain):
-        """
-
-        Returns
-        -------
-        age_chain: string
-            List of ages of children in the household in descending order seperated by dashes -. e.g. 12-4-3-2.
-        """
-        # split age chain into list
-        new_nkids = 0 #  default if no age chain found. assume no children.
-        value = age_chain#.values[0]
-        if type(value) != float and value is not None:
-            age_chain = value.split("_")
-            # increment each item by one
-            # remove item if item is over 16.
-            age_chain = [str(int(item) + 1) for item in age_chain if int(item) < 15]
-            #age_chain = np.sort(age_chain, ascending=True)
-            # return child ages chain and length of list.
-            if age_chain:
-                new_nkids = len(age_chain)
-                age_chain = "_".join(age_chain)
-            else:
-                new_nkids = 0
-                age_chain = np.nan
-        else:
-            age_chain = value
-        return age_chain, new_nkids
-
-
     # Special methods for vivarium.
     @property
     def name(self):
@@ -38,6 +38,7 @@ class Alcohol(Base):
         """
 
         # Load in inputs from pre-setup.
+        self.rpy2Modules = builder.data.load("rpy2_modules")
 
         # Build vivarium objects for calculating transition probabilities.
         # Typically this is registering rate/lookup tables. See vivarium docs/other modules for examples.
@@ -83,7 +84,7 @@ class Alcohol(Base):
             The event time_step that called this function.
         """
         # Get living people to update their alcohol
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         self.year = event.time.year
 
         ## Predict next alcohol value
@@ -109,12 +110,13 @@ class Alcohol(Base):
         """
         # load transition model based on year.
         year = min(self.year, 2018)
-        transition_model = r_utils.load_transitions(f"alcohol/zip/alcohol_zip_{year}_{year + 1}", path=self.transition_dir)
+        transition_model = self.transition_utils.load_transitions(f"alcohol/zip/alcohol_zip_{year}_{year + 1}", self.rpy2Modules, path=self.transition_dir, cache=self.transition_model_cache)
         # The calculation relies on the R predict method and the model that has already been specified
-        nextWaveAlcohol = r_utils.predict_next_timestep_zip(model = transition_model,
-                                                                    current = pop,
-                                                                    dependent = 'alcohol_spending',
-                                                                    rescale_factor = 50)
+        nextWaveAlcohol = self.transition_utils.predict_next_timestep_zip(model = transition_model,
+                                                                          rpy2Modules = self.rpy2Modules,
+                                                                          current = pop,
+                                                                          dependent = 'alcohol_spending',
+                                                                          draws = self.random.get_draw(pop.index))
         return nextWaveAlcohol
 
     def plot(self, pop, config):
@@ -8,6 +8,9 @@ easier to build.
 from datetime import datetime as dt
 from scipy.special import ndtri  # very fast standard normal sampler.
 from minos.data_generation.US_utils import load_multiple_data
+import minos.modules.native_utils as native_utils
+from minos.modules.profiling import ROW_COUNTER
+import numpy as np
 import pandas as pd
 
 PRIORITY_DEFAULT = 10
@@ -49,6 +52,14 @@ class Base():
         self.replenishing_dir = config.replenishing_dir
         # mode
         self.cross_validation = config.cross_validation
+        # Transition model prediction backend. Modules listed in native_prediction predict from exported model
+        # coefficients in NumPy (native_utils) instead of calling R through rpy2 (r_utils).
+        if 'native_prediction' in config.keys() and self.__repr__() in config.native_prediction:
+            self.transition_utils = native_utils
+        else:
+            # imported here so modules predicting natively don't need rpy2 and R.
+            import minos.modules.r_utils as r_utils
+            self.transition_utils = r_utils
 
         # # Grab module priority
         # self.priority = simulation.component_priority_map.get(self.__repr__(), PRIORITY_DEFAULT)
@@ -58,13 +69,138 @@ class Base():
 
     def setup(self, builder):
         component_priority_map = builder.data.load("component_priority_map")
+        # Shared cache of loaded transition models. Pass to load_transitions so each model is read from disk once.
+        self.transition_model_cache = builder.data.load("transition_model_cache")
+        # Shared hidp -> members index for household level reductions (see household_index.py).
+        self.household_index = builder.data.load("household_index")
+        self.load_shared_state(builder)
         self.priority = component_priority_map.get(self.__repr__(), PRIORITY_DEFAULT)
         # print("Priority for {} set to {}".format(self.__repr__(), self.priority))
-        builder.event.register_listener("time_step", self.on_time_step, priority=self.priority)
+        builder.event.register_listener("time_step", self.profiled(builder, self.on_time_step), priority=self.priority)
+
+    def get_model_view_columns(self, builder, models, columns=(), derived=()):
+        """ Population view columns for a module that predicts from transition models.
+
+        The view is every predictor of the models, read from the models themselves (see model_predictors.py), plus
+        columns. The initial population is checked against the predictors when it is created, so a missing column or
+        a factor level the models weren't fitted with fails during setup rather than part way through a run.
+
+        Parameters
+        ----------
+        builder : vivarium.builder
+            Vivarium's control object.
+        models : dict
+            Name of each transition model to the loaded model.
+        columns : Iterable[str]
+            Other columns the module needs e.g. the columns it updates.
+        derived : Iterable[str]
+            Predictors the module computes before predicting (e.g. hh_income_new) rather than reading them from the
+            population.
+        Returns
+        -------
+        view_columns : list
+        """
+        self.model_predictors = {}
+        for name, model in models.items():
+            predictors = self.transition_utils.get_model_predictors(model)
+            if predictors is None:
+                raise ValueError(f"Could not read the predictors of transition model {name}. "
+                                 f"List the view columns of {self.__repr__()} explicitly instead.")
+            self.model_predictors[name] = predictors
+        self.derived_predictors = list(derived)
+        self.model_predictors_checked = False
+
+        view_columns = list(columns)
+        for predictors in self.model_predictors.values():
+            view_columns += [column for column in predictors.columns(derived) if column not in view_columns]
+        # vivarium raises during setup if no component creates a required column.
+        builder.population.initializes_simulants(self.check_model_predictors, requires_columns=view_columns)
+        return view_columns
+
+    def check_model_predictors(self, pop_data):
+        """ Check the initial population against the predictors of the module's transition models. See
+        get_model_view_columns."""
+        if self.model_predictors_checked:
+            return
+        pop = self.population_view.get(pop_data.index)
+        for name, predictors in self.model_predictors.items():
+            predictors.check(pop, name, self.derived_predictors)
+        self.model_predictors_checked = True
+
+    def load_shared_state(self, builder):
+        """ Load the shared alive mask maintained by Mortality (see population_context.py) and apply the optional
+        compact dtype schema to this module's population view.
+
+        Modules that override setup without calling Base.setup call this once self.population_view is set.
+
+        Parameters
+        ----------
+        builder : vivarium.builder
+            Vivarium's control object.
+        """
+        self.population_context = builder.data.load("population_context")
+        self.use_population_schema(builder)
+
+    def use_population_schema(self, builder):
+        """ Coerce updates from this module's population view to the compact dtype schema if it is switched on
+        (compact_dtypes in the config, see population_schema.py).
+
+        Parameters
+        ----------
+        builder : vivarium.builder
+            Vivarium's control object.
+        """
+        self.population_schema = builder.data.load("population_schema")
+        if self.population_schema is not None:
+            self.population_view = self.population_schema.wrap(self.population_view)
+
+    def profiled(self, builder, listener):
+        """ Wrap a time step listener in the time step profiler if profiling is switched on (profile in the config).
+
+        Parameters
+        ----------
+        builder : vivarium.builder
+            Vivarium's control object.
+        listener : callable
+            Time step listener, usually self.on_time_step.
+        Returns
+        -------
+        listener : callable
+            The listener, profiled if a profiler is in the data store.
+        """
+        profiler = builder.data.load("time_step_profiler")
+        if profiler is None:
+            return listener
+        return profiler.wrap(self.__repr__(), listener)
 
     def on_time_step(self, event):
         pass
 
+    def get_alive_population(self, index):
+        """ Get the alive simulants in index from the population view.
+
+        Uses the shared alive mask rather than evaluating query="alive =='alive'" over the whole population. Falls back
+        to the query if the mask doesn't cover index.
+
+        Parameters
+        ----------
+        index : pd.Index
+            Simulant ids, usually event.index.
+        Returns
+        -------
+        pop : pd.DataFrame
+            Alive simulants with the columns of self.population_view.
+        """
+        alive_index = self.population_context.alive_index(index)
+        if alive_index is None:
+            pop = self.population_view.get(index, query="alive =='alive'")
+        else:
+            pop = self.population_view.get(alive_index)
+        # simulants the module works on for the time step profiler.
+        ROW_COUNTER.fetched += len(pop)
+        ROW_COUNTER.fetches += 1
+        return pop
+
     def on_initialize_simulants(self, pop_data):
         """  Initiate columns for mortality when new simulants are added. By default adds no columns.
 
@@ -114,7 +250,7 @@ class Base():
         """
         pass
 
-    def generate_gaussian_noise(self, index, mu=0, sigma=1):
+    def generate_gaussian_noise(self, index, mu=0, sigma=1, additional_key=None):
         """ Generate Gaussian noise for continuous variables in MINOS
         Parameters
         ----------
@@ -122,15 +258,83 @@ class Base():
             How many observations to generate. should match number of rows from minos dataframe
         mu, sigma: float
             Mean and standard deviation of desired Gaussian data. Defaults to 0 and 1 (I.E. the standard Normal distribution).
+        additional_key: str
+            (Optional) Key for the draws. Use different keys for independent noise on the same index in one time step.
         Returns
         -------
         data: np.array
             1xn vector of n samples from the Gaussian distribution N(mu, sigma^2).
         """
 
-        u = self.random.get_draw(index)
+        u = self.random.get_draw(index, additional_key=additional_key)
         return (sigma*ndtri(u)) + mu
 
+    def generate_laplace_noise(self, index, mu=0, scale=1, additional_key=None):
+        """ Generate Laplace noise for continuous variables in MINOS by inverting the Laplace CDF.
+        Parameters
+        ----------
+        index: pandas.Index
+            How many observations to generate. should match number of rows from minos dataframe
+        mu, scale: float
+            Location and scale of desired Laplace data. Same parameterisation as VGAM::rlaplace.
+        additional_key: str
+            (Optional) Key for the draws. Use different keys for independent noise on the same index in one time step.
+        Returns
+        -------
+        data: np.array
+            1xn vector of n samples from the Laplace distribution.
+        """
+
+        u = self.random.get_draw(index, additional_key=additional_key) - 0.5
+        return mu - scale*np.sign(u)*np.log1p(-2*np.abs(u))
+
+    def generate_cauchy_noise(self, index, mu=0, scale=1, clip=None, additional_key=None):
+        """ Generate (optionally clipped) Cauchy noise for continuous variables in MINOS by inverting the Cauchy CDF.
+        Parameters
+        ----------
+        index: pandas.Index
+            How many observations to generate. should match number of rows from minos dataframe
+        mu, scale: float
+            Location and scale of desired Cauchy data. Same parameterisation as stats::rcauchy.
+        clip: float
+            (Optional) Clip the noise to [-clip, clip]. Cauchy tails are heavy enough to swamp a prediction otherwise.
+        additional_key: str
+            (Optional) Key for the draws. Use different keys for independent noise on the same index in one time step.
+        Returns
+        -------
+        data: np.array
+            1xn vector of n samples from the Cauchy distribution.
+        """
+
+        u = self.random.get_draw(index, additional_key=additional_key)
+        noise = mu + scale*np.tan(np.pi*(u - 0.5))
+        if clip is not None:
+            noise = np.clip(noise, -clip, clip)
+        return noise
+
+    def sample_categories(self, probabilities, index, choices=None):
+        """ Draw a next state for each simulant from a matrix of state probabilities.
+
+        Inverse CDF sampling (native_utils.sample_categories) with one draw per simulant from the module's randomness
+        stream. Draws are keyed on simulant ids rather than row positions so they stay common between runs.
+
+        Parameters
+        ----------
+        probabilities : pd.DataFrame
+            n x k probabilities of each state, one row per simulant in index. E.g. from predict_next_timestep_clm.
+        index : pandas.Index
+            Simulant ids of the rows of probabilities.
+        choices : Iterable
+            (Optional) State for each column. Defaults to the columns of probabilities.
+        Returns
+        -------
+        states : pd.Series
+            Chosen state for each simulant indexed by index.
+        """
+        choices = np.asarray(list(probabilities.columns) if choices is None else list(choices))
+        codes = native_utils.sample_categories(probabilities, self.random.get_draw(index))
+        return pd.Series(choices[codes], index=index)
+
 
     def generate_history_dataframe(self, source, years, variables):
         file_names = [f"data/{source}/{year}_US_cohort.csv" for year in years]
@@ -7,7 +7,7 @@ from pathlib import Path
 import logging
 from minos.modules.base_module import Base
 
-class hhIncomeIntervention():
+class hhIncomeIntervention(Base):
 
     @property
     def name(self):
@@ -89,9 +89,11 @@ class hhIncomeIntervention():
         builder.population.initializes_simulants(self.on_initialize_simulants,
                                                  creates_columns=columns_created)
 
+        self.load_shared_state(builder)
+
         # Declare events in the module. At what times do individuals transition states from this module. E.g. when does
         # individual graduate in an education module.
-        builder.event.register_listener("time_step", self.on_time_step, priority=4)
+        builder.event.register_listener("time_step", self.profiled(builder, self.on_time_step), priority=4)
 
     def on_initialize_simulants(self, pop_data):
         pop_update = pd.DataFrame({'income_boosted': False,
@@ -104,7 +106,7 @@ class hhIncomeIntervention():
         logging.info("INTERVENTION:")
         logging.info(f"\tApplying effects of the hh_income intervention in year {event.time.year}...")
 
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         # TODO probably a faster way to do this than resetting the whole column.
         #pop['hh_income'] -= (self.uplift * pop["income_boosted"])  # reset boost if people move out of bottom decile.
         # Reset boost amount to 0
@@ -168,9 +170,11 @@ class hhIncomeChildUplift(Base):
         builder.population.initializes_simulants(self.on_initialize_simulants,
                                                  creates_columns=columns_created)
 
+        self.load_shared_state(builder)
+
         # Declare events in the module. At what times do individuals transition states from this module. E.g. when does
         # individual graduate in an education module.
-        builder.event.register_listener("time_step", self.on_time_step, priority=4)
+        builder.event.register_listener("time_step", self.profiled(builder, self.on_time_step), priority=4)
 
     def on_initialize_simulants(self, pop_data):
         pop_update = pd.DataFrame({'income_boosted': False,
@@ -183,7 +187,7 @@ class hhIncomeChildUplift(Base):
         logging.info("INTERVENTION:")
         logging.info(f"\tApplying effects of the hh_income child uplift intervention in year {event.time.year}...")
 
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         # print(np.mean(pop['hh_income'])) # for debugging purposes.
         # TODO probably a faster way to do this than resetting the whole column.
         #pop['hh_income'] -= pop['boost_amount']  # reset boost if people move out of bottom decile.
@@ -245,9 +249,11 @@ class hhIncomePovertyLineChildUplift(Base):
         builder.population.initializes_simulants(self.on_initialize_simulants,
                                                  creates_columns=columns_created)
 
+        self.load_shared_state(builder)
+
         # Declare events in the module. At what times do individuals transition states from this module. E.g. when does
         # individual graduate in an education module.
-        builder.event.register_listener("time_step", self.on_time_step, priority=4)
+        builder.event.register_listener("time_step", self.profiled(builder, self.on_time_step), priority=4)
 
     def on_initialize_simulants(self, pop_data):
         pop_update = pd.DataFrame({'income_boosted': False, # who boosted?
@@ -260,7 +266,7 @@ class hhIncomePovertyLineChildUplift(Base):
         logging.info("INTERVENTION:")
         logging.info(f"\tApplying effects of the hh_income poverty line child uplift intervention in year {event.time.year}...")
 
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         # TODO probably a faster way to do this than resetting the whole column.
         #pop['hh_income'] -= pop['boost_amount']
         # reset boost amount to 0 before calculating next uplift
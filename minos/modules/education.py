@@ -2,6 +2,7 @@
 
 import pandas as pd
 from minos.modules.base_module import Base
+from minos.modules.rule_table import RuleTable
 
 # suppressing a warning that isn't a problem
 pd.options.mode.chained_assignment = None # default='warn' #supress SettingWithCopyWarning
@@ -45,9 +46,26 @@ class Education(Base):
                         'region',
                         'hh_income',
                         'education_state',
-                        'max_educ']
+                        'max_educ',
+                        'alive',
+                        'S7_labour_state']
         self.population_view = builder.population.get_view(columns=view_columns)
 
+        # Deterministic education transitions. Rules are applied in order each time step.
+        in_education = {'alive': 'alive', 'S7_labour_state': 'FT Education'}
+        self.education_rules = RuleTable('education_state')
+        # Level 2 is equivalent to GCSE level, which everyone should have achieved by the age of 17
+        # No need to test max_educ for this one, everyone stays in education to 16 now minimum
+        self.education_rules.add_rule(2, {**in_education, 'age': 17})
+        # Level 3 is equivalent to A-level, so make this change by age 19 if max_educ is 3 or larger
+        self.education_rules.add_rule(3, {**in_education, 'age': 19, 'max_educ': ('>=', 3)})
+        # Level 5 is nursing/medical and HE diploma, so make this change by age 22 if max_educ is 5
+        self.education_rules.add_rule(5, {**in_education, 'age': 22, 'max_educ': 5})
+        # Level 6 is 1st degree or teaching qual (not PGCE), so make this change by age 22 if max_educ is 6 or larger
+        self.education_rules.add_rule(6, {**in_education, 'age': 22, 'max_educ': ('>=', 6)})
+        # Level 7 is higher degree (masters/PhD), so make this change by age 25 if max_educ is 7
+        self.education_rules.add_rule(7, {**in_education, 'age': 26, 'max_educ': 7})
+
         # Population initialiser. When new individuals are added to the microsimulation a constructer is called for each
         # module. Declare what constructer is used. usually on_initialize_simulants method is called. Inidividuals are
         # created at the start of a model "setup" or after some deterministic (add cohorts) or random (births) event.
@@ -76,35 +94,9 @@ class Education(Base):
 
         self.year = event.time.year
 
-        # Level 2 is equivalent to GCSE level, which everyone should have achieved by the age of 17
-        # No need to test max_educ for this one, everyone stays in education to 16 now minimum
-        level2 = self.population_view.get(event.index, query="alive=='alive' and age == 17 and S7_labour_state=='FT Education'")
-        # Update education state and apply back to population view
-        level2['education_state'][level2['education_state'] < 2] = 2
-        self.population_view.update(level2['education_state'])
-
-        # Level 3 is equivalent to A-level, so make this change by age 19 if max_educ is 3 or larger
-        level3 = self.population_view.get(event.index, query="alive=='alive' and age == 19 and S7_labour_state=='FT Education' and max_educ >= 3")
-        level3['education_state'][level3['education_state'] < 3] = 3
-        self.population_view.update(level3['education_state'])
-
-        # Level 5 is nursing/medical and HE diploma, so make this change by age 22 if max_educ is 5
-        level5 = self.population_view.get(event.index,
-                                          query="alive=='alive' and age == 22 and S7_labour_state=='FT Education' and max_educ == 5")
-        level5['education_state'][level5['education_state'] < 5] = 5
-        self.population_view.update(level5['education_state'])
-
-        # Level 6 is 1st degree or teaching qual (not PGCE), so make this change by age 22 if max_educ is 6 or larger
-        level6 = self.population_view.get(event.index,
-                                          query="alive=='alive' and age == 22 and S7_labour_state=='FT Education' and max_educ >= 6")
-        level6['education_state'][level6['education_state'] < 6] = 6
-        self.population_view.update(level6['education_state'])
-
-        # Level 7 is higher degree (masters/PhD), so make this change by age 25 if max_educ is 7
-        level7 = self.population_view.get(event.index,
-                                          query="alive=='alive' and age == 26 and S7_labour_state=='FT Education' and max_educ == 7")
-        level7['education_state'][level7['education_state'] < 7] = 7
-        self.population_view.update(level7['education_state'])
+        # Apply every education rule in one pass and write back anyone whose education state changed.
+        pop = self.population_view.get(event.index)
+        self.population_view.update(self.education_rules.apply(pop))
 
     def plot(self, pop, config):
 
@@ -52,9 +52,11 @@ class energyBaseline(Base):
         builder.population.initializes_simulants(self.on_initialize_simulants,
                                                  creates_columns=columns_created)
 
+        self.load_shared_state(builder)
+
         # Declare events in the module. At what times do individuals transition states from this module. E.g. when does
         # individual graduate in an education module.
-        builder.event.register_listener("time_step", self.on_time_step, priority=4)
+        builder.event.register_listener("time_step", self.profiled(builder, self.on_time_step), priority=4)
 
 
     def on_initialize_simulants(self, pop_data):
@@ -69,7 +71,7 @@ class energyBaseline(Base):
         logging.info("INTERVENTION:")
         logging.info(f"\tApplying effects of the energy downlift intervention in year {event.time.year}...")
 
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         # TODO probably a faster way to do this than resetting the whole column.
         #pop['hh_income'] -= pop['boost_amount']
         # reset boost amount to 0 before calculating next uplift
@@ -136,9 +138,11 @@ class energyDownlift(Base):
         builder.population.initializes_simulants(self.on_initialize_simulants,
                                                  creates_columns=columns_created)
 
+        self.load_shared_state(builder)
+
         # Declare events in the module. At what times do individuals transition states from this module. E.g. when does
         # individual graduate in an education module.
-        builder.event.register_listener("time_step", self.on_time_step, priority=4)
+        builder.event.register_listener("time_step", self.profiled(builder, self.on_time_step), priority=4)
 
 
     def on_initialize_simulants(self, pop_data):
@@ -153,7 +157,7 @@ class energyDownlift(Base):
         logging.info("INTERVENTION:")
         logging.info(f"\tApplying effects of the energy downlift intervention in year {event.time.year}...")
 
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         # TODO probably a faster way to do this than resetting the whole column.
         #pop['hh_income'] -= pop['boost_amount']
         # reset boost amount to 0 before calculating next uplift
@@ -220,9 +224,11 @@ class energyDownliftNoSupport(Base):
         builder.population.initializes_simulants(self.on_initialize_simulants,
                                                  creates_columns=columns_created)
 
+        self.load_shared_state(builder)
+
         # Declare events in the module. At what times do individuals transition states from this module. E.g. when does
         # individual graduate in an education module.
-        builder.event.register_listener("time_step", self.on_time_step, priority=3)
+        builder.event.register_listener("time_step", self.profiled(builder, self.on_time_step), priority=3)
 
 
     def on_initialize_simulants(self, pop_data):
@@ -233,7 +239,7 @@ class energyDownliftNoSupport(Base):
 
 
     def on_time_step(self, event):
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         # TODO probably a faster way to do this than resetting the whole column.
         #pop['hh_income'] -= pop['boost_amount']
         # reset boost amount to 0 before calculating next uplift
@@ -297,9 +303,14 @@ class energyBillSupportScheme(Base):
         builder.population.initializes_simulants(self.on_initialize_simulants,
                                                  creates_columns=columns_created)
 
+        # Household index for the household level support payments.
+        self.household_index = builder.data.load("household_index")
+
+        self.load_shared_state(builder)
+
         # Declare events in the module. At what times do individuals transition states from this module. E.g. when does
         # individual graduate in an education module.
-        builder.event.register_listener("time_step", self.on_time_step)
+        builder.event.register_listener("time_step", self.profiled(builder, self.on_time_step))
 
 
     def on_initialize_simulants(self, pop_data):
@@ -310,7 +321,7 @@ class energyBillSupportScheme(Base):
 
 
     def on_time_step(self, event):
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         self.year = event.time.year
         # DONT SUBTRACT FROM INCOME AS IT SEEMS TO UNDO ITSELF AAAAAAAAA.
         #pop['hh_income'] -= pop['boost_amount']
@@ -332,18 +343,18 @@ class energyBillSupportScheme(Base):
             # £900 for those on means tested (need benefits variables)
             # TODO how is this determined? Needs extra variable from US. Work out what 'means tested' is and any US mapping.
             # £300 for households with pensioners (labour states)
-            pensioner_houses = pop.loc[pop['S7_labour_state']=="Retired", 'hidp']
-            pop.loc[pop['hidp'].isin(pensioner_houses), 'boost_amount'] += 300
+            self.household_index.update(pop['hidp'])
+            pensioner_houses = self.household_index.household_any(pop['S7_labour_state']=="Retired")
+            pop.loc[pensioner_houses, 'boost_amount'] += 300
             # £150 for households with long term sick/disabled individuals.
-            disability_houses = pop.loc[pop['S7_labour_state']=="Sick/Disabled", 'hidp']
-            pop.loc[pop['hidp'].isin(disability_houses), 'boost_amount'] += 150
+            disability_houses = self.household_index.household_any(pop['S7_labour_state']=="Sick/Disabled")
+            pop.loc[disability_houses, 'boost_amount'] += 150
             # £650 for those on universal credit
-            universal_credit_houses = pop.loc[pop['universal_income']==1, 'hidp']
-            pop.loc[pop['hidp'].isin(universal_credit_houses), 'boost_amount'] += 650
-            # £150 for council tax bands A-D. Work out who has council_tax value between 1 and 4 in two stages.
-            ct_band_D_houses = pop.loc[pop['council_tax']<=4, ['council_tax', 'hidp']]
-            ct_band_A_D_houses = ct_band_D_houses.loc[ct_band_D_houses['council_tax']>=1, 'hidp']
-            pop.loc[pop['hidp'].isin(ct_band_A_D_houses), 'boost_amount'] += 150
+            universal_credit_houses = self.household_index.household_any(pop['universal_income']==1)
+            pop.loc[universal_credit_houses, 'boost_amount'] += 650
+            # £150 for council tax bands A-D. council_tax value between 1 and 4.
+            ct_band_A_D_houses = self.household_index.household_any(pop['council_tax'].between(1, 4))
+            pop.loc[ct_band_A_D_houses, 'boost_amount'] += 150
 
         # discounting based on tariff type (prepayment meters/fixed rate tariffs/ all different (cant do this..)
         # TODO see elecpay/gaspay.
@@ -395,13 +406,15 @@ class goodHeatingDummy(Base):
                         'housing_quality']
         columns_created = []
         self.population_view = builder.population.get_view(columns=view_columns + columns_created)
+        self.load_shared_state(builder)
+
         # Declare events in the module. At what times do individuals transition states from this module. E.g. when does
         # individual graduate in an education module.
-        builder.event.register_listener("time_step", self.on_time_step)
+        builder.event.register_listener("time_step", self.profiled(builder, self.on_time_step))
 
     def on_time_step(self, event):
         pass
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         # buff housing pop as required.
         unheated_pop = pop.loc[pop['heating'] == 0, ]
         unheated_pop.loc[unheated_pop['housing_quality'] == "Medium", 'housing_quality'] = "High"
@@ -458,9 +471,11 @@ class GBIS(Base):
         builder.population.initializes_simulants(self.on_initialize_simulants,
                                                  creates_columns=columns_created)
 
+        self.load_shared_state(builder)
+
         # Declare events in the module. At what times do individuals transition states from this module. E.g. when does
         # individual graduate in an education module.
-        builder.event.register_listener("time_step", self.on_time_step)
+        builder.event.register_listener("time_step", self.profiled(builder, self.on_time_step))
 
 
     def on_initialize_simulants(self, pop_data):
@@ -478,7 +493,7 @@ class GBIS(Base):
         # replace their heating to 1.
         # reduce their energy bills by £3XX per year (plus some heterogeneity?).
 
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
 
         # TODO get some fraction of households rather than absolutely everyone.
         pop['income_boosted'] = pop['hh_income']<0.6*np.median(pop['hh_income'])
@@ -534,9 +549,11 @@ class fossilFuelReplacementScheme(Base):
         builder.population.initializes_simulants(self.on_initialize_simulants,
                                                  creates_columns=columns_created)
 
+        self.load_shared_state(builder)
+
         # Declare events in the module. At what times do individuals transition states from this module. E.g. when does
         # individual graduate in an education module.
-        builder.event.register_listener("time_step", self.on_time_step)
+        builder.event.register_listener("time_step", self.profiled(builder, self.on_time_step))
 
 
 
@@ -551,7 +568,7 @@ class fossilFuelReplacementScheme(Base):
         # replace with similar electrical hour percentage.
         # standing charges issues?
 
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
 
         # TODO get some fraction of households rather than absolutely everyone.
         pop['income_boosted'] = pop['hh_income'<0.6*np.median(pop['hh_income'])]
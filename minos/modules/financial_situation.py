@@ -86,14 +86,14 @@ class financialSituation(Base):
             The event time_step that called this function.
         """
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         self.year = event.time.year
 
         nextWaveFinancialPerception = self.calculate_financial_situation(pop)
-        nextWaveFinancialPerception["financial_situation"] = self.random.choice(nextWaveFinancialPerception.index,
-                                                                list(nextWaveFinancialPerception.columns+1),
-                                                                nextWaveFinancialPerception).astype(float)
         nextWaveFinancialPerception.index = pop.index
+        nextWaveFinancialPerception["financial_situation"] = self.sample_categories(nextWaveFinancialPerception,
+                                                                                    pop.index,
+                                                                                    nextWaveFinancialPerception.columns + 1).astype(float)
         #nextWaveFinancialPerception["financial_situation"] = nextWaveFinancialPerception["financial_situation"].astype(int)
         # Draw individuals next states randomly from this distribution.
         # Update population with new income.
@@ -101,6 +101,6 @@ class financialSituation(Base):
 
     def calculate_financial_situation(self, pop):
         year = 2020
-        transition_model = r_utils.load_transitions(f"financial_situation/clm/financial_situation_{year}_{year + 1}", self.rpy2_modules)
-        nextWaveFinancialPerception = r_utils.predict_next_timestep_clm(transition_model, self.rpy2_modules, pop, dependent='financial_situation')
+        transition_model = self.transition_utils.load_transitions(f"financial_situation/clm/financial_situation_{year}_{year + 1}", self.rpy2_modules, cache=self.transition_model_cache)
+        nextWaveFinancialPerception = self.transition_utils.predict_next_timestep_clm(transition_model, self.rpy2_modules, pop, dependent='financial_situation')
         return nextWaveFinancialPerception
@@ -87,7 +87,7 @@ class Heating(Base):
         # Draw individuals next states randomly from this distribution.
         # Adjust other variables according to changes in state. E.g. a birth would increase child counter by one.
 
-        pop = self.population_view.get(event.index, query="alive=='alive'")
+        pop = self.get_alive_population(event.index)
         self.year = event.time.year
 
         heating_prob_df = self.calculate_heating(pop)
@@ -112,7 +112,7 @@ class Heating(Base):
         """
         # load transition model based on year.
         year = 2019
-        transition_model = r_utils.load_transitions(f"heating/logit/heating_{year}_{year+1}", self.rpy2_modules)
+        transition_model = r_utils.load_transitions(f"heating/logit/heating_{year}_{year+1}", self.rpy2_modules, cache=self.transition_model_cache)
         # returns probability matrix (3xn) of next ordinal state.
         prob_df = r_utils.predict_next_timestep_logit(transition_model, self.rpy2_modules, pop, 'heating')
         prob_df.columns = [1.]
@@ -92,7 +92,7 @@ class HourlyWage(Base):
         # self.gee_transition_model = r_utils.load_transitions(f"hourly_wage/lmm/hourly_wage_LMM", self.rpy2Modules,
         #                                                      path=self.transition_dir)
         self.rf_transition_model = r_utils.load_transitions(f"hourly_wage/rf/hourly_wage_RF", self.rpy2Modules,
-                                                             path=self.transition_dir)
+                                                             path=self.transition_dir, cache=self.transition_model_cache)
         #self.history_data = self.generate_history_dataframe("final_US", [2018, 2019], view_columns)
         #self.history_data["hh_income_diff"] = self.history_data['hh_income'] - self.history_data.groupby(['pidp'])['hh_income'].shift(1)
 
@@ -0,0 +1,266 @@
+"""
+Household membership index (hidp -> members) shared by modules that work at the household level.
+
+Modules like fertility, ageing and the energy interventions need household reductions every time step (max nkids in a
+household, first child age chain, any retired member etc.). Doing each of these with groupby('hidp') or
+hidp.isin(...) hashes the whole population every time. HouseholdIndex keeps household codes in CSR form instead: the
+household code of each simulant and the members of each household as offsets into a single array. Reductions are
+then single passes over integer codes.
+
+The index is built when the population is loaded and changed incrementally after that. Households get codes in the
+order they are first seen, so new households never recode existing simulants. New simulants (replenishment, births)
+are inserted at the end of their household's members. Deaths are marked in a tombstone mask and simulants moving
+household get a new code, leaving a stale entry in their old household's members. Stale entries are dropped in one
+rebuild once they outnumber the current ones. update() compares the population it is given with the index and only
+changes the simulants that are new, moved or gone.
+
+The index is created in RunPipeline and shared through the builder data store as "household_index" (see Base.setup).
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class HouseholdIndex:
+    """ CSR style index of simulants by household id (hidp).
+
+    Each simulant keeps the slot it was added in until the next compaction.
+
+    Attributes
+    ----------
+    simulants : pd.Index
+        Simulant id of each slot, including removed simulants until the next compaction.
+    hidp_values : np.ndarray
+        Household id of each slot.
+    active : np.ndarray
+        Whether each slot holds a current simulant. False for removed simulants (tombstones).
+    hidps : pd.Index
+        Household ids in the order they were first seen. A household's code is its position in hidps.
+    codes : np.ndarray
+        Household code of each slot. -1 for simulants with a missing hidp.
+    order : np.ndarray
+        Slots grouped by household. Entries for household h are order[offsets[h]:offsets[h + 1]]. Entries of removed
+        or moved simulants are stale until the next compaction.
+    offsets : np.ndarray
+        Start of each household's entries in order. Length len(hidps) + 1.
+    """
+
+    def __init__(self, hidp=None):
+        self.simulants = pd.Index([], dtype='int64')
+        self.hidp_values = np.array([], dtype=float)
+        self.active = np.array([], dtype=bool)
+        self.hidps = pd.Index([], dtype=float)
+        self.codes = np.array([], dtype='int64')
+        self.order = np.array([], dtype='int64')
+        self.offsets = np.zeros(1, dtype='int64')
+        self.n_active = 0
+        self.n_stale = 0
+        # (index, slots) of the last simulant index looked up. Modules pass the same alive index for every reduction.
+        self._last_slots = None
+        if hidp is not None:
+            self.add_members(hidp)
+
+    def __len__(self):
+        return self.n_active
+
+    @property
+    def n_households(self):
+        return len(self.hidps)
+
+    def _encode(self, hidp_values, add=False):
+        """ Household code of each hidp value. -1 for missing values. Households not in the index get -1 or, if add is
+        True, are appended to hidps with no members."""
+        codes = self.hidps.get_indexer(hidp_values)
+        if add:
+            new = (codes < 0) & ~np.isnan(hidp_values)
+            if new.any():
+                new_hidps = pd.unique(hidp_values[new])
+                self.hidps = self.hidps.append(pd.Index(new_hidps, dtype=float))
+                self.offsets = np.concatenate([self.offsets, np.full(len(new_hidps), self.offsets[-1])])
+                codes[new] = self.hidps.get_indexer(hidp_values[new])
+        return codes
+
+    def _slots(self, index):
+        """ Slot of each simulant in index. -1 for simulants not in the index."""
+        if self._last_slots is not None and (self._last_slots[0] is index or self._last_slots[0].equals(index)):
+            return self._last_slots[1]
+        slots = self.simulants.get_indexer(index)
+        self._last_slots = (index, slots)
+        return slots
+
+    def _insert(self, slots):
+        """ Add entries for slots at the end of their households' members."""
+        slots = slots[self.codes[slots] >= 0]
+        if not len(slots):
+            return
+        slots = slots[np.argsort(self.codes[slots], kind='stable')]
+        codes = self.codes[slots]
+        # np.insert keeps entries with the same insert position in order, so each household stays contiguous.
+        self.order = np.insert(self.order, self.offsets[codes + 1], slots)
+        counts = np.bincount(codes, minlength=self.n_households)
+        self.offsets = self.offsets + np.concatenate([[0], np.cumsum(counts)])
+
+    def _remove_slots(self, slots):
+        """ Mark slots as removed. Their entries in order become stale."""
+        if not len(slots):
+            return
+        self.active[slots] = False
+        self.n_active -= len(slots)
+        self.n_stale += int((self.codes[slots] >= 0).sum())
+
+    def _compact(self):
+        """ Drop removed simulants and stale entries once they outnumber current entries."""
+        if self.n_stale <= len(self.order) // 2:
+            return
+        keep = self.active
+        self.simulants = self.simulants[keep]
+        self.hidp_values = self.hidp_values[keep]
+        self.codes = self.codes[keep]
+        self.active = np.ones(len(self.simulants), dtype=bool)
+        known = self.codes >= 0
+        self.order = np.flatnonzero(known)[np.argsort(self.codes[known], kind='stable')]
+        counts = np.bincount(self.codes[known], minlength=self.n_households)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.n_stale = 0
+        self._last_slots = None
+
+    def add_members(self, hidp):
+        """ Add new simulants (initial population, replenishment, births) to the index.
+
+        Parameters
+        ----------
+        hidp : pd.Series
+            Household ids of new simulants indexed by simulant id.
+        """
+        hidp = hidp[~hidp.index.isin(self.simulants)]
+        if hidp.empty:
+            return
+        values = hidp.to_numpy(dtype=float)
+        start = len(self.simulants)
+        self.simulants = self.simulants.append(hidp.index)
+        self.hidp_values = np.concatenate([self.hidp_values, values])
+        self.active = np.concatenate([self.active, np.ones(len(values), dtype=bool)])
+        self.codes = np.concatenate([self.codes, self._encode(values, add=True)])
+        self.n_active += len(values)
+        self._last_slots = None
+        self._insert(np.arange(start, len(self.simulants)))
+
+    def remove_members(self, index):
+        """ Remove simulants (e.g. deaths) from the index.
+
+        Parameters
+        ----------
+        index : pd.Index
+            Ids of simulants to remove.
+        """
+        slots = self.simulants.get_indexer(index)
+        slots = slots[slots >= 0]
+        self._remove_slots(slots[self.active[slots]])
+        self._compact()
+
+    def update(self, hidp):
+        """ Make the index match the given population.
+
+        Only simulants that are new, have moved household or are no longer in hidp are changed. When the index is
+        already up to date (the usual case as Replenishment and Mortality maintain it) this is one comparison of the
+        household ids.
+
+        Parameters
+        ----------
+        hidp : pd.Series
+            Household ids of the current population indexed by simulant id.
+        """
+        slots = self._slots(hidp.index)
+        new = slots < 0
+        if new.any():
+            self.add_members(hidp[new])
+            slots = self._slots(hidp.index)
+        values = hidp.to_numpy(dtype=float)
+        current = self.hidp_values[slots]
+        changed = ~((current == values) | (np.isnan(current) & np.isnan(values))) | ~self.active[slots]
+        if changed.any():
+            changed_slots = slots[changed]
+            moved = self.active[changed_slots]
+            # old entries of moved simulants become stale. Removed simulants that are back were already counted.
+            self.n_stale += int((self.codes[changed_slots[moved]] >= 0).sum())
+            self.n_active += int((~moved).sum())
+            self.active[changed_slots] = True
+            self.hidp_values[changed_slots] = values[changed]
+            self.codes[changed_slots] = self._encode(values[changed], add=True)
+            self._insert(changed_slots)
+        if self.n_active > len(hidp):
+            # simulants in the index that aren't in the population any more.
+            in_population = np.zeros(len(self.simulants), dtype=bool)
+            in_population[slots] = True
+            self._remove_slots(np.flatnonzero(self.active & ~in_population))
+        self._compact()
+
+    def household_codes(self, index):
+        """ Household code of each simulant in index.
+
+        Parameters
+        ----------
+        index : pd.Index
+            Simulant ids. Must all be in the household index.
+        Returns
+        -------
+        codes : np.ndarray
+        """
+        slots = self._slots(index)
+        missing = (slots < 0) | ~self.active[slots]
+        if missing.any():
+            raise KeyError(f"{missing.sum()} simulants are missing from the household index. "
+                           f"Call update() with the current population first.")
+        return self.codes[slots]
+
+    def members(self, hidp):
+        """ Ids of the simulants living in household hidp."""
+        code = self._encode(np.array([hidp], dtype=float))[0]
+        if code < 0:
+            return self.simulants[:0]
+        slots = self.order[self.offsets[code]:self.offsets[code + 1]]
+        # skip stale entries. A simulant who moved out and back has two entries.
+        slots = np.unique(slots[self.active[slots] & (self.codes[slots] == code)])
+        return self.simulants[slots]
+
+    def _broadcast(self, household_values, codes, index, fill=np.nan):
+        """ Give each simulant the value for their household. Simulants without a household get fill."""
+        result = np.append(household_values, fill)[np.where(codes < 0, len(household_values), codes)]
+        return pd.Series(result, index=index)
+
+    def household_max(self, values):
+        """ Maximum of values over each household broadcast back to its members. NaN values are skipped as with
+        groupby('hidp')[column].transform('max')."""
+        codes = self.household_codes(values.index)
+        known = codes >= 0
+        maxima = np.full(self.n_households, np.nan)
+        np.fmax.at(maxima, codes[known], values.to_numpy(dtype=float)[known])
+        return self._broadcast(maxima, codes, values.index)
+
+    def household_sum(self, values):
+        """ Sum of values over each household broadcast back to its members. NaN values are skipped."""
+        codes = self.household_codes(values.index)
+        known = codes >= 0
+        sums = np.bincount(codes[known], weights=np.nan_to_num(values.to_numpy(dtype=float)[known]),
+                           minlength=self.n_households)
+        return self._broadcast(sums, codes, values.index)
+
+    def household_any(self, values):
+        """ Whether any member of each household has a True value, broadcast back to its members. Equivalent to
+        hidp.isin(hidp[values]), including simulants with a missing hidp: isin matches NaN with NaN, so they are all
+        True if any of them is True."""
+        codes = self.household_codes(values.index)
+        known = codes >= 0
+        flags = values.to_numpy(dtype=bool)
+        counts = np.bincount(codes[known], weights=flags[known], minlength=self.n_households)
+        return self._broadcast(counts > 0, codes, values.index, fill=bool(flags[~known].any())).astype(bool)
+
+    def household_first(self, values):
+        """ First non missing value in each household (in the order of values) broadcast back to its members.
+        Works for any dtype, e.g. the child_ages chains. Equivalent to groupby('hidp')[column].transform('first')."""
+        codes = self.household_codes(values.index)
+        valid = np.flatnonzero((codes >= 0) & values.notna().to_numpy())
+        households, first = np.unique(codes[valid], return_index=True)
+        firsts = np.full(self.n_households, np.nan, dtype=object)
+        firsts[households] = values.to_numpy()[valid[first]]
+        return self._broadcast(firsts, codes, values.index).infer_objects()
@@ -93,16 +93,13 @@ class HousingTenure(Base):
         # Draw individuals next states randomly from this distribution.
         # Adjust other variables according to changes in state. E.g. a birth would increase child counter by one.
 
-        pop = self.population_view.get(event.index, query="alive=='alive'")
+        pop = self.get_alive_population(event.index)
         self.year = event.time.year
 
         housing_tenure_prob_df = self.calculate_housing_tenure(pop)
 
-        housing_tenure_prob_df["housing_tenure"] = self.random.choice(housing_tenure_prob_df.index,
-                                                                      list(housing_tenure_prob_df.columns),
-                                                                      housing_tenure_prob_df)
-
-        housing_tenure_prob_df.index = housing_tenure_prob_df.index.astype(int)
+        housing_tenure_prob_df.index = pop.index
+        housing_tenure_prob_df["housing_tenure"] = self.sample_categories(housing_tenure_prob_df, pop.index)
 
         # convert numeric prediction into string factors (low, medium, high)
         #housing_tenure_factor_dict = {}
@@ -136,14 +133,14 @@ class HousingTenure(Base):
             cols = ['Owned outright', 'Owned with mortgage', 'Local authority rent', 'Housing assoc rented',
                     'Rented from employer', 'Rented private unfurnished', 'Rented private furnished', 'Other']
 
-        transition_model = r_utils.load_transitions(f"housing_tenure/nnet/housing_tenure_{year}_{year+1}",
-                                                    self.rpy2Modules,
-                                                    path=self.transition_dir)
+        transition_model = self.transition_utils.load_transitions(f"housing_tenure/nnet/housing_tenure_{year}_{year+1}",
+                                                                  self.rpy2Modules,
+                                                                  path=self.transition_dir, cache=self.transition_model_cache)
         # returns probability matrix (3xn) of next ordinal state.
-        prob_df = r_utils.predict_nnet(transition_model,
-                                       self.rpy2Modules,
-                                       pop,
-                                       cols)
+        prob_df = self.transition_utils.predict_nnet(transition_model,
+                                                     self.rpy2Modules,
+                                                     pop,
+                                                     cols)
         return prob_df
 
     def plot(self, pop, config):
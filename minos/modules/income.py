@@ -110,7 +110,7 @@ class Income(Base):
         logging.info("INCOME")
 
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         self.year = event.time.year
 
         ## Predict next income value
@@ -140,12 +140,12 @@ class Income(Base):
         """
         # load transition model based on year.
         year = min(self.year, 2019)
-        transition_model = r_utils.load_transitions(f"hh_income/ols/hh_income_{year}_{year + 1}", self.rpy2Modules,
-                                                   path=self.transition_dir)
-        nextWaveIncome = r_utils.predict_next_timestep_ols(transition_model,
-                                                           self.rpy2Modules,
-                                                           pop,
-                                                           dependent='hh_income')
+        transition_model = self.transition_utils.load_transitions(f"hh_income/ols/hh_income_{year}_{year + 1}", self.rpy2Modules,
+                                                                 path=self.transition_dir, cache=self.transition_model_cache)
+        nextWaveIncome = self.transition_utils.predict_next_timestep_ols(transition_model,
+                                                                         self.rpy2Modules,
+                                                                         pop,
+                                                                         dependent='hh_income')
         return nextWaveIncome
 
     def calculate_income_rateofchange(self, pop):
@@ -167,15 +167,15 @@ class Income(Base):
         else:
             year = min(self.year, 2019)
 
-        transition_model = r_utils.load_transitions(f"hh_income/ols_diff/hh_income_{year}_{year + 1}",
-                                                    self.rpy2Modules,
-                                                    path=self.transition_dir)
+        transition_model = self.transition_utils.load_transitions(f"hh_income/ols_diff/hh_income_{year}_{year + 1}",
+                                                                  self.rpy2Modules,
+                                                                  path=self.transition_dir, cache=self.transition_model_cache)
         # The calculation relies on the R predict method and the model that has already been specified
-        nextWaveIncome = r_utils.predict_next_timestep_ols(transition_model,
-                                                                self.rpy2Modules,
-                                                                pop,
-                                                                dependent='hh_income',
-                                                                year=self.year)
+        nextWaveIncome = self.transition_utils.predict_next_timestep_ols(transition_model,
+                                                                              self.rpy2Modules,
+                                                                              pop,
+                                                                              dependent='hh_income',
+                                                                              year=self.year)
         return nextWaveIncome
 
     def plot(self, pop, config):
@@ -256,7 +256,7 @@ class geeIncome(Base):
 
         # just load this once.
         self.gee_transition_model = r_utils.load_transitions(f"hh_income/gee/hh_income_GEE", self.rpy2Modules,
-                                                         path=self.transition_dir)
+                                                         path=self.transition_dir, cache=self.transition_model_cache)
         self.min_hh_income = None
 
     def on_initialize_simulants(self, pop_data):
@@ -286,7 +286,7 @@ class geeIncome(Base):
             The event time_step that called this function.
         """
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         self.year = event.time.year
         if self.min_hh_income == None:
             self.min_hh_income = np.min(pop["hh_income"])
@@ -339,15 +339,15 @@ class geeIncome(Base):
         """
         # load transition model based on year.
         year = min(self.year, 2019)
-        transition_model = r_utils.load_transitions(f"hh_income/ols/hh_income_{year}_{year + 1}",
-                                                    self.rpy2Modules,
-                                                    path=self.transition_dir)
+        transition_model = self.transition_utils.load_transitions(f"hh_income/ols/hh_income_{year}_{year + 1}",
+                                                                  self.rpy2Modules,
+                                                                  path=self.transition_dir, cache=self.transition_model_cache)
         # The calculation relies on the R predict method and the model that has already been specified
-        nextWaveIncome = r_utils.predict_next_timestep_ols(transition_model,
-                                                           self.rpy2Modules,
-                                                           pop,
-                                                           dependent='hh_income',
-                                                           year=self.year)
+        nextWaveIncome = self.transition_utils.predict_next_timestep_ols(transition_model,
+                                                                         self.rpy2Modules,
+                                                                         pop,
+                                                                         dependent='hh_income',
+                                                                         year=self.year)
         return nextWaveIncome
 
     def plot(self, pop, config):
@@ -443,7 +443,7 @@ class geeYJIncome(Base):
         #self.gee_transition_model = r_utils.load_transitions(f"hh_income/gee_yj/hh_income_GEE_YJ", self.rpy2Modules,
         #                                             path=self.transition_dir)
         self.gee_transition_model = r_utils.load_transitions(f"hh_income/gee_yj_gamma/hh_income_GEE_YJ_GAMMA", self.rpy2Modules,
-                                                             path=self.transition_dir)
+                                                             path=self.transition_dir, cache=self.transition_model_cache)
         self.history_data = self.generate_history_dataframe("final_US", [2018, 2019, 2020], view_columns)
 
     def on_initialize_simulants(self, pop_data):
@@ -473,7 +473,7 @@ class geeYJIncome(Base):
             The event time_step that called this function.
         """
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         pop = pop.sort_values('pidp')
         self.year = event.time.year
 
@@ -602,22 +602,23 @@ class lmmYJIncome(Base):
         #                'weight',
         #                #'housing_quality',
         #                'job_sector']
-        view_columns = ["age",
-                        "sex",
-                        "ethnicity",
-                        "region",
-                        "education_state",
-                        'job_sec',
-                        'SF_12',
-                        'pidp',
-                        'hh_income',
-                        'hh_income_diff',
-                        'S7_labour_state'
-                        ]
+        # just load this once.
+        #self.gee_transition_model = r_utils.load_transitions(f"hh_income/gee_yj/hh_income_GEE_YJ", self.rpy2Modules,
+        #                                             path=self.transition_dir)
+        #self.gee_transition_model = r_utils.load_transitions(f"hh_income/gee_diff/hh_income_GEE_DIFF", self.rpy2Modules,
+        #                                                     path=self.transition_dir)
+        self.gee_transition_model = self.transition_utils.load_transitions(f"hh_income/glmm/hh_income_new_GLMM", self.rpy2Modules,
+                                                                           path=self.transition_dir,
+                                                                           cache=builder.data.load("transition_model_cache"))
 
+        # In this case, view_columns are taken straight from the transition model.
+        # hh_income_new is a copy of hh_income made in on_time_step.
+        view_columns = self.get_model_view_columns(builder,
+                                                   {"hh_income_new_GLMM": self.gee_transition_model},
+                                                   columns=['pidp', 'hh_income', 'hh_income_diff'],
+                                                   derived=['hh_income_new'])
 
         #columns_created = ['hh_income_diff']
-        # view_columns += self.transition_model.rx2('model').names
         self.population_view = builder.population.get_view(columns=view_columns)# + columns_created)
 
         # Population initialiser. When new individuals are added to the microsimulation a constructer is called for each
@@ -630,13 +631,6 @@ class lmmYJIncome(Base):
         # builder.event.register_listener("time_step", self.on_time_step, priority=self.priority)
         super().setup(builder)
 
-        # just load this once.
-        #self.gee_transition_model = r_utils.load_transitions(f"hh_income/gee_yj/hh_income_GEE_YJ", self.rpy2Modules,
-        #                                             path=self.transition_dir)
-        #self.gee_transition_model = r_utils.load_transitions(f"hh_income/gee_diff/hh_income_GEE_DIFF", self.rpy2Modules,
-        #                                                     path=self.transition_dir)
-        self.gee_transition_model = r_utils.load_transitions(f"hh_income/glmm/hh_income_new_GLMM", self.rpy2Modules,
-                                                             path=self.transition_dir)
         #self.history_data = self.generate_history_dataframe("final_US", [2018, 2019], view_columns)
         #self.history_data["hh_income_diff"] = self.history_data['hh_income'] - self.history_data.groupby(['pidp'])['hh_income'].shift(1)
 
@@ -667,7 +661,7 @@ class lmmYJIncome(Base):
             The event time_step that called this function.
         """
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         #pop = pop.sort_values('pidp')
         self.year = event.time.year
         pop['hh_income_new'] = pop['hh_income']
@@ -701,14 +695,17 @@ class lmmYJIncome(Base):
         nextWaveIncome: pd.Series
             Vector of new household incomes from OLS prediction.
         """
+        # gaussian plus clipped cauchy noise on the transformed scale.
+        noise = (self.generate_gaussian_noise(pop.index, 0, 0.175, additional_key='transition_noise') +
+                 self.generate_cauchy_noise(pop.index, 0, 0.005, clip=5, additional_key='transition_cauchy_noise'))  #0.45 for yj. 100? for non yj.
         # load transition model based on year.
-        nextWaveIncome = r_utils.predict_next_timestep_yj_gamma_glmm(self.gee_transition_model,
-                                                                       self.rpy2Modules,
-                                                                       pop,
-                                                                       dependent='hh_income_new',
-                                                                       yeo_johnson=True,
-                                                                       reflect=False,
-                                                                       noise_std=0.175)  #0.45 for yj. 100? for non yj.
+        nextWaveIncome = self.transition_utils.predict_next_timestep_yj_gamma_glmm(self.gee_transition_model,
+                                                                                     self.rpy2Modules,
+                                                                                     pop,
+                                                                                     dependent='hh_income_new',
+                                                                                     yeo_johnson=True,
+                                                                                     reflect=False,
+                                                                                     noise=noise)
         # get new hh income diffs and update them into history_data.
         #self.update_history_dataframe(pop, self.year-1)
         #new_history_data = self.history_data.loc[self.history_data['time']==self.year].index # who in current_year
@@ -811,8 +808,8 @@ class lmmDiffIncome(Base):
         #                                             path=self.transition_dir)
         #self.gee_transition_model = r_utils.load_transitions(f"hh_income/gee_diff/hh_income_GEE_DIFF", self.rpy2Modules,
         #                                                     path=self.transition_dir)
-        self.gee_transition_model = r_utils.load_transitions(f"hh_income/lmm_diff/hh_income_LMM_DIFF", self.rpy2Modules,
-                                                             path=self.transition_dir)
+        self.gee_transition_model = self.transition_utils.load_transitions(f"hh_income/lmm_diff/hh_income_LMM_DIFF", self.rpy2Modules,
+                                                                           path=self.transition_dir, cache=self.transition_model_cache)
         #self.history_data = self.generate_history_dataframe("final_US", [2018, 2019], view_columns)
         #self.history_data["hh_income_diff"] = self.history_data['hh_income'] - self.history_data.groupby(['pidp'])['hh_income'].shift(1)
 
@@ -843,7 +840,7 @@ class lmmDiffIncome(Base):
             The event time_step that called this function.
         """
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         pop = pop.sort_values('pidp')
         self.year = event.time.year
 
@@ -900,13 +897,12 @@ class lmmDiffIncome(Base):
             Vector of new household incomes from OLS prediction.
         """
         # load transition model based on year.
-        nextWaveIncome = r_utils.predict_next_timestep_yj_gaussian_lmm(self.gee_transition_model,
-                                                                    self.rpy2Modules,
-                                                                    pop,
-                                                                    dependent='hh_income_diff',
-                                                                    yeo_johnson = True,
-                                                                    reflect=False,
-                                                                    noise_std= 0.05)#0.45
+        nextWaveIncome = self.transition_utils.predict_next_timestep_yj_gaussian_lmm(self.gee_transition_model,
+                                                                                  self.rpy2Modules,
+                                                                                  pop,
+                                                                                  dependent='hh_income_diff',
+                                                                                  yeo_johnson = True,
+                                                                                  reflect=False)
         # get new hh income diffs and update them into history_data.
         #self.update_history_dataframe(pop, self.year-1)
         #new_history_data = self.history_data.loc[self.history_data['time']==self.year].index # who in current_year
@@ -88,8 +88,8 @@ class JobHours(Base):
         #                                             path=self.transition_dir)
         #self.gee_transition_model = r_utils.load_transitions(f"hh_income/gee_diff/hh_income_GEE_DIFF", self.rpy2Modules,
         #                                                     path=self.transition_dir)
-        self.gee_transition_model = r_utils.load_transitions(f"job_hours/lmm/job_hours_LMM", self.rpy2Modules,
-                                                             path=self.transition_dir)
+        self.gee_transition_model = self.transition_utils.load_transitions(f"job_hours/lmm/job_hours_LMM", self.rpy2Modules,
+                                                                           path=self.transition_dir, cache=self.transition_model_cache)
         #self.history_data = self.generate_history_dataframe("final_US", [2018, 2019], view_columns)
         #self.history_data["hh_income_diff"] = self.history_data['hh_income'] - self.history_data.groupby(['pidp'])['hh_income'].shift(1)
 
@@ -179,13 +179,12 @@ class JobHours(Base):
             Vector of new household incomes from OLS prediction.
         """
         # load transition model based on year.
-        nextWaveJobHours = r_utils.predict_next_timestep_yj_gamma_glmm(self.gee_transition_model,
-                                                                       self.rpy2Modules,
-                                                                       pop,
-                                                                       dependent='job_sec',
-                                                                       yeo_johnson=False,
-                                                                       reflect=False,
-                                                                       noise_std=5)  # 0.45 for yj. 5? for non yj.
+        nextWaveJobHours = self.transition_utils.predict_next_timestep_yj_gamma_glmm(self.gee_transition_model,
+                                                                                     self.rpy2Modules,
+                                                                                     pop,
+                                                                                     dependent='job_sec',
+                                                                                     yeo_johnson=False,
+                                                                                     reflect=False)
         # get new hh income diffs and update them into history_data.
         #self.update_history_dataframe(pop, self.year-1)
         #new_history_data = self.history_data.loc[self.history_data['time']==self.year].index # who in current_year
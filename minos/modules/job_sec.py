@@ -84,19 +84,16 @@ class JobSec(Base):
         # Draw individuals next states randomly from this distribution.
         # Adjust other variables according to changes in state. E.g. a birth would increase child counter by one.
 
-        pop = self.population_view.get(event.index, query="alive=='alive'")
+        pop = self.get_alive_population(event.index)
         self.year = event.time.year
 
         job_sec_prob_df = self.calculate_job_sec(pop)
 
-        job_sec_prob_df["job_sec"] = self.random.choice(job_sec_prob_df.index,
-                                                                list(job_sec_prob_df.columns),
-                                                                job_sec_prob_df)  # + 1
+        job_sec_prob_df.index = pop.index
+        job_sec_prob_df["job_sec"] = self.sample_categories(job_sec_prob_df, pop.index)  # + 1
         # NOTE: No longer adding 1 to the job_sec predicted value, as job_sec ranges from 0-8. When adding 1 we lose the
         # zero category
 
-        job_sec_prob_df.index = pop.index
-
         pop['job_sec'] = job_sec_prob_df['job_sec']
         pop['job_sec'][~pop['S7_labour_state'].isin(['PT Employed', 'FT Employed'])] = 0
 
@@ -119,9 +116,9 @@ class JobSec(Base):
         else:
             year = min(self.year, 2019)
 
-        transition_model = r_utils.load_transitions(f"job_sec/clm/job_sec_{year}_{year+1}", self.rpy2Modules, path=self.transition_dir)
+        transition_model = self.transition_utils.load_transitions(f"job_sec/clm/job_sec_{year}_{year+1}", self.rpy2Modules, path=self.transition_dir, cache=self.transition_model_cache)
         # returns probability matrix (3xn) of next ordinal state.
-        prob_df = r_utils.predict_next_timestep_clm(transition_model, self.rpy2Modules, pop, 'job_sec')
+        prob_df = self.transition_utils.predict_next_timestep_clm(transition_model, self.rpy2Modules, pop, 'job_sec')
         return prob_df
 
     def plot(self, pop, config):
@@ -101,13 +101,13 @@ class Labour(Base):
         # Separate the population into current students and everyone else. Then see if students max_educ is larger than
         # current education_state, if yes maintain student, if no predict new labour_state
 
-        pop = self.population_view.get(event.index, query="alive=='alive'")
+        pop = self.get_alive_population(event.index)
         self.year = event.time.year
 
         labour_prob_df = self.calculate_labour(pop)
 
-        labour_prob_df["labour_state"] = self.random.choice(labour_prob_df.index, list(labour_prob_df.columns), labour_prob_df)
         labour_prob_df.index = pop.index
+        labour_prob_df["labour_state"] = self.sample_categories(labour_prob_df, pop.index)
 
         self.population_view.update(labour_prob_df["labour_state"])
 
@@ -128,9 +128,9 @@ class Labour(Base):
 
         # load transition model based on year.
         year = min(self.year, 2018) # TODO just use latest model for now. Needs some kind of reweighting if extrapolating later.
-        transition_model = r_utils.load_transitions(f"labour/nnet/labour_nnet_{year}_{year+1}", self.rpy2Modules, path=self.transition_dir)
+        transition_model = self.transition_utils.load_transitions(f"labour/nnet/labour_nnet_{year}_{year+1}", self.rpy2Modules, path=self.transition_dir, cache=self.transition_model_cache)
         # returns probability matrix (9xn) of next ordinal state.
-        prob_df = r_utils.predict_nnet(transition_model, self.rpy2Modules, pop, cols)
+        prob_df = self.transition_utils.predict_nnet(transition_model, self.rpy2Modules, pop, cols)
         return prob_df
 
     def plot(self, pop, config):
@@ -45,9 +45,11 @@ class livingWageIntervention(Base):
         builder.population.initializes_simulants(self.on_initialize_simulants,
                                                  creates_columns=columns_created)
 
+        self.load_shared_state(builder)
+
         # Declare events in the module. At what times do individuals transition states from this module. E.g. when does
         # individual graduate in an education module.
-        builder.event.register_listener("time_step", self.on_time_step, priority=4)
+        builder.event.register_listener("time_step", self.profiled(builder, self.on_time_step), priority=4)
 
 
     def on_initialize_simulants(self, pop_data):
@@ -77,7 +79,8 @@ class livingWageIntervention(Base):
         logging.info(
             f"\tApplying effects of the living wage intervention in year {event.time.year}...")
 
-        pop = self.population_view.get(event.index, query="alive =='alive' and job_sector == 2")
+        pop = self.get_alive_population(event.index)
+        pop = pop.loc[pop['job_sector'] == 2].copy()
         # TODO probably a faster way to do this than resetting the whole column.
         #pop['hh_income'] -= pop['boost_amount']
         # reset boost amount to 0 before calculating next uplift
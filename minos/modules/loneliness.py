@@ -88,15 +88,13 @@ class Loneliness(Base):
         # Draw individuals next states randomly from this distribution.
         # Adjust other variables according to changes in state. E.g. a birth would increase child counter by one.
 
-        pop = self.population_view.get(event.index, query="alive=='alive'")
+        pop = self.get_alive_population(event.index)
         self.year = event.time.year
 
         loneliness_prob_df = self.calculate_loneliness(pop)
 
-        loneliness_prob_df["loneliness"] = self.random.choice(loneliness_prob_df.index,
-                                                              list(loneliness_prob_df.columns),
-                                                              loneliness_prob_df) + 1
         loneliness_prob_df.index = pop.index
+        loneliness_prob_df["loneliness"] = self.sample_categories(loneliness_prob_df, pop.index) + 1
 
         self.population_view.update(loneliness_prob_df["loneliness"].astype(int))
 
@@ -125,9 +123,9 @@ class Loneliness(Base):
         else:
             year = min(year, 2020)
 
-        transition_model = r_utils.load_transitions(f"loneliness/clm/loneliness_{year}_{year + 1}", self.rpy2Modules, path=self.transition_dir)
+        transition_model = self.transition_utils.load_transitions(f"loneliness/clm/loneliness_{year}_{year + 1}", self.rpy2Modules, path=self.transition_dir, cache=self.transition_model_cache)
         # returns probability matrix (3xn) of next ordinal state.
-        prob_df = r_utils.predict_next_timestep_clm(transition_model, self.rpy2Modules, pop, 'loneliness')
+        prob_df = self.transition_utils.predict_next_timestep_clm(transition_model, self.rpy2Modules, pop, 'loneliness')
         return prob_df
 
     def plot(self, pop, config):
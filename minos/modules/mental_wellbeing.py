@@ -115,7 +115,7 @@ class MWB(Base):
         self.year = event.time.year
 
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
 
         ## Predict next income value
         newWaveMWB = self.calculate_mwb(pop)
@@ -145,14 +145,14 @@ class MWB(Base):
         """
         # year can only be 2017 as its the only year with data for all vars
         year = 2017
-        transition_model = r_utils.load_transitions(f"SF_12/ols/SF_12_{year}_{year + 1}",
-                                                    self.rpy2Modules,
-                                                    path=self.transition_dir)
+        transition_model = self.transition_utils.load_transitions(f"SF_12/ols/SF_12_{year}_{year + 1}",
+                                                                  self.rpy2Modules,
+                                                                  path=self.transition_dir, cache=self.transition_model_cache)
 
-        return r_utils.predict_next_timestep_ols(transition_model,
-                                                      self.rpy2Modules,
-                                                      pop,
-                                                      'SF_12')
+        return self.transition_utils.predict_next_timestep_ols(transition_model,
+                                                                    self.rpy2Modules,
+                                                                    pop,
+                                                                    'SF_12')
 
     def calculate_mwb_rateofchange(self, pop):
         """Calculate income transition distribution based on provided people/indices
@@ -166,15 +166,15 @@ class MWB(Base):
         """
         # year can only be 2017 as its the only year with data for all vars
         year = 2017
-        transition_model = r_utils.load_transitions(f"SF_12/ols_diff/SF_12_{year}_{year + 1}",
-                                                    self.rpy2Modules,
-                                                    path=self.transition_dir)
+        transition_model = self.transition_utils.load_transitions(f"SF_12/ols_diff/SF_12_{year}_{year + 1}",
+                                                                  self.rpy2Modules,
+                                                                  path=self.transition_dir, cache=self.transition_model_cache)
 
-        return r_utils.predict_next_timestep_ols_diff(transition_model,
-                                                 self.rpy2Modules,
-                                                 pop,
-                                                 'SF_12',
-                                                 year=self.year)
+        return self.transition_utils.predict_next_timestep_ols_diff(transition_model,
+                                                               self.rpy2Modules,
+                                                               pop,
+                                                               'SF_12',
+                                                               year=self.year)
 
     def plot(self, pop, config):
         file_name = config.output_plots_dir + f"mwb_hist_{self.year}.pdf"
@@ -252,7 +252,7 @@ class geeMWB(Base):
 
         self.max_sf12 = None
         #only need to load this once for now.
-        self.gee_transition_model = r_utils.load_transitions(f"SF_12/gee/SF_12_GEE", self.rpy2_modules)
+        self.gee_transition_model = r_utils.load_transitions(f"SF_12/gee/SF_12_GEE", self.rpy2_modules, cache=self.transition_model_cache)
 
     def update_prediction_population(self, current_pop):
         """ Update longitudinal data frame of past observations with current information.
@@ -278,7 +278,7 @@ class geeMWB(Base):
         self.year = event.time.year
 
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         if self.max_sf12 == None:
             self.max_sf12 = np.max(pop["SF_12"])
             self.SF12_std = np.std(pop["SF_12"])
@@ -381,7 +381,7 @@ class geeYJMWB(Base):
         super().setup(builder)
 
         #only need to load this once for now.
-        self.gee_transition_model = r_utils.load_transitions(f"SF_12/gee_yj/SF_12_GEE_YJ", self.rpy2_modules, path=self.transition_dir)
+        self.gee_transition_model = r_utils.load_transitions(f"SF_12/gee_yj/SF_12_GEE_YJ", self.rpy2_modules, path=self.transition_dir, cache=self.transition_model_cache)
         #self.gee_transition_model = r_utils.load_transitions(f"SF_12/gee_yj_gamma/SF_12_GEE_YJ_GAMMA", self.rpy2_modules, path=self.transition_dir)
         self.history_data = self.generate_history_dataframe("final_US", [2014, 2017, 2020], view_columns)
 
@@ -396,7 +396,7 @@ class geeYJMWB(Base):
         self.year = event.time.year
 
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         pop = pop.sort_values('pidp') #sorting aligns index to make sure individual gets their correct prediction.
 
         # Predict next mwb value
@@ -469,21 +469,17 @@ class lmmYJMWB(Base):
         # columns_created is the columns created by this module.
         # view_columns is the columns from the main population used in this module.
         # In this case, view_columns are taken straight from the transition model
-        view_columns = ["age",
-                        "sex",
-                        "ethnicity",
-                        "region",
-                        "education_state",
-                        "housing_quality",
-                        "neighbourhood_safety",
-                        "loneliness",
-                        "nutrition_quality",
-                        "ncigs",
-                        'SF_12',
-                        'SF_12_diff',
-                        'pidp',
-                        'hh_income'
-                        ]
+        #only need to load this once for now.
+        #self.gee_transition_model = r_utils.load_transitions(f"SF_12/lmm/SF_12_LMM", self.rpy2_modules, path=self.transition_dir)
+        self.gee_transition_model = self.transition_utils.load_transitions(f"SF_12/glmm/SF_12_GLMM", self.rpy2_modules, path=self.transition_dir,
+                                                                           cache=builder.data.load("transition_model_cache"))
+
+        # In this case, view_columns are taken straight from the transition model.
+        # SF_12_last is a copy of SF_12 made in on_time_step.
+        view_columns = self.get_model_view_columns(builder,
+                                                   {"SF_12_GLMM": self.gee_transition_model},
+                                                   columns=['pidp', 'SF_12', 'SF_12_diff'],
+                                                   derived=['SF_12_last'])
 
         self.population_view = builder.population.get_view(columns=view_columns)
 
@@ -497,10 +493,6 @@ class lmmYJMWB(Base):
         # builder.event.register_listener("time_step", self.on_time_step, priority=self.priority)
         super().setup(builder)
 
-        #only need to load this once for now.
-        #self.gee_transition_model = r_utils.load_transitions(f"SF_12/lmm/SF_12_LMM", self.rpy2_modules, path=self.transition_dir)
-        self.gee_transition_model = r_utils.load_transitions(f"SF_12/glmm/SF_12_GLMM", self.rpy2_modules, path=self.transition_dir)
-
     def on_time_step(self, event):
         """Produces new children and updates parent status on time steps.
         Parameters
@@ -511,7 +503,7 @@ class lmmYJMWB(Base):
 
         self.year = event.time.year
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         pop = pop.sort_values('pidp') #sorting aligns index to make sure individual gets their correct prediction.
         pop["SF_12_last"] = pop["SF_12"]
 
@@ -544,13 +536,13 @@ class lmmYJMWB(Base):
         Returns
         -------
         """
-        out_data = r_utils.predict_next_timestep_yj_gamma_glmm(self.gee_transition_model,
-                                                               self.rpy2_modules,
-                                                               current= pop,
-                                                               dependent='SF_12',
-                                                               reflect=True,
-                                                               yeo_johnson= True,
-                                                               noise_std= 0.1)# 5 for non yj, 0.35 for yj
+        out_data = self.transition_utils.predict_next_timestep_yj_gamma_glmm(self.gee_transition_model,
+                                                                             self.rpy2_modules,
+                                                                             current= pop,
+                                                                             dependent='SF_12',
+                                                                             reflect=True,
+                                                                             yeo_johnson= True,
+                                                                             noise=self.generate_laplace_noise(pop.index, 0, 0.1, additional_key='transition_noise'))# 5 for non yj, 0.35 for yj
         return out_data
 
 
@@ -625,7 +617,7 @@ class lmmDiffMWB(Base):
         #only need to load this once for now.
         #self.gee_transition_model = r_utils.load_transitions(f"SF_12/gee_yj/SF_12_GEE_YJ", self.rpy2_modules, path=self.transition_dir)
         #self.gee_transition_model = r_utils.load_transitions(f"SF_12/gee_yj_gamma/SF_12_GEE_YJ_GAMMA", self.rpy2_modules, path=self.transition_dir)
-        self.gee_transition_model = r_utils.load_transitions(f"SF_12/lmm_diff/SF_12_LMM_DIFF", self.rpy2_modules, path=self.transition_dir)
+        self.gee_transition_model = self.transition_utils.load_transitions(f"SF_12/lmm_diff/SF_12_LMM_DIFF", self.rpy2_modules, path=self.transition_dir, cache=self.transition_model_cache)
         #self.history_data = self.generate_history_dataframe("final_US", [2014, 2017, 2020], view_columns)
 
     def on_initialize_simulants(self, pop_data):
@@ -656,7 +648,7 @@ class lmmDiffMWB(Base):
 
         self.year = event.time.year
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         pop = pop.sort_values('pidp') #sorting aligns index to make sure individual gets their correct prediction.
 
         # Predict next mwb value
@@ -685,12 +677,11 @@ class lmmDiffMWB(Base):
         -------
         """
         #self.update_history_dataframe(pop, self.year, lag=10)
-        out_data = r_utils.predict_next_timestep_yj_gaussian_lmm(self.gee_transition_model,
-                                                                 self.rpy2_modules,
-                                                                 current= pop,
-                                                                 dependent='SF_12_diff',
-                                                                 reflect=False,
-                                                                 yeo_johnson=True,
-                                                                 noise_std= 0.35)#1
+        out_data = self.transition_utils.predict_next_timestep_yj_gaussian_lmm(self.gee_transition_model,
+                                                                               self.rpy2_modules,
+                                                                               current= pop,
+                                                                               dependent='SF_12_diff',
+                                                                               reflect=False,
+                                                                               yeo_johnson=True)
         #return out_data.iloc[self.history_data.loc[self.history_data['time'] == self.year].index]
         return out_data
\ No newline at end of file
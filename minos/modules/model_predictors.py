@@ -0,0 +1,75 @@
+"""
+Predictor variables and factor levels of transition models.
+
+Modules used to hard code the population columns they send to their transition models. ModelPredictors holds what a
+fitted model actually needs instead, read once from the model itself (r_utils.get_model_predictors for .rds models,
+native_utils.get_model_predictors for exports). Modules build their population view from it (see
+Base.get_model_view_columns) and the initial population is checked against it, so a missing column or a factor level
+the model has never seen fails during simulation setup rather than in R part way through a run.
+"""
+
+import re
+
+from minos.modules.native_utils import as_character
+
+# Factor terms whose levels are the values of a single population column e.g. sex, factor(job_sec).
+FACTOR_TERM = re.compile(r"^(?:(?:as\.)?factor\()?\s*([A-Za-z_.][A-Za-z0-9_.]*)\s*\)?$")
+
+
+class ModelPredictors:
+    """ Variables and factor levels a transition model predicts from.
+
+    Attributes
+    ----------
+    variables : list
+        Every variable in the model formula, response included.
+    response : list
+        Variables in the response of the formula.
+    levels : dict
+        Population column to the factor levels seen when fitting. Only columns used directly as factors are listed.
+    """
+
+    def __init__(self, variables, response=(), levels=None):
+        self.variables = list(variables)
+        self.response = list(response)
+        self.levels = {}
+        for term, term_levels in (levels or {}).items():
+            match = FACTOR_TERM.match(term)
+            if match and match.group(1) in self.variables and match.group(1) not in self.response:
+                self.levels[match.group(1)] = [str(level) for level in term_levels]
+
+    def __repr__(self):
+        return f"ModelPredictors({self.variables})"
+
+    def columns(self, derived=()):
+        """ Population columns needed to predict. derived are columns the module creates before predicting (e.g.
+        hh_income_new) so they aren't taken from the population."""
+        return [variable for variable in self.variables if variable not in derived]
+
+    def check(self, pop, name='', derived=()):
+        """ Check pop can be predicted from.
+
+        Parameters
+        ----------
+        pop : pd.DataFrame
+            Population to predict for.
+        name : str
+            Model name for error messages.
+        derived : Iterable[str]
+            Columns the module creates before predicting.
+        Raises
+        ------
+        ValueError
+            If a predictor column is missing or has values the model wasn't fitted with.
+        """
+        missing = [column for column in self.columns(derived) if column not in pop.columns]
+        if missing:
+            raise ValueError(f"Transition model {name} needs columns {missing} which are not in the population.")
+        for column, levels in self.levels.items():
+            if column in derived:
+                continue
+            values = {as_character(value) for value in pop[column].dropna().unique()}
+            new_levels = sorted(values - set(levels))
+            if new_levels:
+                raise ValueError(f"Transition model {name} was not fitted with levels {new_levels} of {column}. "
+                                 f"Known levels are {levels}.")
@@ -123,6 +123,7 @@ class Mortality(Base):
                                    'exit_time': pd.NaT},
                                   index=pop_data.index)
         self.population_view.update(pop_update)
+        self.population_context.add_simulants(pop_data.index)
 
     def on_time_step(self, event):
         """Produces new children and updates parent status on time steps.
@@ -135,8 +136,12 @@ class Mortality(Base):
 
         logging.info("MORTALITY")
 
+        # Mortality is the first module to use the alive status each time step. Refresh the shared alive mask from the
+        # population once here so later modules don't each query it.
+        self.population_context.refresh(self.population_view.get(event.index)['alive'])
         # Get everyone who is alive and calculate their rate of death.
-        pop = self.population_view.get(event.index, query="alive =='alive' and sex != 'nan'")
+        pop = self.get_alive_population(event.index)
+        pop = pop.loc[pop['sex'] != 'nan']
         # Convert these rates to probabilities of death or not death.
         prob_df = rate_to_probability(pd.DataFrame(self.mortality_rate(pop.index)))
         prob_df['no_death'] = 1 - prob_df.sum(axis=1)
@@ -156,6 +161,8 @@ class Mortality(Base):
             dead_pop['exit_time'] = event.time
             dead_pop['years_of_life_lost'] = self.life_expectancy(dead_pop.index) - pop.loc[dead_pop.index]['age']
             self.population_view.update(dead_pop[['alive', 'exit_time', 'cause_of_death', 'years_of_life_lost']])
+            self.household_index.remove_members(dead_pop.index)
+            self.population_context.mark_dead(dead_pop.index)
 
     def calculate_mortality_rate(self, index):
         """ Calculate the rate of death for each individual.
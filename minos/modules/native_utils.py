@@ -0,0 +1,924 @@
+"""
+Native (NumPy) versions of the transition model predict functions in r_utils.
+
+Transition models are fitted in R and saved as .rds files. minos/transitions/export_transitions.R (make
+export_transitions) writes the coefficients, factor levels, random intercepts and transform parameters of each model
+to a .json file next to it. This module rebuilds the fixed effects design from that export so predictions never have
+to round trip the population through rpy2.
+
+Function names and signatures match r_utils so a module can use either. The rpy2_modules argument is accepted and
+ignored. Which modules use this backend is set by the native_prediction list in the config (see Base.pre_setup).
+"""
+
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit, ndtr
+
+from minos.modules.profiling import ROW_COUNTER
+
+
+def load_transitions(component, rpy2_modules=None, path='data/transitions/', cache=None):
+    """
+    Load a transition model exported from its .rds file by export_transitions.R.
+
+    Parameters
+    ----------
+    component : String
+        Component to load transition for, as string
+    rpy2_modules : dict
+        Unused. Kept to match r_utils.load_transitions.
+    path : String
+        Path to transitions folder
+    cache : r_utils.TransitionModelCache
+        (Optional) Shared cache of loaded models. If given the model is only read from disk once.
+
+    Returns:
+    -------
+    A NativeTransitionModel for prediction.
+    """
+    filename = f"{path}/{component}.json"
+    if not os.path.exists(filename):
+        raise FileNotFoundError(f"No native export found for transition model {component} at {filename}. "
+                                f"Run 'make export_transitions' after estimating the transition models.")
+    if cache is not None:
+        return cache.get(filename, _read_export)
+    return _read_export(filename)
+
+
+def _read_export(filename):
+    with open(filename) as model_file:
+        return NativeTransitionModel(json.load(model_file))
+
+
+# Inverse link functions (cumulative distribution functions) of ordinal::clm.
+CUMULATIVE_LINKS = {'logit': expit,
+                    'probit': ndtr,
+                    'cloglog': lambda x: -np.expm1(-np.exp(x)),
+                    'loglog': lambda x: np.exp(-np.exp(-x)),
+                    'cauchit': lambda x: 0.5 + np.arctan(x) / np.pi,
+                    }
+
+
+class NativeTransitionModel:
+    """ Fixed (and random intercept) effects of a fitted lm/lmer/glmer model exported from R.
+
+    Mimics R's predict(..., newdata=current, type='response', allow.new.levels=TRUE). Each model frame variable is
+    evaluated from its predvars expression, so scale() terms use the centre and scale stored when fitting exactly as R
+    does. Factors use treatment contrasts with the levels seen when fitting.
+
+    Ordinal (clm) and multinomial (nnet multinom) models give a probability for each response level instead (see
+    predict_probabilities). Zero inflated (pscl zeroinfl) models give their count mean and zero probability (see
+    predict_zero_inflated).
+    """
+
+    def __init__(self, spec):
+        self.model_class = spec['class']
+        self.link = spec['link']
+        self.transform = spec.get('transform')
+        self.min_value = spec.get('min_value')
+        self.max_value = spec.get('max_value')
+
+        for variable, contrast in (spec.get('contrasts') or {}).items():
+            if contrast != 'contr.treatment':
+                raise ValueError(f"Only treatment contrasts can be predicted natively. {variable} uses {contrast}.")
+
+        self.variables = spec['variables']
+        for variable in self.variables:
+            variable['expression'] = parse_r_expression(variable['predvar'])
+            variable['levels'] = variable.get('levels') or []
+
+        # Match coefficient names to variables (and factor levels) the same way model.matrix names its columns.
+        columns = {}
+        for i, variable in enumerate(self.variables):
+            if variable['type'] == 'numeric':
+                columns[variable['label']] = (i, None)
+            else:
+                for j, level in enumerate(variable['levels']):
+                    columns[variable['label'] + level] = (i, j)
+
+        self.intercept, self.main_effects, self.interactions = self._match_coefficients(spec['coefficients'], columns)
+        terms = [(self.intercept, self.main_effects, self.interactions)]
+
+        # clm: P(Y <= level j) = F(threshold_j - X*beta). multinom: one linear predictor per level after the first.
+        self.response_levels = spec.get('response_levels')
+        self.thresholds = None
+        if spec.get('thresholds'):
+            self.thresholds = np.asarray(spec['thresholds']['values'], dtype=float)
+        self.class_terms = [self._match_coefficients(coefficients, columns)
+                            for coefficients in spec.get('class_coefficients') or []]
+        terms += self.class_terms
+        # zeroinfl: coefficients has the count component and zero_coefficients the zero component.
+        self.zero_link = spec.get('zero_link')
+        self.zero_terms = None
+        if spec.get('zero_coefficients'):
+            self.zero_terms = self._match_coefficients(spec['zero_coefficients'], columns)
+            terms.append(self.zero_terms)
+
+        self.random_effects = {}
+        random_effects = spec.get('random_effects') or {}
+        for group, effects in random_effects.items():
+            self.random_effects[group] = (pd.Index(effects['levels']), np.append(effects['values'], 0.))
+
+        self.used_variables = sorted({i for _, main_effects, interactions in terms
+                                      for i in list(main_effects) + [i for _, parts in interactions for i, _ in parts]})
+
+    def _match_coefficients(self, coefficients, columns):
+        """ Intercept, main effects (variable index to coefficient or coefficient per factor level) and interactions
+        from exported coefficient names and values."""
+        intercept = 0.
+        main_effects = {}
+        interactions = []
+        for name, value in zip(coefficients['names'], coefficients['values']):
+            # coefficients for aliased columns are NA in R and dropped from the prediction.
+            value = 0. if value is None else float(value)
+            if name == '(Intercept)':
+                intercept = value
+            elif name in columns:
+                i, j = columns[name]
+                if j is None:
+                    main_effects[i] = value
+                else:
+                    main_effects.setdefault(i, np.zeros(len(self.variables[i]['levels'])))[j] = value
+            elif all(part in columns for part in name.split(':')):
+                interactions.append((value, [columns[part] for part in name.split(':')]))
+            else:
+                raise ValueError(f"Could not match coefficient {name} to any variable in the exported model.")
+        return intercept, main_effects, interactions
+
+    @property
+    def required_columns(self):
+        """ Population columns needed to predict from this model."""
+        columns = set(self.random_effects)
+        for i in self.used_variables:
+            columns |= expression_names(self.variables[i]['expression'])
+        return sorted(columns)
+
+    def evaluate_variables(self, current, overrides=None):
+        """ Evaluate each variable used by the model. Numeric variables give float arrays and factors give codes
+        into their fitted levels (-1 for missing values)."""
+        values = {}
+        for i in self.used_variables:
+            variable = self.variables[i]
+            value = evaluate_r_expression(variable['expression'], current, overrides)
+            if variable['type'] == 'numeric':
+                values[i] = as_numeric(value)
+            else:
+                values[i] = level_codes(value, variable['levels'], variable['label'])
+        return values
+
+    def linear_predictor(self, current, overrides=None, values=None, terms=None):
+        """ Linear predictor X*beta + Z*b for the current population.
+
+        Parameters
+        ----------
+        current : pd.DataFrame
+            Population including the columns required for prediction.
+        overrides : dict
+            Optional columns used in place of those in current e.g. a transformed dependent variable.
+        values : dict
+            Optional variables already evaluated by evaluate_variables. Saves evaluating them again for each level of
+            a multinomial model.
+        terms : tuple
+            Optional (intercept, main_effects, interactions) to use instead of the model's own, e.g. one of
+            class_terms.
+        Returns
+        -------
+        eta : np.ndarray
+        """
+        n = current.shape[0]
+        if values is None:
+            values = self.evaluate_variables(current, overrides)
+        intercept, main_effects, interactions = terms or (self.intercept, self.main_effects, self.interactions)
+
+        eta = np.full(n, intercept)
+        for i, coefficient in main_effects.items():
+            if np.ndim(coefficient):
+                # index of -1 (missing) picks up the appended NaN.
+                eta += np.append(coefficient, np.nan)[values[i]]
+            else:
+                eta += coefficient * values[i]
+        for coefficient, parts in interactions:
+            column = np.full(n, coefficient)
+            for i, j in parts:
+                if j is None:
+                    column *= values[i]
+                else:
+                    column *= np.where(values[i] < 0, np.nan, values[i] == j)
+            eta += column
+
+        for group, (levels, effects) in self.random_effects.items():
+            group_values = current[group].to_numpy() if overrides is None or group not in overrides else overrides[group]
+            if levels.inferred_type in ('integer', 'floating'):
+                index = levels.get_indexer(np.asarray(group_values, dtype=float))
+            else:
+                index = levels.get_indexer([as_character(value) for value in group_values])
+            # new levels are allowed and get no random effect.
+            eta += effects[index]
+
+        return eta
+
+    def predict(self, current, overrides=None):
+        """ Prediction on the response scale."""
+        ROW_COUNTER.predicted += current.shape[0]
+        eta = self.linear_predictor(current, overrides)
+        if self.link == 'identity':
+            return eta
+        elif self.link == 'log':
+            return np.exp(eta)
+        elif self.link == 'logit':
+            return 1 / (1 + np.exp(-eta))
+        raise ValueError(f"Link function {self.link} is not supported for native prediction.")
+
+    def predict_probabilities(self, current):
+        """ Probability of each response level for ordinal (clm) and multinomial (multinom) models.
+
+        Mimics predict(..., type='prob') for clm and predict(..., type='probs') for multinom. Rows with missing
+        predictors are all NaN.
+
+        Parameters
+        ----------
+        current : pd.DataFrame
+            Population including the columns required for prediction.
+        Returns
+        -------
+        probabilities : np.ndarray
+            n x k matrix with a column for each response level in order.
+        """
+        ROW_COUNTER.predicted += current.shape[0]
+        if self.thresholds is not None:
+            if self.link not in CUMULATIVE_LINKS:
+                raise ValueError(f"Link function {self.link} is not supported for native prediction.")
+            eta = self.linear_predictor(current)
+            cumulative = CUMULATIVE_LINKS[self.link](self.thresholds[np.newaxis, :] - eta[:, np.newaxis])
+            n = cumulative.shape[0]
+            cumulative = np.hstack([np.zeros((n, 1)), cumulative, np.ones((n, 1))])
+            # keep missing rows missing rather than giving the first and last levels 0 and 1.
+            cumulative[np.isnan(eta)] = np.nan
+            return np.diff(cumulative, axis=1)
+        if self.class_terms:
+            values = self.evaluate_variables(current)
+            etas = np.column_stack([np.zeros(current.shape[0])] +
+                                   [self.linear_predictor(current, values=values, terms=terms)
+                                    for terms in self.class_terms])
+            # softmax with the reference level fixed at 0. Subtracting the row maximum avoids overflow.
+            etas = np.exp(etas - etas.max(axis=1, keepdims=True))
+            return etas / etas.sum(axis=1, keepdims=True)
+        raise ValueError(f"{self.model_class} models have no response level probabilities.")
+
+    def predict_zero_inflated(self, current):
+        """ Count component mean and structural zero probability of a zero inflated model.
+
+        Mimics predict(..., type='count') and predict(..., type='zero') for pscl zeroinfl models (poisson or negbin)
+        with one evaluation of the predictors.
+
+        Parameters
+        ----------
+        current : pd.DataFrame
+            Population including the columns required for prediction.
+        Returns
+        -------
+        counts, zeros : np.ndarray
+        """
+        ROW_COUNTER.predicted += current.shape[0]
+        if self.zero_terms is None:
+            raise ValueError(f"{self.model_class} models have no zero component.")
+        if self.zero_link not in CUMULATIVE_LINKS:
+            raise ValueError(f"Zero link function {self.zero_link} is not supported for native prediction.")
+        values = self.evaluate_variables(current)
+        counts = np.exp(self.linear_predictor(current, values=values))
+        zeros = CUMULATIVE_LINKS[self.zero_link](self.linear_predictor(current, values=values, terms=self.zero_terms))
+        return counts, zeros
+
+
+def get_model_predictors(model, rpy2_modules=None):
+    """ Native version of r_utils.get_model_predictors. Variables and factor levels the exported model predicts from.
+
+    Parameters
+    ----------
+    model : NativeTransitionModel
+        Exported model loaded with load_transitions()
+    rpy2_modules : dict
+        Unused. Kept to match r_utils.
+    Returns
+    -------
+    predictors : ModelPredictors
+    """
+    # imported here as model_predictors imports this module.
+    from minos.modules.model_predictors import ModelPredictors
+    levels = {}
+    for i in model.used_variables:
+        variable = model.variables[i]
+        if variable['type'] != 'numeric':
+            levels[variable['predvar']] = variable['levels']
+    return ModelPredictors(model.required_columns, levels=levels)
+
+
+def predict_next_timestep_ols(model, rpy2_modules, current, dependent):
+    """
+    Native version of r_utils.predict_next_timestep_ols.
+
+    Parameters
+    ----------
+    model : NativeTransitionModel
+        Exported model loaded with load_transitions()
+    current : pd.DataFrame
+        View including columns that are required for prediction
+    dependent : str
+        The independent variable we are trying to predict
+
+    Returns:
+    -------
+    A prediction of the information for next timestep
+    """
+    return pd.DataFrame({dependent: model.predict(current)}, index=current.index)
+
+
+def predict_next_timestep_ols_diff(model, rpy2_modules, current, dependent, year):
+    """
+    Native version of r_utils.predict_next_timestep_ols_diff.
+
+    Returns:
+    -------
+    Dataframe with the new dependent value (new_dependent) and predicted difference (predicted).
+    """
+    prediction = pd.DataFrame({dependent: current[dependent], 'predicted': model.predict(current)},
+                              index=current.index)
+    prediction['new_dependent'] = prediction[[dependent, 'predicted']].sum(axis=1)
+    return prediction[['new_dependent', 'predicted']]
+
+
+def predict_next_timestep_clm(model, rpy2modules, current, dependent):
+    """
+    Native version of r_utils.predict_next_timestep_clm.
+
+    Parameters
+    ----------
+    model : NativeTransitionModel
+        Exported clm model loaded with load_transitions()
+    current : pd.DataFrame
+        View including columns that are required for prediction
+    dependent : str
+        The dependent variable we are trying to predict
+    Returns:
+    -------
+    Probability of each next state (one column per ordinal level) for each row of current.
+    """
+    return pd.DataFrame(model.predict_probabilities(current))
+
+
+def predict_nnet(model, rpy2Modules, current, columns):
+    """
+    Native version of r_utils.predict_nnet.
+
+    Parameters
+    ----------
+    model : NativeTransitionModel
+        Exported multinom model loaded with load_transitions()
+    current : pd.DataFrame
+        View including columns that are required for prediction
+    columns : Iterable[str]
+        List of potential output levels that have an associated probability
+    Returns
+    -------
+    Probability of each next state for each row of current.
+    """
+    return pd.DataFrame(model.predict_probabilities(current), columns=columns)
+
+
+def predict_next_timestep_zip(model, rpy2Modules, current, dependent, draws=None):
+    """
+    Native version of r_utils.predict_next_timestep_zip.
+
+    Parameters
+    ----------
+    model : NativeTransitionModel
+        Exported zeroinfl model loaded with load_transitions()
+    current : pd.DataFrame
+        View including columns that are required for prediction
+    dependent : str
+        The dependent variable we are trying to predict
+    draws : np.ndarray
+        (Optional) Uniform draws deciding who is a structural zero. See zero_inflated_draw.
+    Returns
+    -------
+    Next value of dependent for each row of current.
+    """
+    counts, zeros = model.predict_zero_inflated(current)
+    return zero_inflated_draw(counts, zeros, draws)
+
+
+def zero_inflated_draw(counts, zeros, draws=None):
+    """ Draw who is a structural zero and give everyone else their (rounded up) predicted count.
+
+    Parameters
+    ----------
+    counts : np.ndarray
+        Count component mean for each row.
+    zeros : np.ndarray
+        Probability of a structural zero for each row.
+    draws : np.ndarray or pd.Series
+        (Optional) Uniform draws, one per row. Pass draws from the module's randomness stream
+        (self.random.get_draw(index)) so they are common between runs. Defaults to np.random.uniform.
+    Returns
+    -------
+    np.ndarray
+    """
+    counts = np.asarray(counts, dtype=float)
+    zeros = np.asarray(zeros, dtype=float)
+    if draws is None:
+        draws = np.random.uniform(size=zeros.shape)
+    return np.ceil((np.asarray(draws, dtype=float) >= zeros) * counts)
+
+
+def sample_categories(probabilities, draws):
+    """ Inverse CDF sample of one category per row of a probability matrix.
+
+    The same draw and the same probabilities always give the same category, so passing vivarium common random number
+    draws (RandomnessStream.get_draw) keeps choices common between runs.
+
+    Parameters
+    ----------
+    probabilities : np.ndarray or pd.DataFrame
+        n x k matrix of probabilities. Rows are normalised to sum to 1.
+    draws : np.ndarray or pd.Series
+        n uniform draws in [0, 1).
+    Returns
+    -------
+    codes : np.ndarray
+        Column index of the category chosen for each row.
+    """
+    cumulative = np.cumsum(np.asarray(probabilities, dtype=float), axis=1)
+    cumulative /= cumulative[:, -1:]
+    codes = (np.asarray(draws, dtype=float)[:, np.newaxis] > cumulative).sum(axis=1)
+    # rounding can leave the last cumulative probability just below a draw.
+    return np.minimum(codes, cumulative.shape[1] - 1)
+
+
+def predict_next_timestep_yj_gaussian_lmm(model, rpy2_modules, current, dependent, reflect, yeo_johnson, noise=None):
+    """
+    Native version of r_utils.predict_next_timestep_yj_gaussian_lmm.
+
+    Parameters
+    ----------
+    model : NativeTransitionModel
+        Exported model loaded with load_transitions()
+    current : pd.DataFrame
+        View including columns that are required for prediction
+    dependent : str
+        The independent variable we are trying to predict
+    noise : np.ndarray
+        (Optional) Noise added to the prediction before inverting the transforms, one value per row of current.
+    Returns:
+    -------
+    A prediction of the information for next timestep
+    """
+    dependent_values = current[dependent].to_numpy(dtype=float)
+    if reflect:
+        dependent_values = model.max_value - dependent_values
+    if yeo_johnson:
+        dependent_values = yeo_johnson_transform(dependent_values, model.transform)
+
+    prediction = model.predict(current, overrides={dependent: dependent_values})
+
+    if noise is not None:
+        prediction = prediction + np.asarray(noise, dtype=float)
+
+    if yeo_johnson:
+        prediction = inverse_yeo_johnson_transform(prediction, model.transform)
+
+    if reflect:
+        prediction = model.max_value - prediction
+
+    return pd.DataFrame(prediction, columns=[dependent])
+
+
+def predict_next_timestep_yj_gamma_glmm(model, rpy2_modules, current, dependent, reflect, yeo_johnson, noise=None):
+    """
+    Native version of r_utils.predict_next_timestep_yj_gamma_glmm.
+
+    Parameters
+    ----------
+    model : NativeTransitionModel
+        Exported model loaded with load_transitions()
+    current : pd.DataFrame
+        View including columns that are required for prediction
+    dependent : str
+        The independent variable we are trying to predict
+    noise : np.ndarray
+        (Optional) Noise added to the prediction before inverting the transforms, one value per row of current.
+    Returns:
+    -------
+    A prediction of the information for next timestep
+    """
+    overrides = None
+    if reflect:
+        overrides = {dependent: model.max_value - current[dependent].to_numpy(dtype=float)}
+
+    prediction = model.predict(current, overrides=overrides)
+    prediction = prediction + (model.min_value - 0.001)  # invert shift to strictly positive values.
+
+    if noise is not None:
+        prediction = prediction + np.asarray(noise, dtype=float)
+
+    if yeo_johnson:
+        prediction = inverse_yeo_johnson_transform(prediction, model.transform)
+
+    if reflect:
+        prediction = model.max_value - prediction
+
+    return pd.DataFrame(prediction, columns=[dependent])
+
+
+def yeo_johnson_transform(x, transform):
+    """ Yeo-Johnson transform as in bestNormalize's predict.yeojohnson(inverse=FALSE).
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Values to transform.
+    transform : dict
+        lambda, mean, sd, standardize and eps of the fitted transform.
+    Returns
+    -------
+    np.ndarray
+        Transformed (and standardised if the transform was) values. Missing values stay missing.
+    """
+    x = np.asarray(x, dtype=float)
+    lam = transform['lambda']
+    eps = transform.get('eps', 0.001)
+    out = x.copy()
+    positive = x >= 0
+    negative = x < 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if abs(lam) < eps:
+            out[positive] = np.log1p(x[positive])
+        else:
+            out[positive] = ((x[positive] + 1) ** lam - 1) / lam
+        if abs(lam - 2) < eps:
+            out[negative] = -np.log1p(-x[negative])
+        else:
+            out[negative] = -((1 - x[negative]) ** (2 - lam) - 1) / (2 - lam)
+    if transform['standardize']:
+        out = (out - transform['mean']) / transform['sd']
+    return out
+
+
+def inverse_yeo_johnson_transform(x, transform):
+    """ Inverse Yeo-Johnson transform as in bestNormalize's predict.yeojohnson(inverse=TRUE).
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Values on the transformed scale.
+    transform : dict
+        lambda, mean, sd, standardize and eps of the fitted transform.
+    Returns
+    -------
+    np.ndarray
+        Values on the original scale. Missing values stay missing.
+    """
+    x = np.asarray(x, dtype=float)
+    if transform['standardize']:
+        x = x * transform['sd'] + transform['mean']
+    lam = transform['lambda']
+    eps = transform.get('eps', 0.001)
+    out = x.copy()
+    positive = x >= 0
+    negative = x < 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if abs(lam) < eps:
+            out[positive] = np.expm1(x[positive])
+        else:
+            out[positive] = (x[positive] * lam + 1) ** (1 / lam) - 1
+        if abs(lam - 2) < eps:
+            out[negative] = -np.expm1(-x[negative])
+        else:
+            out[negative] = 1 - (-(2 - lam) * x[negative] + 1) ** (1 / (2 - lam))
+    return out
+
+
+################################################
+# Evaluating R model formula (predvars) terms. #
+################################################
+
+_TOKEN_PATTERN = re.compile(r"""\s*(?:
+    (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?L?)
+    |(?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    |(?P<name>`[^`]+`|[A-Za-z.][A-Za-z0-9._]*)
+    |(?P<op>\*\*|==|!=|<=|>=|&&|\|\||[-+*/^<>!&|(),=])
+    )""", re.VERBOSE)
+
+_COMPARISONS = ('==', '!=', '<', '>', '<=', '>=')
+_CONSTANTS = {'TRUE': True, 'T': True, 'FALSE': False, 'F': False, 'NA': np.nan, 'pi': np.pi}
+
+
+def _tokenise(text):
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = _TOKEN_PATTERN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Could not parse R expression {text} at position {position}.")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'op' and value == '**':
+            value = '^'
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """ Recursive descent parser for the subset of R used in model formulae, following R's operator precedence."""
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = _tokenise(text)
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def take(self, value=None):
+        token = self.peek()
+        if value is not None and token[1] != value:
+            raise ValueError(f"Expected '{value}' in R expression {self.text}.")
+        self.position += 1
+        return token
+
+    def parse(self):
+        tree = self.parse_or()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unexpected trailing tokens in R expression {self.text}.")
+        return tree
+
+    def parse_or(self):
+        left = self.parse_and()
+        while self.peek() in (('op', '|'), ('op', '||')):
+            self.take()
+            left = ('binop', '|', left, self.parse_and())
+        return left
+
+    def parse_and(self):
+        left = self.parse_not()
+        while self.peek() in (('op', '&'), ('op', '&&')):
+            self.take()
+            left = ('binop', '&', left, self.parse_not())
+        return left
+
+    def parse_not(self):
+        if self.peek() == ('op', '!'):
+            self.take()
+            return ('not', self.parse_not())
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        left = self.parse_sum()
+        if self.peek()[0] == 'op' and self.peek()[1] in _COMPARISONS:
+            op = self.take()[1]
+            left = ('binop', op, left, self.parse_sum())
+        return left
+
+    def parse_sum(self):
+        left = self.parse_product()
+        while self.peek() in (('op', '+'), ('op', '-')):
+            op = self.take()[1]
+            left = ('binop', op, left, self.parse_product())
+        return left
+
+    def parse_product(self):
+        left = self.parse_unary()
+        while self.peek() in (('op', '*'), ('op', '/')):
+            op = self.take()[1]
+            left = ('binop', op, left, self.parse_unary())
+        return left
+
+    def parse_unary(self):
+        if self.peek() == ('op', '-'):
+            self.take()
+            return ('neg', self.parse_unary())
+        if self.peek() == ('op', '+'):
+            self.take()
+            return self.parse_unary()
+        return self.parse_power()
+
+    def parse_power(self):
+        base = self.parse_call()
+        if self.peek() == ('op', '^'):
+            self.take()
+            # ^ is right associative and binds tighter than unary minus on its left only.
+            return ('binop', '^', base, self.parse_unary())
+        return base
+
+    def parse_call(self):
+        kind, value = self.take()
+        if kind == 'number':
+            return ('const', float(value.rstrip('L')))
+        if kind == 'string':
+            return ('const', value[1:-1].replace('\\"', '"').replace("\\'", "'").replace('\\\\', '\\'))
+        if kind == 'op' and value == '(':
+            tree = self.parse_or()
+            self.take(')')
+            return tree
+        if kind != 'name':
+            raise ValueError(f"Unexpected token {value} in R expression {self.text}.")
+        name = value.strip('`')
+        if self.peek() != ('op', '('):
+            return ('name', name)
+        self.take('(')
+        args, kwargs = [], {}
+        while self.peek() != ('op', ')'):
+            if self.peek()[0] == 'name' and self.tokens[self.position + 1:self.position + 2] == [('op', '=')]:
+                key = self.take()[1].strip('`')
+                self.take('=')
+                kwargs[key] = self.parse_or()
+            else:
+                args.append(self.parse_or())
+            if self.peek() == ('op', ','):
+                self.take()
+        self.take(')')
+        return ('call', name, args, kwargs)
+
+
+def parse_r_expression(text):
+    """ Parse an R expression (as deparsed in a model's predvars) into a tree for evaluate_r_expression."""
+    return _Parser(text).parse()
+
+
+def expression_names(tree):
+    """ Set of variable names referenced by a parsed R expression."""
+    kind = tree[0]
+    if kind == 'name':
+        return set() if tree[1] in _CONSTANTS else {tree[1]}
+    if kind == 'call':
+        names = set()
+        for arg in list(tree[2]) + list(tree[3].values()):
+            names |= expression_names(arg)
+        return names
+    if kind in ('neg', 'not'):
+        return expression_names(tree[1])
+    if kind == 'binop':
+        return expression_names(tree[2]) | expression_names(tree[3])
+    return set()
+
+
+class _Factor:
+    """ Result of factor()/relevel() in an R expression. Levels come from the fitted model."""
+
+    def __init__(self, values):
+        self.values = values
+
+
+def as_character(value):
+    """ Render a single value the way R's as.character does for factor levels."""
+    if isinstance(value, (bool, np.bool_)):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        return str(int(value)) if float(value).is_integer() else f"{value:.15g}"
+    return str(value)
+
+
+def as_numeric(value):
+    """ Coerce an evaluated R expression to a float array. Missing logicals become NaN."""
+    if isinstance(value, _Factor):
+        raise TypeError("Cannot use a factor as a numeric variable.")
+    if isinstance(value, pd.api.extensions.ExtensionArray):
+        return value.to_numpy(dtype=float, na_value=np.nan)
+    return np.asarray(value, dtype=float)
+
+
+def level_codes(values, levels, label=''):
+    """ Zero based codes of values in the fitted factor levels. Missing values get -1.
+
+    Raises a ValueError for values that were not seen when fitting, as R's predict does for new factor levels.
+    """
+    if isinstance(values, _Factor):
+        values = values.values
+    codes, uniques = pd.factorize(values)
+    if len(uniques) == 0:
+        return codes
+    unique_codes = pd.Index(levels).get_indexer([as_character(value) for value in uniques])
+    if (unique_codes < 0).any():
+        new_levels = [as_character(value) for value, code in zip(uniques, unique_codes) if code < 0]
+        raise ValueError(f"factor {label} has new levels {', '.join(new_levels)}")
+    return np.where(codes < 0, -1, unique_codes[codes])
+
+
+def _logical(values, missing):
+    return pd.arrays.BooleanArray(np.asarray(values, dtype=bool), np.asarray(missing, dtype=bool))
+
+
+def _missing(value):
+    if isinstance(value, pd.api.extensions.ExtensionArray):
+        return np.asarray(value.isna())
+    return pd.isna(value)
+
+
+def _scale(x, center=True, scale=True):
+    """ R's scale() for a single column. centre and scale are recomputed from x (ignoring NA) when TRUE."""
+    x = as_numeric(x)
+    if center is True:
+        x = x - np.nanmean(x)
+    elif center is not False:
+        x = x - as_numeric(center)
+    if scale is True:
+        n = np.count_nonzero(~np.isnan(x))
+        x = x / np.sqrt(np.nansum(x ** 2) / max(1, n - 1))
+    elif scale is not False:
+        x = x / as_numeric(scale)
+    return x
+
+
+_FUNCTIONS = {
+    'I': lambda x: x,
+    'factor': lambda x, **kwargs: _Factor(x.values if isinstance(x, _Factor) else x),
+    'as.factor': lambda x: _Factor(x.values if isinstance(x, _Factor) else x),
+    'relevel': lambda x, ref=None: x,
+    'scale': _scale,
+    'c': lambda *args, **kwargs: np.concatenate([np.atleast_1d(as_numeric(arg))
+                                                 for arg in list(args) + list(kwargs.values())]),
+    'as.numeric': as_numeric,
+    'log': lambda x: np.log(as_numeric(x)),
+    'log1p': lambda x: np.log1p(as_numeric(x)),
+    'exp': lambda x: np.exp(as_numeric(x)),
+    'sqrt': lambda x: np.sqrt(as_numeric(x)),
+    'abs': lambda x: np.abs(as_numeric(x)),
+}
+
+
+def evaluate_r_expression(tree, current, overrides=None):
+    """ Evaluate a parsed R expression against population columns.
+
+    Parameters
+    ----------
+    tree : tuple
+        Output of parse_r_expression.
+    current : pd.DataFrame
+        Population providing any variables named in the expression.
+    overrides : dict
+        Optional arrays used in place of columns from current.
+    Returns
+    -------
+    Array of values (float, object or pandas BooleanArray) or a factor.
+    """
+    kind = tree[0]
+    if kind == 'const':
+        return tree[1]
+    if kind == 'name':
+        name = tree[1]
+        if overrides is not None and name in overrides:
+            return overrides[name]
+        if name in current.columns:
+            return current[name].to_numpy()
+        if name in _CONSTANTS:
+            return _CONSTANTS[name]
+        raise KeyError(f"Column {name} required by the transition model is missing from the population.")
+    if kind == 'call':
+        function = _FUNCTIONS.get(tree[1])
+        if function is None:
+            raise ValueError(f"R function {tree[1]} is not supported for native prediction.")
+        args = [evaluate_r_expression(arg, current, overrides) for arg in tree[2]]
+        kwargs = {key: evaluate_r_expression(arg, current, overrides) for key, arg in tree[3].items()}
+        return function(*args, **kwargs)
+    if kind == 'neg':
+        return -as_numeric(evaluate_r_expression(tree[1], current, overrides))
+    if kind == 'not':
+        value = evaluate_r_expression(tree[1], current, overrides)
+        return ~value if isinstance(value, pd.arrays.BooleanArray) else _logical(~np.asarray(value, dtype=bool),
+                                                                                 _missing(value))
+    op = tree[1]
+    left = evaluate_r_expression(tree[2], current, overrides)
+    right = evaluate_r_expression(tree[3], current, overrides)
+    if op in ('&', '|'):
+        left = left if isinstance(left, pd.arrays.BooleanArray) else _logical(left, _missing(left))
+        right = right if isinstance(right, pd.arrays.BooleanArray) else _logical(right, _missing(right))
+        return left & right if op == '&' else left | right
+    if op in _COMPARISONS:
+        missing = _missing(left) | _missing(right)
+        if any(isinstance(side, str) or getattr(side, 'dtype', None) == object for side in (left, right)):
+            left, right = np.asarray(left, dtype=object), np.asarray(right, dtype=object)
+        else:
+            left, right = as_numeric(left), as_numeric(right)
+        with np.errstate(invalid='ignore'):
+            result = {'==': np.equal, '!=': np.not_equal, '<': np.less, '>': np.greater,
+                      '<=': np.less_equal, '>=': np.greater_equal}[op](left, right)
+        return _logical(np.where(missing, False, result), missing)
+    left, right = as_numeric(left), as_numeric(right)
+    if op == '+':
+        return left + right
+    if op == '-':
+        return left - right
+    if op == '*':
+        return left * right
+    if op == '/':
+        return left / right
+    return left ** right
@@ -82,17 +82,14 @@ class Neighbourhood(Base):
         logging.info("NEIGHBOURHOOD SAFETY")
 
         # Get living people to update their neighbourhood
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         self.year = event.time.year
 
         # Predict next neighbourhood value
         neighbourhood_prob_df = self.calculate_neighbourhood(pop)
 
-        neighbourhood_prob_df["neighbourhood_safety"] = self.random.choice(neighbourhood_prob_df.index,
-                                                                           list(neighbourhood_prob_df.columns),
-                                                                           neighbourhood_prob_df) + 1
-
         neighbourhood_prob_df.index = pop.index
+        neighbourhood_prob_df["neighbourhood_safety"] = self.sample_categories(neighbourhood_prob_df, pop.index) + 1
 
         # Draw individuals next states randomly from this distribution.
         # Update population with new neighbourhood
@@ -125,9 +122,9 @@ class Neighbourhood(Base):
                 year -= 1  # e.g. 2012 moves back one year to 2011.
             year = min(year, 2017)  # transitions only go up to 2017.
 
-        transition_model = r_utils.load_transitions(f"neighbourhood_safety/clm/neighbourhood_safety_{year}_{year + 3}", self.rpy2Modules, path=self.transition_dir)
+        transition_model = self.transition_utils.load_transitions(f"neighbourhood_safety/clm/neighbourhood_safety_{year}_{year + 3}", self.rpy2Modules, path=self.transition_dir, cache=self.transition_model_cache)
         # The calculation relies on the R predict method and the model that has already been specified
-        nextWaveNeighbourhood = r_utils.predict_next_timestep_clm(transition_model, self.rpy2Modules, pop, 'neighbourhood_safety')
+        nextWaveNeighbourhood = self.transition_utils.predict_next_timestep_clm(transition_model, self.rpy2Modules, pop, 'neighbourhood_safety')
         return nextWaveNeighbourhood
 
     # Special methods used by vivarium.
@@ -83,7 +83,7 @@ class Nutrition(Base):
         self.year = event.time.year
 
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
 
         ## Predict next income value
         newWaveNutrition = self.calculate_nutrition(pop).round(0).astype(int)
@@ -107,11 +107,11 @@ class Nutrition(Base):
         -------
         """
         #year = min(self.year, 2018)
-        transition_model = r_utils.load_transitions(f"nutrition_quality/ols/nutrition_quality_2018_2019", self.rpy2Modules, path=self.transition_dir)
-        return r_utils.predict_next_timestep_ols(transition_model,
-                                                      self.rpy2Modules,
-                                                      pop,
-                                                      'nutrition_quality')
+        transition_model = self.transition_utils.load_transitions(f"nutrition_quality/ols/nutrition_quality_2018_2019", self.rpy2Modules, path=self.transition_dir, cache=self.transition_model_cache)
+        return self.transition_utils.predict_next_timestep_ols(transition_model,
+                                                                    self.rpy2Modules,
+                                                                    pop,
+                                                                    'nutrition_quality')
 
 
     # Special methods used by vivarium.
@@ -159,22 +159,18 @@ class lmmYJNutrition(Base):
         # columns_created is the columns created by this module.
         # view_columns is the columns from the main population used in this module.
         # In this case, view_columns are taken straight from the transition model
-        view_columns = ['time',
-                        "age",
-                        "sex",
-                        "ethnicity",
-                        "region",
-                        "education_state",
-                        'hh_income',
-                        'pidp',
-                        'hidp',
-                        'nutrition_quality',
-                        'nutrition_quality_diff',
-                        'ncigs',
-                        "SF_12"
-                        ]
+        # just load this once.
+        self.gee_transition_model = self.transition_utils.load_transitions(f"nutrition_quality/lmm/nutrition_quality_new_LMM", self.rpy2Modules,
+                                                                           path=self.transition_dir,
+                                                                           cache=builder.data.load("transition_model_cache"))
+
+        # In this case, view_columns are taken straight from the transition model.
+        # nutrition_quality_new is a copy of nutrition_quality made in on_time_step.
+        view_columns = self.get_model_view_columns(builder,
+                                                   {"nutrition_quality_new_LMM": self.gee_transition_model},
+                                                   columns=['pidp', 'nutrition_quality', 'nutrition_quality_diff'],
+                                                   derived=['nutrition_quality_new'])
 
-        #view_columns += self.transition_model.rx2('model').names
         self.population_view = builder.population.get_view(columns=view_columns)
 
         # Population initialiser. When new individuals are added to the microsimulation a constructer is called for each
@@ -187,9 +183,6 @@ class lmmYJNutrition(Base):
         # builder.event.register_listener("time_step", self.on_time_step, priority=self.priority)
         super().setup(builder)
 
-        # just load this once.
-        self.gee_transition_model = r_utils.load_transitions(f"nutrition_quality/lmm/nutrition_quality_new_LMM", self.rpy2Modules,
-                                                             path=self.transition_dir)
         #self.history_data = self.generate_history_dataframe("final_US", [2017, 2019, 2020], view_columns)
 
     def on_time_step(self, event):
@@ -203,7 +196,7 @@ class lmmYJNutrition(Base):
         self.year = event.time.year
 
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         pop = pop.sort_values('pidp')
         pop['nutrition_quality_new'] = pop['nutrition_quality']
 
@@ -232,13 +225,13 @@ class lmmYJNutrition(Base):
         Returns
         -------
         """
-        nextWaveNutrition = r_utils.predict_next_timestep_yj_gaussian_lmm(self.gee_transition_model,
-                                                                       self.rpy2Modules,
-                                                                       pop,
-                                                                       dependent='nutrition_quality_new',
-                                                                       reflect=False,
-                                                                       yeo_johnson= False,
-                                                                       noise_std=1)#
+        nextWaveNutrition = self.transition_utils.predict_next_timestep_yj_gaussian_lmm(self.gee_transition_model,
+                                                                                     self.rpy2Modules,
+                                                                                     pop,
+                                                                                     dependent='nutrition_quality_new',
+                                                                                     reflect=False,
+                                                                                     yeo_johnson= False,
+                                                                                     noise=self.generate_laplace_noise(pop.index, 0, 1, additional_key='transition_noise'))#
 
         return nextWaveNutrition
 
@@ -316,8 +309,8 @@ class lmmDiffNutrition(Base):
         super().setup(builder)
 
         # just load this once.
-        self.gee_transition_model = r_utils.load_transitions(f"nutrition_quality/lmm_diff/nutrition_quality_LMM_DIFF", self.rpy2Modules,
-                                                             path=self.transition_dir)
+        self.gee_transition_model = self.transition_utils.load_transitions(f"nutrition_quality/lmm_diff/nutrition_quality_LMM_DIFF", self.rpy2Modules,
+                                                                           path=self.transition_dir, cache=self.transition_model_cache)
         #self.history_data = self.generate_history_dataframe("final_US", [2017, 2019, 2020], view_columns)
 
     def on_initialize_simulants(self, pop_data):
@@ -350,7 +343,7 @@ class lmmDiffNutrition(Base):
         self.year = event.time.year
 
         # Get living people to update their income
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         pop = pop.sort_values('pidp')
         pop['nutrition_quality_last'] = pop['nutrition_quality']
 
@@ -378,13 +371,13 @@ class lmmDiffNutrition(Base):
         Returns
         -------
         """
-        nextWaveNutrition = r_utils.predict_next_timestep_yj_gaussian_lmm(self.gee_transition_model,
-                                                                        self.rpy2Modules,
-                                                                        pop,
-                                                                        dependent='nutrition_quality_diff',
-                                                                        reflect=False,
-                                                                        yeo_johnson= True,
-                                                                        noise_std=1.5)#
+        nextWaveNutrition = self.transition_utils.predict_next_timestep_yj_gaussian_lmm(self.gee_transition_model,
+                                                                                      self.rpy2Modules,
+                                                                                      pop,
+                                                                                      dependent='nutrition_quality_diff',
+                                                                                      reflect=False,
+                                                                                      yeo_johnson= True,
+                                                                                      noise=self.generate_laplace_noise(pop.index, 0, 1.5, additional_key='transition_noise'))#
 
         return nextWaveNutrition
     # Special methods used by vivarium.
@@ -0,0 +1,131 @@
+"""
+Per time step population context shared by every module.
+
+Nearly every module starts its time step with population_view.get(event.index, query="alive =='alive'"). That
+parses the query and compares every simulant's alive string once per module, 20 or so times a time step. Only
+Mortality (deaths) and new simulants (replenishment, births) change who is alive. PopulationContext keeps a boolean
+alive mask instead. Mortality refreshes it from the alive column at the top of its time step and marks deaths.
+Mortality's on_initialize_simulants adds new simulants, so everyone added by Replenishment or births is covered.
+Later modules get the alive index from the mask (see Base.get_alive_population).
+
+The context is created in RunPipeline and shared through the builder data store as "population_context" (see
+Base.setup). If it doesn't cover the requested simulants (e.g. Mortality isn't in the components) modules fall back to
+the alive query.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class PopulationContext:
+    """ Cached alive mask and alive subsets of the population.
+
+    Attributes
+    ----------
+    alive : pd.Series
+        Boolean alive status of each simulant indexed by simulant id.
+    version : int
+        Incremented whenever the alive mask changes. Cached subsets are only valid for one version.
+    """
+
+    def __init__(self):
+        self.alive = pd.Series([], dtype=bool)
+        self.version = 0
+        self._subsets = {}
+
+    def _changed(self):
+        """ Invalidate cached subsets after the alive mask changes."""
+        self.version += 1
+        self._subsets = {}
+
+    def refresh(self, alive):
+        """ Rebuild the mask from the alive column of the whole population.
+
+        Parameters
+        ----------
+        alive : pd.Series
+            alive column ('alive'/'dead') of the population indexed by simulant id.
+        """
+        mask = alive.to_numpy() == 'alive'
+        if self.alive.index.equals(alive.index) and np.array_equal(self.alive.to_numpy(), mask):
+            return
+        self.alive = pd.Series(mask, index=alive.index)
+        self._changed()
+
+    def add_simulants(self, index):
+        """ Add new (alive) simulants, e.g. replenishment cohorts and births.
+
+        Parameters
+        ----------
+        index : pd.Index
+            Ids of the new simulants.
+        """
+        index = index[~index.isin(self.alive.index)]
+        if index.empty:
+            return
+        self.alive = pd.concat([self.alive, pd.Series(True, index=index)])
+        self._changed()
+
+    def mark_dead(self, index):
+        """ Mark simulants as dead.
+
+        Parameters
+        ----------
+        index : pd.Index
+            Ids of simulants who died.
+        """
+        if index.empty:
+            return
+        self.alive.loc[index] = False
+        self._changed()
+
+    def covers(self, index):
+        """ Whether the mask knows the alive status of every simulant in index."""
+        if self.alive.index.equals(index):
+            return True
+        return bool(index.isin(self.alive.index).all())
+
+    def alive_index(self, index):
+        """ Simulants in index who are alive, in the order of index.
+
+        Parameters
+        ----------
+        index : pd.Index
+            Simulant ids, usually event.index.
+        Returns
+        -------
+        alive_index : pd.Index or None
+            Alive simulants. None if the context doesn't cover index and the caller should query the population.
+        """
+        if self.alive.index.equals(index):
+            return index[self.alive.to_numpy()]
+        if not self.covers(index):
+            return None
+        return index[self.alive.reindex(index).to_numpy(dtype=bool)]
+
+    def subset(self, name, index, function):
+        """ Cached subset of the alive simulants in index.
+
+        Only use this for subsets defined by alive status and columns that don't change during a time step (e.g. sex).
+        The cache is cleared whenever the alive mask changes, not when other columns change.
+
+        Parameters
+        ----------
+        name : str
+            Name of the subset, e.g. 'alive_female'.
+        index : pd.Index
+            Simulant ids, usually event.index.
+        function : callable
+            Takes the alive index and returns the subset index.
+        Returns
+        -------
+        subset : pd.Index or None
+            Subset index. None if the context doesn't cover index.
+        """
+        if name in self._subsets and self._subsets[name][0].equals(index):
+            return self._subsets[name][1]
+        alive_index = self.alive_index(index)
+        if alive_index is None:
+            return None
+        self._subsets[name] = (index, function(alive_index))
+        return self._subsets[name][1]
@@ -0,0 +1,228 @@
+"""
+Compact dtype schema for the simulation population frame.
+
+Most string columns of the population (alive, sex, region, ethnicity, labour state etc.) are Python objects, 50-100
+bytes per agent each, and integer states are int64 or float64. For large (UK scaled) populations this dominates
+memory. PopulationSchema declares compact dtypes instead:
+- categoricals for string columns with few values,
+- small ints for integer states,
+- float32 for continuous scores that don't need double precision.
+
+Categories are fixed when the population is loaded (Replenishment.on_initialize_simulants calls fit with the starting
+and replenishing populations) because vivarium won't update a categorical column with new categories. Every update is
+then coerced to the schema so modules can keep writing plain strings and ints (see SchemaPopulationView). Updates
+that can't be represented (an unknown category, a fractional value for an int column) raise an error rather than
+silently losing data.
+
+The schema is switched on with compact_dtypes: True in the config. It is created in RunPipeline and shared through the
+builder data store as "population_schema" (see Base.setup).
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import CategoricalDtype
+
+# String columns stored as categoricals. Categories are inferred from the input populations unless listed here.
+CATEGORICAL_COLUMNS = {'alive': ['alive', 'dead'],
+                       'sex': None,
+                       'region': None,
+                       'ethnicity': None,
+                       'S7_labour_state': None,
+                       'labour_state': None,
+                       'housing_quality': None,
+                       'S7_housing_quality': None,
+                       'S7_neighbourhood_safety': None,
+                       'marital_status': None,
+                       }
+
+# Integer states and their compact dtype. Only used if the column is integer valued when the population is loaded.
+SMALL_INT_COLUMNS = {'education_state': 'int8',
+                     'max_educ': 'int8',
+                     'S7_mental_health': 'int8',
+                     'S7_physical_health': 'int8',
+                     'job_sec': 'int8',
+                     'job_sector': 'int8',
+                     'housing_tenure': 'int8',
+                     'neighbourhood_safety': 'int8',
+                     'loneliness': 'int8',
+                     'financial_situation': 'int8',
+                     'heating': 'int8',
+                     'urban': 'int8',
+                     'smoker': 'int8',
+                     'phealth': 'int8',
+                     'depression': 'int8',
+                     'hh_comp': 'int8',
+                     'hhsize': 'int8',
+                     'nkids_ind': 'int8',
+                     'nutrition_quality_diff': 'int8',
+                     'birth_month': 'int8',
+                     'hh_int_m': 'int8',
+                     'time': 'int16',
+                     'birth_year': 'int16',
+                     'academic_year': 'int16',
+                     'hh_int_y': 'int16',
+                     }
+
+# Continuous scores kept as float32. Money (incomes, wages) and survey weights stay float64.
+FLOAT32_COLUMNS = ['SF_12',
+                   'SF_12p',
+                   'SF_12_diff',
+                   'nutrition_quality',
+                   'yearly_energy',
+                   'job_hours',
+                   'job_hours_diff',
+                   ]
+
+
+class PopulationSchema:
+    """ Compact dtypes for population columns.
+
+    Attributes
+    ----------
+    dtypes : dict
+        Column name to dtype for every column the schema applies to. Filled by fit.
+    """
+
+    def __init__(self, categorical=None, small_int=None, float32=None):
+        self.categorical = CATEGORICAL_COLUMNS if categorical is None else categorical
+        self.small_int = SMALL_INT_COLUMNS if small_int is None else small_int
+        self.float32 = FLOAT32_COLUMNS if float32 is None else float32
+        self.dtypes = {}
+
+    def fit(self, *frames):
+        """ Set the dtype of each schema column from the input populations.
+
+        Parameters
+        ----------
+        frames : pd.DataFrame
+            Every population loaded during the run, e.g. the starting cohort and the replenishing population.
+        """
+        frames = [frame for frame in frames if frame is not None and not frame.empty]
+        for column, categories in self.categorical.items():
+            values = [frame[column] for frame in frames if column in frame.columns]
+            # only string columns. Numeric codes stay numeric so modules can still do arithmetic with them.
+            if not values or not all(pd.api.types.is_string_dtype(value) or isinstance(value.dtype, CategoricalDtype)
+                                     for value in values):
+                continue
+            if categories is None:
+                categories = sorted(pd.concat(values).dropna().unique(), key=str)
+            self.dtypes[column] = CategoricalDtype(categories)
+        for column, dtype in self.small_int.items():
+            values = [frame[column] for frame in frames if column in frame.columns]
+            if values and all(self._fits_int(value, dtype) for value in values):
+                self.dtypes[column] = np.dtype(dtype)
+        for column in self.float32:
+            values = [frame[column] for frame in frames if column in frame.columns]
+            if values and all(pd.api.types.is_float_dtype(value) for value in values):
+                self.dtypes[column] = np.dtype('float32')
+
+    @staticmethod
+    def _fits_int(values, dtype):
+        """ Whether values are all integers (no missing values) within the range of dtype."""
+        if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            return False
+        array = values.to_numpy()
+        if pd.isna(array).any() or not np.array_equal(array, np.round(array)):
+            return False
+        info = np.iinfo(dtype)
+        return array.size == 0 or (array.min() >= info.min and array.max() <= info.max)
+
+    def coerce_column(self, values):
+        """ Convert one column to its schema dtype.
+
+        Parameters
+        ----------
+        values : pd.Series
+            Column named after a population column.
+        Returns
+        -------
+        values : pd.Series
+            values in the schema dtype. Unchanged if the column isn't in the schema or (ints) has missing values.
+        """
+        dtype = self.dtypes.get(values.name)
+        if dtype is None or values.dtype == dtype:
+            return values
+        if isinstance(dtype, CategoricalDtype):
+            known = values.isna() | values.isin(dtype.categories)
+            if not known.all():
+                raise ValueError(f"Values {list(values[~known].unique()[:5])} of {values.name} are not in the "
+                                 f"population schema categories {list(dtype.categories)}.")
+            return values.astype(dtype)
+        if np.issubdtype(dtype, np.integer):
+            # missing values (e.g. columns of newborns not yet initialised) are left for vivarium to handle as before.
+            if values.isna().any():
+                return values
+            if not self._fits_int(values, dtype):
+                raise ValueError(f"{values.name} has values that can't be stored as {dtype}.")
+        return values.astype(dtype)
+
+    def coerce(self, pop):
+        """ Convert every schema column of pop to its schema dtype.
+
+        Parameters
+        ----------
+        pop : pd.DataFrame or pd.Series
+            Population update.
+        Returns
+        -------
+        pop : pd.DataFrame or pd.Series
+        """
+        if isinstance(pop, pd.Series):
+            return self.coerce_column(pop)
+        columns = [column for column in pop.columns if column in self.dtypes and pop[column].dtype != self.dtypes[column]]
+        if not columns:
+            return pop
+        pop = pop.copy()
+        for column in columns:
+            pop[column] = self.coerce_column(pop[column])
+        return pop
+
+    def wrap(self, population_view):
+        """ Wrap a vivarium population view so every update is coerced to the schema."""
+        if isinstance(population_view, SchemaPopulationView):
+            return population_view
+        return SchemaPopulationView(population_view, self)
+
+
+class SchemaPopulationView:
+    """ vivarium PopulationView that coerces updates to a PopulationSchema. Everything else is passed through."""
+
+    def __init__(self, population_view, schema):
+        self._population_view = population_view
+        self.schema = schema
+
+    def __getattr__(self, name):
+        return getattr(self._population_view, name)
+
+    def update(self, pop):
+        self._population_view.update(self.schema.coerce(pop))
+
+
+def memory_usage(pop):
+    """ Memory used by each column of the population.
+
+    Parameters
+    ----------
+    pop : pd.DataFrame
+        Population frame, e.g. simulation.get_population().
+    Returns
+    -------
+    usage : pd.DataFrame
+        dtype, bytes and bytes per agent for each column, largest first.
+    """
+    usage = pd.DataFrame({'dtype': pop.dtypes.astype(str),
+                          'bytes': pop.memory_usage(index=False, deep=True)})
+    usage['bytes_per_agent'] = usage['bytes'] / max(len(pop), 1)
+    return usage.sort_values('bytes', ascending=False)
+
+
+def log_memory_usage(pop, top=10):
+    """ Log total population memory and the largest columns."""
+    usage = memory_usage(pop)
+    total = usage['bytes'].sum()
+    logging.info(f"Population frame uses {total / 1e6:.1f} MB ({total / max(len(pop), 1):.0f} bytes per agent).")
+    for column, row in usage.head(top).iterrows():
+        logging.info(f"\t{column} ({row['dtype']}): {row['bytes'] / 1e6:.1f} MB")
+    return usage
@@ -0,0 +1,137 @@
+"""
+Opt-in profiler for module time steps.
+
+Set profile: True in the config to wrap every module's on_time_step (Base.setup and the intervention classes register
+through Base.profiled). For each module and year it records wall time, the number of simulants the module fetched
+with Base.get_alive_population (the whole event for modules that don't use it), the number of rows passed to transition
+model predictions (see ROW_COUNTER), time spent converting data to and from R and in R predict calls (see R_CALL_TIMER)
+and the resident memory of the process after the call and how much it changed during the call (rss_change_mb, the
+memory the module kept hold of rather than its transient peak). RunPipeline writes the records to run_output_dir as csv
+and json after each simulated year.
+"""
+
+import functools
+import json
+import os
+from contextlib import contextmanager
+from time import perf_counter
+
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:  # optional. /proc/self/statm is read instead on linux.
+    psutil = None
+
+
+def rss_mb():
+    """ Current resident set size of this process in MB. NaN where neither psutil nor /proc is available."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2 ** 20
+    try:
+        with open('/proc/self/statm') as statm:
+            # second field is resident pages.
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return float('nan')
+
+
+class RCallTimer:
+    """ Running totals of seconds spent converting data between pandas and R and in R predict calls.
+
+    The time step profiler reads these before and after each module's time step.
+    """
+
+    def __init__(self):
+        self.conversion = 0.
+        self.prediction = 0.
+
+    @contextmanager
+    def timing(self, kind):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            setattr(self, kind, getattr(self, kind) + perf_counter() - start)
+
+
+class RowCounter:
+    """ Running totals of simulants fetched by Base.get_alive_population and of rows passed to transition model
+    predictions in r_utils and native_utils.
+
+    The time step profiler reads these before and after each module's time step.
+    """
+
+    def __init__(self):
+        self.fetched = 0
+        self.fetches = 0
+        self.predicted = 0
+
+
+R_CALL_TIMER = RCallTimer()
+ROW_COUNTER = RowCounter()
+
+
+class TimeStepProfiler:
+    """ Collects a record for every profiled time step listener call."""
+
+    def __init__(self):
+        self.records = []
+
+    def wrap(self, module, listener):
+        """ Wrap a time step listener so each call is recorded.
+
+        Parameters
+        ----------
+        module : str
+            Name to record the listener under. Usually the module repr e.g. lmmYJIncome().
+        listener : callable
+            Time step listener taking a vivarium event.
+
+        Returns
+        -------
+        profiled : callable
+            The profiled listener.
+        """
+        @functools.wraps(listener)
+        def profiled(event):
+            conversion, prediction = R_CALL_TIMER.conversion, R_CALL_TIMER.prediction
+            fetched, fetches, predicted = ROW_COUNTER.fetched, ROW_COUNTER.fetches, ROW_COUNTER.predicted
+            rss_before = rss_mb()
+            start = perf_counter()
+            try:
+                return listener(event)
+            finally:
+                wall_time = perf_counter() - start
+                rss_after = rss_mb()
+                self.records.append({'module': module,
+                                     'year': event.time.year,
+                                     'wall_time': wall_time,
+                                     'rows': (ROW_COUNTER.fetched - fetched if ROW_COUNTER.fetches > fetches
+                                              else len(event.index)),
+                                     'predicted_rows': ROW_COUNTER.predicted - predicted,
+                                     'r_conversion_time': R_CALL_TIMER.conversion - conversion,
+                                     'r_prediction_time': R_CALL_TIMER.prediction - prediction,
+                                     'rss_mb': rss_after,
+                                     'rss_change_mb': rss_after - rss_before})
+        return profiled
+
+    def to_frame(self):
+        """ Records as a data frame with one row per module per year."""
+        return pd.DataFrame(self.records, columns=['module', 'year', 'wall_time', 'rows', 'predicted_rows',
+                                                   'r_conversion_time', 'r_prediction_time', 'rss_mb', 'rss_change_mb'])
+
+    def write(self, output_dir, file_name='time_step_profile'):
+        """ Save the records to output_dir as file_name.csv and file_name.json.
+
+        Returns
+        -------
+        csv_path, json_path : str
+        """
+        profile = self.to_frame()
+        csv_path = os.path.join(output_dir, f"{file_name}.csv")
+        json_path = os.path.join(output_dir, f"{file_name}.json")
+        profile.to_csv(csv_path, index=False)
+        with open(json_path, 'w') as json_file:
+            json.dump(profile.to_dict(orient='records'), json_file, indent=2)
+        return csv_path, json_path
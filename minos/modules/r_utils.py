@@ -4,6 +4,10 @@ R utility functions. These are currently all related to the use of transition mo
 # TODO figure out scaling of variables in Rpy2. makes models more stable.
 # TODO: Rewrite all these functions to generalise more. Lots of duplicated code
 
+import os
+from collections import OrderedDict
+from functools import lru_cache
+
 import rpy2.robjects as ro
 from rpy2.robjects import pandas2ri, r
 from rpy2.robjects.conversion import localconverter
@@ -13,8 +17,220 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as pl
 
+from minos.modules.model_predictors import ModelPredictors
+from minos.modules.profiling import R_CALL_TIMER, ROW_COUNTER
+from minos.modules.native_utils import zero_inflated_draw, yeo_johnson_transform, inverse_yeo_johnson_transform
+
 
-def load_transitions(component, rpy2_modules, path='data/transitions/'):
+class TransitionModelCache:
+    """ Registry of loaded transition models shared by every module in a simulation.
+
+    Models are keyed on the resolved file path and its modification time so each model is only deserialised once,
+    and is reloaded if the file on disk is replaced (e.g. transitions re-estimated between batch runs). The least
+    recently used model is evicted once maxsize models are held.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.models = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, filename, loader):
+        """ Get the model stored in filename, loading it with loader(filename) if it isn't already cached.
+
+        Parameters
+        ----------
+        filename : String
+            Path to the model file.
+        loader : callable
+            Function loading the model from a file path. Only called on a cache miss.
+
+        Returns:
+        -------
+        The loaded model.
+        """
+        path = os.path.realpath(filename)
+        key = (path, os.stat(path).st_mtime_ns)
+        if key in self.models:
+            self.hits += 1
+            self.models.move_to_end(key)
+            return self.models[key]
+
+        self.misses += 1
+        model = loader(path)
+        self.models[key] = model
+        if len(self.models) > self.maxsize:
+            self.models.popitem(last=False)
+        return model
+
+    def clear(self):
+        self.models.clear()
+
+    def __repr__(self):
+        return f"TransitionModelCache({len(self.models)}/{self.maxsize} models, {self.hits} hits, {self.misses} misses)"
+
+
+# Converters shared by every call rather than rebuilt for each prediction.
+PANDAS_CONVERTER = ro.default_converter + pandas2ri.converter
+NUMPY_CONVERTER = ro.default_converter + numpy2ri.converter
+
+
+# Formula variables and factor levels of a fitted model. Random effect grouping factors are left out as new levels are
+# allowed for them.
+_MODEL_PREDICTORS_SOURCE = """
+function(model) {
+    model_formula <- tryCatch(formula(model), error = function(e) NULL)
+    variables <- if (is.null(model_formula)) character(0) else all.vars(model_formula)
+    response <- if (!is.null(model_formula) && length(model_formula) == 3) all.vars(model_formula[[2]]) else character(0)
+    xlevels <- tryCatch(model$xlevels, error = function(e) NULL)
+    if (is.null(xlevels)) {
+        xlevels <- list()
+        frame <- tryCatch(model.frame(model), error = function(e) NULL)
+        groups <- tryCatch(names(model@flist), error = function(e) character(0))
+        for (name in setdiff(names(frame), groups)) {
+            if (is.factor(frame[[name]])) xlevels[[name]] <- levels(frame[[name]])
+        }
+    }
+    list(variables = variables, response = response, levels = xlevels)
+}
+"""
+
+
+# Yeo-Johnson transform parameters and min/max values attached to a fitted model in transition_model_functions.R.
+_MODEL_TRANSFORMS_SOURCE = """
+function(model) {
+    yj <- attr(model, "transform")
+    transform <- NULL
+    if (!is.null(yj)) {
+        eps <- ifelse(is.null(yj$eps), 0.001, yj$eps)
+        transform <- list(lambda = yj$lambda, mean = yj$mean, sd = yj$sd, standardize = yj$standardize, eps = eps)
+    }
+    list(transform = transform, min_value = attr(model, "min_value"), max_value = attr(model, "max_value"))
+}
+"""
+
+
+@lru_cache(maxsize=None)
+def _r_function(source):
+    """ R function defined by source. Evaluated on first use so importing r_utils doesn't run any R code."""
+    return r(source)
+
+
+def _read_model_predictors(model):
+    """ ModelPredictors of model. None if the model has no usable formula (e.g. fitted without one or with y ~ .)."""
+    result = _r_function(_MODEL_PREDICTORS_SOURCE)(model)
+    variables = list(result.rx2('variables'))
+    if not variables or '.' in variables:
+        return None
+    levels = result.rx2('levels')
+    levels = {name: list(level) for name, level in zip(levels.names, levels)} if len(levels) else {}
+    return ModelPredictors(variables, list(result.rx2('response')), levels)
+
+
+def _r_scalar(value):
+    """ First element of an R vector as a python value. None for R NULL."""
+    if value is ro.NULL or len(value) == 0:
+        return None
+    return value[0]
+
+
+def _read_model_transforms(model):
+    """ Yeo-Johnson parameters (as used by native_utils.yeo_johnson_transform), min_value and max_value of model."""
+    result = _r_function(_MODEL_TRANSFORMS_SOURCE)(model)
+    transform = result.rx2('transform')
+    if transform is not ro.NULL:
+        transform = {name: _r_scalar(value) for name, value in zip(transform.names, transform)}
+        transform['standardize'] = bool(transform['standardize'])
+    else:
+        transform = None
+    return {'transform': transform,
+            'min_value': _r_scalar(result.rx2('min_value')),
+            'max_value': _r_scalar(result.rx2('max_value'))}
+
+
+class ModelAttributeCache:
+    """ Values read from each transition model once per model, e.g. its predictors or transform parameters.
+
+    Keyed on the model object. The models themselves are held so their ids stay valid. Least recently used models are
+    evicted once maxsize are held so this doesn't keep models alive after TransitionModelCache drops them.
+    """
+
+    def __init__(self, reader, maxsize=64):
+        self.reader = reader
+        self.maxsize = maxsize
+        self.values = OrderedDict()
+
+    def get(self, model):
+        """ Value read from model by reader, read on the first call for each model."""
+        key = id(model)
+        if key in self.values:
+            self.values.move_to_end(key)
+            return self.values[key][1]
+        value = self.reader(model)
+        self.values[key] = (model, value)
+        if len(self.values) > self.maxsize:
+            self.values.popitem(last=False)
+        return value
+
+
+MODEL_PREDICTORS = ModelAttributeCache(_read_model_predictors)
+MODEL_TRANSFORMS = ModelAttributeCache(_read_model_transforms)
+
+
+def get_model_predictors(model, rpy2_modules=None):
+    """ Variables and factor levels the model predicts from. See model_predictors.py.
+
+    Parameters
+    ----------
+    model : R rds object
+        Fitted model loaded in from .rds file
+    rpy2_modules : dict
+        Unused. Kept to match the predict functions.
+    Returns
+    -------
+    predictors : ModelPredictors or None
+        None if the predictors can't be read from the model.
+    """
+    return MODEL_PREDICTORS.get(model)
+
+
+def predictors_to_r(model, rpy2_modules, current, keep=()):
+    """ Convert only the columns of current the model uses to an R data.frame.
+
+    Parameters
+    ----------
+    model : R rds object
+        Fitted model loaded in from .rds file
+    current : pd.DataFrame
+        Population to predict for.
+    keep : Iterable[str]
+        Columns to send to R even if they aren't in the model formula (e.g. the dependent for transforms).
+    Returns
+    -------
+    currentRDF : rpy2.robjects.DataFrame
+    """
+    predictors = MODEL_PREDICTORS.get(model)
+    if predictors is not None:
+        current = current[[column for column in current.columns if column in predictors.variables or column in keep]]
+    ROW_COUNTER.predicted += len(current)
+    with R_CALL_TIMER.timing('conversion'), localconverter(PANDAS_CONVERTER):
+        return ro.conversion.py2rpy(current)
+
+
+def prediction_to_numpy(prediction):
+    """ Convert an R prediction vector to a NumPy array without going through a data.frame."""
+    with R_CALL_TIMER.timing('conversion'), localconverter(NUMPY_CONVERTER):
+        return np.asarray(ro.conversion.rpy2py(prediction), dtype=float)
+
+
+def r_predict(stats, *args, **kwargs):
+    """ stats.predict timed by R_CALL_TIMER."""
+    with R_CALL_TIMER.timing('prediction'):
+        return stats.predict(*args, **kwargs)
+
+
+def load_transitions(component, rpy2_modules, path='data/transitions/', cache=None):
     """
     This function will load transition models that have been generated in R and saved as .rds files.
     
@@ -24,6 +240,8 @@ def load_transitions(component, rpy2_modules, path='data/transitions/'):
         Path to transitions folder
     component : String
         Component to load transition for, as string
+    cache : TransitionModelCache
+        (Optional) Shared cache of loaded models. If given the model is only read from disk once.
 
     Returns:
     -------
@@ -35,6 +253,8 @@ def load_transitions(component, rpy2_modules, path='data/transitions/'):
     # generate filename from arguments and load model
     filename = f"{path}/{component}.rds"
     #print(filename)
+    if cache is not None:
+        return cache.get(filename, base.readRDS)
     model = base.readRDS(filename)
 
     return model
@@ -59,25 +279,13 @@ def predict_next_timestep_ols(model, rpy2_modules, current, dependent):
     A prediction of the information for next timestep
     """
     # import R packages
-    base = rpy2_modules['base']
     stats = rpy2_modules['stats']
 
-    # Convert from pandas to R using package converter
-    with localconverter(ro.default_converter + pandas2ri.converter):
-        currentRDF = ro.conversion.py2rpy(current)
-
-    # R predict method returns a Vector of predicted values, so need to be bound to original df and converter to Pandas
-    prediction = stats.predict(model, currentRDF)
-    newRPopDF = base.cbind(currentRDF, predicted=prediction)
-    # Convert back to pandas
-    with localconverter(ro.default_converter + pandas2ri.converter):
-        newPandasPopDF = ro.conversion.rpy2py(newRPopDF)
-
-    # Now rename the predicted var (have to drop original column first)
-    newPandasPopDF[[dependent]] = newPandasPopDF[['predicted']]
-    newPandasPopDF.drop(labels=['predicted'], axis='columns', inplace=True)
+    # Send only the model's predictors to R and bring back only the prediction vector.
+    currentRDF = predictors_to_r(model, rpy2_modules, current)
+    prediction = r_predict(stats, model, currentRDF)
 
-    return newPandasPopDF[[dependent]]
+    return pd.DataFrame({dependent: prediction_to_numpy(prediction)}, index=current.index)
 
 
 def predict_next_timestep_ols_diff(model, rpy2_modules, current, dependent, year):
@@ -100,27 +308,16 @@ def predict_next_timestep_ols_diff(model, rpy2_modules, current, dependent, year
     """
 
     # import R packages
-    base = rpy2_modules['base']
     stats = rpy2_modules['stats']
 
-    # Convert from pandas to R using package converter
-    with localconverter(ro.default_converter + pandas2ri.converter):
-        currentRDF = ro.conversion.py2rpy(current)
-
-    # R predict method returns a Vector of predicted values, so need to be bound to original df and converter to Pandas
-    prediction = stats.predict(model, currentRDF)
-    newRPopDF = base.cbind(currentRDF, predicted=prediction)
-    # Convert back to pandas
-    with localconverter(ro.default_converter + pandas2ri.converter):
-        newPandasPopDF = ro.conversion.rpy2py(newRPopDF)
+    # Send only the model's predictors to R and bring back only the prediction vector.
+    currentRDF = predictors_to_r(model, rpy2_modules, current)
+    prediction = r_predict(stats, model, currentRDF)
 
-    # Now rename the predicted var (have to drop original column first)
-    #newPandasPopDF[[dependent]] = newPandasPopDF[['predicted']]
-    #newPandasPopDF.drop(labels=['predicted'], axis='columns', inplace=True)
-
-    # Now add the predicted value to hh_income and drop predicted
+    # Now add the predicted value to hh_income
+    newPandasPopDF = pd.DataFrame({dependent: current[dependent], 'predicted': prediction_to_numpy(prediction)},
+                                  index=current.index)
     newPandasPopDF['new_dependent'] = newPandasPopDF[[dependent, 'predicted']].sum(axis=1)
-    newPandasPopDF.drop(labels=['predicted'], axis='columns', inplace=True)
 
     # new_dependent is module var, predicted is module_diff var
     return newPandasPopDF[['new_dependent', 'predicted']]
@@ -148,7 +345,8 @@ def predict_next_timestep_clm(model, rpy2modules, current, dependent):
     ordinal = rpy2modules['ordinal']
 
     # Convert from pandas to R using package converter
-    with localconverter(ro.default_converter + pandas2ri.converter):
+    ROW_COUNTER.predicted += len(current)
+    with R_CALL_TIMER.timing('conversion'), localconverter(PANDAS_CONVERTER):
         currentRDF = ro.conversion.py2rpy(current)
 
     # need to cast the dependent var to an R FactorVector
@@ -163,10 +361,10 @@ def predict_next_timestep_clm(model, rpy2modules, current, dependent):
     # in next true state (1xn matrix). Not an issue here as next housing state y isn't in the vivarium population.
 
     # R predict.clm method returns a matrix of probabilities of belonging in each state.
-    prediction = stats.predict(model, currentRDF, type="prob")
+    prediction = r_predict(stats, model, currentRDF, type="prob")
 
     # Convert prob matrix back to pandas.
-    with localconverter(ro.default_converter + pandas2ri.converter):
+    with R_CALL_TIMER.timing('conversion'), localconverter(PANDAS_CONVERTER):
         prediction_matrix_list = ro.conversion.rpy2py(prediction[0])
     predictionDF = pd.DataFrame(prediction_matrix_list)
 
@@ -195,18 +393,19 @@ def predict_nnet(model, rpy2Modules, current, columns):
     stats = rpy2Modules['stats']
     nnet = rpy2Modules['nnet']
     # Convert from pandas to R using package converter
-    with localconverter(ro.default_converter + pandas2ri.converter):
+    ROW_COUNTER.predicted += len(current)
+    with R_CALL_TIMER.timing('conversion'), localconverter(PANDAS_CONVERTER):
         currentRDF = ro.conversion.py2rpy(current)
 
-    prediction = stats.predict(model, currentRDF, type="probs", na_action='na_omit')
+    prediction = r_predict(stats, model, currentRDF, type="probs", na_action='na_omit')
 
-    with localconverter(ro.default_converter + pandas2ri.converter):
+    with R_CALL_TIMER.timing('conversion'), localconverter(PANDAS_CONVERTER):
         newPandasPopDF = ro.conversion.rpy2py(prediction)
 
     return pd.DataFrame(newPandasPopDF, columns=columns)
 
 
-def predict_next_timestep_zip(model, rpy2Modules, current, dependent):
+def predict_next_timestep_zip(model, rpy2Modules, current, dependent, draws=None):
     """ Get next state for alcohol monthly expenditure using zero inflated poisson models.
 
     Parameters
@@ -217,8 +416,9 @@ def predict_next_timestep_zip(model, rpy2Modules, current, dependent):
         current population dataframe.
     dependent : str
         The dependent variable we are trying to predict
-    rescale_factor : int
-        Value for rescaling the dependent variable
+    draws : np.ndarray
+        (Optional) Uniform draws deciding who is a structural zero, one per row of current. Pass draws from the
+        module's randomness stream so they are common between runs. Defaults to np.random.uniform.
 
     Returns
     -------
@@ -230,24 +430,24 @@ def predict_next_timestep_zip(model, rpy2Modules, current, dependent):
     zeroinfl = rpy2Modules['zeroinfl']
 
     # grab transition model
-    with localconverter(ro.default_converter + pandas2ri.converter):
+    ROW_COUNTER.predicted += len(current)
+    with R_CALL_TIMER.timing('conversion'), localconverter(PANDAS_CONVERTER):
         currentRDF = ro.conversion.py2rpy(current)
 
     # grab count and zero prediction types
     # count determines values if they actually drink
     # zero determine probability of them not drinking
-    counts = stats.predict(model, currentRDF, type="count")
-    zeros = stats.predict(model, currentRDF, type="zero")
+    counts = r_predict(stats, model, currentRDF, type="count")
+    zeros = r_predict(stats, model, currentRDF, type="zero")
 
-    with localconverter(ro.default_converter + pandas2ri.converter):
+    with R_CALL_TIMER.timing('conversion'), localconverter(PANDAS_CONVERTER):
         counts = ro.conversion.rpy2py(counts)
         zeros = ro.conversion.rpy2py(zeros)
 
     # draw randomly if a person drinks
     # if they drink assign them their predicted value from count.
     # otherwise assign 0 (no spending).
-    preds = (np.random.uniform(size=zeros.shape) >= zeros) * counts
-    return np.ceil(preds)
+    return zero_inflated_draw(counts, zeros, draws)
 
 
 def predict_next_timestep_gee(model, rpy2_modules, current, dependent, noise_std):
@@ -267,36 +467,23 @@ def predict_next_timestep_gee(model, rpy2_modules, current, dependent, noise_std
     A prediction of the information for next timestep
     """
     # import R packages
-    base = rpy2_modules['base']
     geepack = rpy2_modules['geepack']
     stats = rpy2_modules['stats']
 
     current["pidp"] = -current["pidp"]
 
-    # Convert from pandas to R using package converter
-    with localconverter(ro.default_converter + pandas2ri.converter):
-        currentRDF = ro.conversion.py2rpy(current)
-
-    # R predict method returns a Vector of predicted values, so need to be bound to original df and converter to Pandas
-    prediction = stats.predict(model, currentRDF, type='response', allow_new_levels=True)
+    # Send only the model's predictors to R and bring back only the prediction vector.
+    currentRDF = predictors_to_r(model, rpy2_modules, current)
+    prediction = r_predict(stats, model, currentRDF, type='response', allow_new_levels=True)
 
     if noise_std:
         VGAM = rpy2_modules["VGAM"]
         prediction = prediction.ro + VGAM.rlaplace(current.shape[0], 0, noise_std) # add gaussian noise.
 
-    newRPopDF = base.cbind(currentRDF, predicted = prediction)
-    # Convert back to pandas
-    with localconverter(ro.default_converter + pandas2ri.converter):
-        newPandasPopDF = ro.conversion.rpy2py(newRPopDF)
-
-    # Now rename the predicted var (have to drop original column first)
-    newPandasPopDF[[dependent]] = newPandasPopDF[['predicted']]
-    newPandasPopDF.drop(labels=['predicted'], axis='columns', inplace=True)
+    return pd.DataFrame({dependent: prediction_to_numpy(prediction)}, index=current.index)
 
-    return newPandasPopDF[[dependent]]
 
-
-def predict_next_timestep_yj_gaussian_lmm(model, rpy2_modules, current, dependent, reflect, yeo_johnson, noise_std = 0):
+def predict_next_timestep_yj_gaussian_lmm(model, rpy2_modules, current, dependent, reflect, yeo_johnson, noise=None):
     """
     This function will take the transition model loaded in load_transitions() and use it to predict the next timestep
     for a module.
@@ -308,79 +495,46 @@ def predict_next_timestep_yj_gaussian_lmm(model, rpy2_modules, current, dependen
         View including columns that are required for prediction
     dependent : str
         The independent variable we are trying to predict
+    noise : np.ndarray
+        (Optional) Noise added to the prediction before inverting the transforms, one value per row of current.
+        Generate it from the module's randomness stream (e.g. Base.generate_gaussian_noise) so runs are reproducible.
     Returns:
     -------
     A prediction of the information for next timestep
     """
     # import R packages
-    base = rpy2_modules['base']
-    #geepack = rpy2_modules['geepack']
-    stats = rpy2_modules['stats']
-    bestNormalize = rpy2_modules['bestNormalize']
     lme4 = rpy2_modules["lme4"]
 
-    #current = current.drop([dependent, 'time'], axis=1)
-    #current["pidp"] = -current["pidp"]
-
-    # Convert from pandas to R using package converter
-    with localconverter(ro.default_converter + pandas2ri.converter):
-        currentRDF = ro.conversion.py2rpy(current)
-
-
-    # Inverse yeojohnson transform.
+    # Reflection and Yeo-Johnson transforms are done in NumPy with the model's parameters (read once per model).
     # Stored in estimate_transitions.R.
-    # Note inverse=True arg is needed to get back to actual gross income.
+    transforms = MODEL_TRANSFORMS.get(model)
+    dependent_values = current[dependent].to_numpy(dtype=float)
     if reflect:
-        max_value = model.do_slot("max_value")
+        dependent_values = transforms['max_value'] - dependent_values
+    if yeo_johnson:
+        dependent_values = yeo_johnson_transform(dependent_values, transforms['transform'])  # apply yj transform
+    current = current.assign(**{dependent: dependent_values})
 
-        currentRDF[currentRDF.names.index(dependent)] = max_value.ro - currentRDF.rx2(dependent)
+    # Send only the model's predictors to R and bring back only the prediction vector.
+    currentRDF = predictors_to_r(model, rpy2_modules, current, keep=(dependent,))
+    with R_CALL_TIMER.timing('prediction'):
+        prediction = lme4.predict_merMod(model, currentRDF, type='response', allow_new_levels=True)  # estimate next income using OLS.
+    prediction = prediction_to_numpy(prediction)
 
-    if yeo_johnson:
-        # stupid workaround to get attributes from R S4 type objects. Replaces rx2.
-        yj = model.do_slot("transform")
-        #yj = model.rx2('transform') # use yj from fitted model for latest year.
-        currentRDF[currentRDF.names.index(dependent)] = stats.predict(yj, newdata=currentRDF.rx2(dependent))  # apply yj transform
-
-    # explicitly convert to matrix to overcome error in predict_merMod below
-    #currentRDF_matrix = matrix.as_matrix(currentRDF)
-
-    ols_data = lme4.predict_merMod(model, currentRDF, type='response', allow_new_levels=True)  # estimate next income using OLS.
-
-    # if dependent == "SF_12":
-    #     ols_data = ols_data.ro + stats.rnorm(n, 0, noise_std) # add gaussian noise.
-    # elif dependent == "nutrition_quality":
-    #     ols_data = ols_data.ro + stats.rnorm(n, 0, noise_std) # add gaussian noise.
-    # elif dependent == 'hh_income' and noise_std:
-    #     #VGAM = rpy2_modules["VGAM"]
-    #     #ols_data = ols_data.ro + VGAM.rlaplace(n, 0, noise_std) # add gaussian noise.
-    #     #ols_data = ols_data.ro + stats.rcauchy(n, 0, noise_std)
-    #     ols_data = ols_data.ro + stats.rnorm(n, 0, noise_std) # add gaussian noise.
-
-    valid_dependents = ['hh_income', 'hh_income_new', 'nutrition_quality_new', 'nutrition_quality', 'nutrition_quality_diff']
-    if dependent == "SF_12" and noise_std:
-        prediction = ols_data.ro + stats.rnorm(current.shape[0], 0, noise_std) # add gaussian noise.
-    elif (dependent in valid_dependents) and noise_std:
-        VGAM = rpy2_modules["VGAM"]
-        prediction = ols_data.ro + VGAM.rlaplace(current.shape[0], 0, noise_std) # add gaussian noise.
-    else:
-        prediction = ols_data # no noise is added.
+    if noise is not None:
+        prediction = prediction + np.asarray(noise, dtype=float)
 
     if yeo_johnson:
-        prediction = stats.predict(yj, newdata=prediction, inverse=True)  # invert yj transform.
+        # Note inverse is needed to get back to actual gross income.
+        prediction = inverse_yeo_johnson_transform(prediction, transforms['transform'])  # invert yj transform.
 
     if reflect:
-        prediction = max_value.ro - prediction
+        prediction = transforms['max_value'] - prediction
 
-    # R predict method returns a Vector of predicted values, so need to be bound to original df and converter to Pandas
-    # Convert back to pandas
-    with localconverter(ro.default_converter + pandas2ri.converter):
-        #ols_data = ro.conversion.rpy2py(ols_data)
-        prediction_output = ro.conversion.rpy2py(prediction)
+    return pd.DataFrame(prediction, columns=[dependent])
 
-    return pd.DataFrame(prediction_output, columns=[dependent])
 
-
-def predict_next_timestep_yj_gamma_glmm(model, rpy2_modules, current, dependent, reflect, yeo_johnson, noise_std = 1):
+def predict_next_timestep_yj_gamma_glmm(model, rpy2_modules, current, dependent, reflect, yeo_johnson, noise=None):
     """
     This function will take the transition model loaded in load_transitions() and use it to predict the next timestep
     for a module.
@@ -392,90 +546,50 @@ def predict_next_timestep_yj_gamma_glmm(model, rpy2_modules, current, dependent,
         View including columns that are required for prediction
     dependent : str
         The independent variable we are trying to predict
+    noise : np.ndarray
+        (Optional) Noise added to the prediction before inverting the transforms, one value per row of current.
+        Generate it from the module's randomness stream (e.g. Base.generate_gaussian_noise) so runs are reproducible.
     Returns:
     -------
     A prediction of the information for next timestep
     """
     # import R packages
-    base = rpy2_modules['base']
-    #geepack = rpy2_modules['geepack']
-    stats = rpy2_modules['stats']
-    bestNormalize = rpy2_modules['bestNormalize']
     lme4 = rpy2_modules["lme4"]
 
-    # Convert from pandas to R using package converter
-    with localconverter(ro.default_converter + pandas2ri.converter):
-        currentRDF = ro.conversion.py2rpy(current)
-
-    # flip left skewed data to right skewed about its maximum.
+    # flip left skewed data to right skewed about its maximum. Transform parameters are read once per model.
+    transforms = MODEL_TRANSFORMS.get(model)
     if reflect:
-        max_value = model.do_slot("max_value")
-        currentRDF[currentRDF.names.index(dependent)] = max_value.ro - currentRDF.rx2(dependent)
+        current = current.assign(**{dependent: transforms['max_value'] - current[dependent].to_numpy(dtype=float)})
 
-    # load YJ transform
-    if yeo_johnson:
-        # stupid workaround to get attributes from R S4 type objects. Replaces rx2.
-        yj = model.do_slot("transform")
-
-    # get minimum value to reverse transformatino to strictly positve values.
-    min_value = model.do_slot("min_value")
+    # Send only the model's predictors to R and bring back only the prediction vector.
+    currentRDF = predictors_to_r(model, rpy2_modules, current, keep=(dependent,))
+    with R_CALL_TIMER.timing('prediction'):
+        prediction = lme4.predict_merMod(model, newdata=currentRDF, type='response', allow_new_levels=True)  # estimate next income using gamma GEE.
+    prediction = prediction_to_numpy(prediction)
 
-    prediction = lme4.predict_merMod(model, newdata=currentRDF, type='response', allow_new_levels=True)  # estimate next income using gamma GEE.
     # Inverting transforms to get back to true income values.
+    prediction = prediction + (transforms['min_value'] - 0.001)  # invert shift to strictly positive values.
 
-    prediction = prediction.ro + (min_value.ro - 0.001) # invert shift to strictly positive values.
-
-    if dependent == 'nutrition_quality':
-        prediction = prediction.ro + stats.rnorm(current.shape[0], 0, noise_std) # add gaussian noise.
-    elif dependent == "SF_12" and noise_std:
-        VGAM = rpy2_modules["VGAM"]
-        prediction = prediction.ro + VGAM.rlaplace(current.shape[0], 0, noise_std) # add gaussian noise.
-        #prediction = prediction.ro + stats.rnorm(current.shape[0], 0, noise_std) # add gaussian noise.
-    elif (dependent in ["hh_income_new", 'hourly_wage']) and noise_std:
-        #VGAM = rpy2_modules["VGAM"]
-        #prediction = prediction.ro + VGAM.rlaplace(current.shape[0], 0, noise_std) # add gaussian noise.
-        prediction = prediction.ro + stats.rnorm(current.shape[0], 0, noise_std) # add gaussian noise.
-        noise = np.clip(stats.rcauchy(current.shape[0], 0, 0.005), -5, 5) #0.005
-        with localconverter(ro.default_converter + numpy2ri.converter):
-            Rnoise = ro.conversion.py2rpy(noise)
-        prediction = prediction.ro + Rnoise # add gaussian noise.
-    else:
-        prediction = prediction
+    if noise is not None:
+        prediction = prediction + np.asarray(noise, dtype=float)
 
     if yeo_johnson:
-        prediction = stats.predict(yj, newdata=prediction, inverse=True)  # invert yj transform.
+        prediction = inverse_yeo_johnson_transform(prediction, transforms['transform'])  # invert yj transform.
 
     if reflect:
-        prediction = max_value.ro - prediction
+        prediction = transforms['max_value'] - prediction
 
-    # R predict method returns a Vector of predicted values, so need to be bound to original df and converter to Pandas
-    # Convert back to pandas
-    with localconverter(ro.default_converter + pandas2ri.converter):
-        prediction_output = ro.conversion.rpy2py(prediction)
-
-    return pd.DataFrame(prediction_output, columns=[dependent])
+    return pd.DataFrame(prediction, columns=[dependent])
 
 
 def predict_next_rf(model, rpy2_modules, current, dependent):
 
     # import R packages
-    base = rpy2_modules['base']
     stats = rpy2_modules['stats']
     rf = rpy2_modules['randomForest']
 
-    # Convert from pandas to R using package converter
-    with localconverter(ro.default_converter + pandas2ri.converter):
-        currentRDF = ro.conversion.py2rpy(current)
-
-    # R predict method returns a Vector of predicted values, so need to be bound to original df and converter to Pandas
-    prediction = stats.predict(model, newdata=currentRDF)
-    newRPopDF = base.cbind(currentRDF, predicted=prediction)
-    # Convert back to pandas
-    with localconverter(ro.default_converter + pandas2ri.converter):
-        newPandasPopDF = ro.conversion.rpy2py(newRPopDF)
-
-    # Now rename the predicted var (have to drop original column first)
-    newPandasPopDF[[dependent]] = newPandasPopDF[['predicted']]
-    newPandasPopDF.drop(labels=['predicted'], axis='columns', inplace=True)
+    # Send only the model's predictors to R and bring back only the prediction vector.
+    currentRDF = predictors_to_r(model, rpy2_modules, current)
+    prediction = r_predict(stats, model, newdata=currentRDF)
 
-    return newPandasPopDF[[dependent]]
+    return pd.DataFrame({dependent: prediction_to_numpy(prediction)}, index=current.index)
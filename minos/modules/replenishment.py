@@ -5,6 +5,7 @@ File for adding new cohorts from Understanding Society data to the population
 import pandas as pd
 import logging
 from minos.modules.base_module import Base
+from minos.utils import read_csv_cached, read_csv_partitioned
 
 
 # suppressing a warning that isn't a problem
@@ -104,7 +105,7 @@ class Replenishment(Base):
         #                 'child_ages',
         #                 ]
 
-        view_columns = list(pd.read_csv("data/final_US/2020_US_cohort.csv").columns)
+        view_columns = list(read_csv_cached("data/final_US/2020_US_cohort.csv").columns)
 
         if config.synthetic:  # only have spatial column and new pidp for synthpop.
             view_columns += ["ZoneID",
@@ -123,6 +124,11 @@ class Replenishment(Base):
         # Defines how this module initialises simulants when self.simulant_creater is called.
         builder.population.initializes_simulants(self.on_initialize_simulants,
                                                  creates_columns=view_columns + columns_created)
+
+        # Load the replenishing population once, split by year, so each time step takes its cohort by lookup.
+        self.replenishing_waves = read_csv_partitioned(f"{self.replenishing_dir}/replenishing_pop_2015-2070.csv",
+                                                       column='time')
+
         # Register ageing, updating time and replenishment events on time_step.
         # builder.event.register_listener('time_step', self.on_time_step, priority=self.priority)
         super().setup(builder)
@@ -147,7 +153,10 @@ class Replenishment(Base):
         if pop_data.user_data["sim_state"] == "setup":
             # Load in initial data frame.
             # Add entrance times and convert ages to floats for pd.timedelta to handle.
-            new_population = pd.read_csv(f"{self.input_data_dir}/{self.current_year}_US_cohort.csv")
+            new_population = read_csv_cached(f"{self.input_data_dir}/{self.current_year}_US_cohort.csv")
+            # Fix the compact dtype categories from every population loaded during the run.
+            if self.population_schema is not None:
+                self.population_schema.fit(new_population, *self.replenishing_waves.values())
             new_population.loc[new_population.index, "entrance_time"] = new_population["time"]
             new_population.loc[new_population.index, "age"] = new_population["age"].astype(float)
             logging.info(f"Starting cohort loaded for {self.current_year}.")
@@ -177,6 +186,9 @@ class Replenishment(Base):
         # Add new simulants to the overall population frame.
         self.register(new_population[["entrance_time", "age"]])
         self.population_view.update(new_population)
+        # Add new households and members to the shared household index. Births have no hidp yet.
+        if 'hidp' in new_population.columns:
+            self.household_index.add_members(new_population['hidp'])
 
     def on_time_step(self, event):
         """ On time step add new simulants to the module.
@@ -199,9 +211,8 @@ class Replenishment(Base):
             #pop['time'] += 1
             self.population_view.update(pop)
             # Base year for the simulation is 2018, so we'll use this to select our replenishment pop
-            new_wave = pd.read_csv(f"{self.replenishing_dir}/replenishing_pop_2015-2070.csv")
-            # Now select the population for the current year
-            new_wave = new_wave[(new_wave['time'] == event.time.year)]
+            # Select the population for the current year
+            new_wave = self.replenishing_waves.get(event.time.year, pd.DataFrame()).copy()
             # TODO: Check how the population size changes over time now that we're only adding in 16 year olds
             # It might mean that the pop shrinks over time, as the counts within age groups is generally between 250-500
             # respondents (16-~80 year olds, older ages can have far less)
@@ -367,7 +378,10 @@ class NoReplenishment(Base):
         if pop_data.user_data["sim_state"] == "setup":
             # Load in initial data frame.
             # Add entrance times and convert ages to floats for pd.timedelta to handle.
-            new_population = pd.read_csv(f"{self.input_data_dir}/{self.current_year}_US_cohort.csv")
+            new_population = read_csv_cached(f"{self.input_data_dir}/{self.current_year}_US_cohort.csv")
+            # Fix the compact dtype categories from every population loaded during the run.
+            if self.population_schema is not None:
+                self.population_schema.fit(new_population)
             new_population.loc[new_population.index, "entrance_time"] = new_population["time"]
             new_population.loc[new_population.index, "age"] = new_population["age"].astype(float)
 
@@ -393,6 +407,9 @@ class NoReplenishment(Base):
         # Add new simulants to the overall population frame.
         self.register(new_population[["entrance_time", "age"]])
         self.population_view.update(new_population)
+        # Add new households and members to the shared household index. Births have no hidp yet.
+        if 'hidp' in new_population.columns:
+            self.household_index.add_members(new_population['hidp'])
 
     def on_time_step(self, event):
         """ On time step add new simulants to the module.
@@ -417,7 +434,7 @@ class NoReplenishment(Base):
             some time point at which to run the method.
         """
         # get alive people and add time in years to their age.
-        population = self.population_view.get(event.index, query="alive == 'alive'")
+        population = self.get_alive_population(event.index)
         population['age'] += event.step_size / pd.Timedelta(days=365.25)
         self.population_view.update(population)
 
@@ -431,7 +448,7 @@ class NoReplenishment(Base):
             some time point at which to run the method.
         """
         # get alive people and add time in years to their age.
-        population = self.population_view.get(event.index, query="alive == 'alive'")
+        population = self.get_alive_population(event.index)
         population['time'] += int(event.step_size / pd.Timedelta(days=365.25))
         self.population_view.update(population)
 
@@ -1,7 +1,9 @@
 """ File for adding new cohorts from Understanding Society data to the population"""
 
+import os
 import pandas as pd
 from minos.modules.base_module import Base
+from minos.utils import read_csv_cached
 
 # suppressing a warning that isn't a problem
 pd.options.mode.chained_assignment = None # default='warn' #supress SettingWithCopyWarning
@@ -91,6 +93,14 @@ class ReplenishmentNowcast(Base):
         # Defines how this module initialises simulants when self.simulant_creater is called.
         builder.population.initializes_simulants(self.on_initialize_simulants,
                                                  creates_columns=view_columns)
+
+        # Nowcast replenishes from each year's cohort file. Load those covering the simulation once, keyed by year.
+        self.replenishing_waves = {}
+        for year in range(self.current_year + 1, builder.configuration.time.end.year + 1):
+            cohort_file = f"{self.input_data_dir}/{year}_US_cohort.csv"
+            if os.path.exists(cohort_file):
+                self.replenishing_waves[year] = read_csv_cached(cohort_file, copy=False)
+
         # Register ageing, updating time and replenishment events on time_step.
         builder.event.register_listener('time_step', self.age_simulants)
         #builder.event.register_listener('time_step', self.update_time)
@@ -119,7 +129,10 @@ class ReplenishmentNowcast(Base):
         if pop_data.user_data["sim_state"] == "setup":
             # Load in initial data frame.
             # Add entrance times and convert ages to floats for pd.timedelta to handle.
-            new_population = pd.read_csv(f"{self.input_data_dir}/{self.current_year}_US_cohort.csv")
+            new_population = read_csv_cached(f"{self.input_data_dir}/{self.current_year}_US_cohort.csv")
+            # Fix the compact dtype categories from every population loaded during the run.
+            if self.population_schema is not None:
+                self.population_schema.fit(new_population, *self.replenishing_waves.values())
             new_population.loc[new_population.index, "entrance_time"] = new_population["time"]
             new_population.loc[new_population.index, "age"] = new_population["age"].astype(float)
         elif pop_data.user_data["cohort_type"] == "replenishment":
@@ -149,6 +162,9 @@ class ReplenishmentNowcast(Base):
         # Add new simulants to the overall population frame.
         self.register(new_population[["entrance_time", "age"]])
         self.population_view.update(new_population)
+        # Add new households and members to the shared household index. Births have no hidp yet.
+        if 'hidp' in new_population.columns:
+            self.household_index.add_members(new_population['hidp'])
 
 
     def on_time_step(self, event):
@@ -166,7 +182,7 @@ class ReplenishmentNowcast(Base):
             self.current_year += 1
             pop['time'] += 1
             self.population_view.update(pop)
-            new_wave = pd.read_csv(f"{self.input_data_dir}/{self.current_year}_US_cohort.csv")
+            new_wave = self.replenishing_waves.get(self.current_year, pd.DataFrame())
         else:
             # otherwise dont load anyone in.
             new_wave = pd.DataFrame()
@@ -174,7 +190,7 @@ class ReplenishmentNowcast(Base):
         pop = self.population_view.get(event.index, query='pidp > 0 and alive == "alive"')
         # Check new data has any simulants in it before adding to frame.
         if new_wave.shape[0] > 0:
-            new_cohort = new_wave.loc[~new_wave["pidp"].isin(pop["pidp"])]
+            new_cohort = new_wave.loc[~new_wave["pidp"].isin(pop["pidp"])].copy()
 
             # How many agents to add.
             cohort_size = new_cohort.shape[0]
@@ -203,7 +219,7 @@ class ReplenishmentNowcast(Base):
             some time point at which to run the method.
         """
         # get alive people and add time in years to their age.
-        population = self.population_view.get(event.index, query="alive == 'alive'")
+        population = self.get_alive_population(event.index)
         population['age'] += event.step_size / pd.Timedelta(days=365.25)
         self.population_view.update(population)
 
@@ -218,7 +234,7 @@ class ReplenishmentNowcast(Base):
             some time point at which to run the method.
         """
         # get alive people and add time in years to their age.
-        population = self.population_view.get(event.index, query="alive == 'alive'")
+        population = self.get_alive_population(event.index)
         population['time'] += event.step_size / pd.Timedelta(days=365.25)
         self.population_view.update(population)
 
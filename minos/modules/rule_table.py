@@ -0,0 +1,115 @@
+"""
+Rule tables for deterministic state transitions.
+
+Some modules (e.g. education) don't predict transitions from a model but apply fixed rules such as "anyone alive aged
+17 in full time education has at least GCSE level education". Writing each rule as its own population_view.get(query=...)
+and population_view.update evaluates a query string over the whole population for every rule. A RuleTable holds the
+rules for one column instead. Modules fetch the columns the rules need once, apply every rule as a vectorised mask and
+write a single update.
+
+Example
+-------
+rule_table = RuleTable('education_state')
+rule_table.add_rule(2, {'alive': 'alive', 'age': 17, 'S7_labour_state': 'FT Education'})
+rule_table.add_rule(3, {'alive': 'alive', 'age': 19, 'S7_labour_state': 'FT Education', 'max_educ': ('>=', 3)})
+...
+pop = population_view.get(event.index)
+population_view.update(rule_table.apply(pop))
+"""
+
+import operator
+
+import numpy as np
+import pandas as pd
+
+# Comparisons that can be used in rule conditions.
+OPERATORS = {'==': operator.eq,
+             '!=': operator.ne,
+             '>': operator.gt,
+             '>=': operator.ge,
+             '<': operator.lt,
+             '<=': operator.le,
+             'in': lambda values, options: np.isin(values, list(options)),
+             }
+
+
+class RuleTable:
+    """ Ordered list of rules setting a target column from conditions on other columns.
+
+    Attributes
+    ----------
+    target : str
+        Column the rules set.
+    rules : list
+        (value, conditions, how) for each rule in the order they were added.
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.rules = []
+
+    def add_rule(self, value, conditions, how='at_least'):
+        """ Add a rule to the table.
+
+        Parameters
+        ----------
+        value : object
+            Value of the target for simulants matching all conditions.
+        conditions : dict
+            Column names to a value (equality) or an (operator, value) pair. Operators are the keys of OPERATORS.
+            E.g. {'age': 17, 'max_educ': ('>=', 3)}.
+        how : str
+            at_least (default) only raises the target to value, e.g. education_state is never lowered. set replaces
+            it.
+        """
+        if how not in ('at_least', 'set'):
+            raise ValueError(f"Unknown rule type {how}. Please use at_least or set.")
+        conditions = {column: condition if isinstance(condition, tuple) else ('==', condition)
+                      for column, condition in conditions.items()}
+        for column, (op, _) in conditions.items():
+            if op not in OPERATORS:
+                raise ValueError(f"Unknown operator {op} for {column}. Please use one of {list(OPERATORS)}.")
+        self.rules.append((value, conditions, how))
+
+    @property
+    def columns(self):
+        """ All columns needed to apply the rules including the target."""
+        columns = [self.target]
+        for _, conditions, _ in self.rules:
+            columns += [column for column in conditions if column not in columns]
+        return columns
+
+    def mask(self, pop, conditions):
+        """ Boolean mask of simulants in pop matching all conditions."""
+        mask = np.ones(len(pop), dtype=bool)
+        for column, (op, condition) in conditions.items():
+            mask &= np.asarray(OPERATORS[op](pop[column].to_numpy(), condition), dtype=bool)
+        return mask
+
+    def apply(self, pop, changed_only=True):
+        """ Apply every rule in order to pop.
+
+        Parameters
+        ----------
+        pop : pd.DataFrame
+            Population with all columns in self.columns.
+        changed_only : bool
+            Only return simulants whose target value changed. Saves writing back unchanged values.
+        Returns
+        -------
+        target : pd.Series
+            New values of the target column.
+        """
+        values = pop[self.target].to_numpy(copy=True)
+        for value, conditions, how in self.rules:
+            mask = self.mask(pop, conditions)
+            if how == 'at_least':
+                # as with values[values < value] = value missing values are left alone.
+                mask &= values < value
+            values[mask] = value
+        target = pd.Series(values, index=pop.index, name=self.target)
+        if changed_only:
+            original = pop[self.target]
+            changed = (target != original) & ~(target.isna() & original.isna())
+            target = target[changed]
+        return target
@@ -92,7 +92,7 @@ class Tobacco(Base):
         logging.info("TOBACCO")
 
         # Get living people to update their tobacco
-        pop = self.population_view.get(event.index, query="alive =='alive'")
+        pop = self.get_alive_population(event.index)
         self.year = event.time.year
 
         # Predict next tobacco value
@@ -123,12 +123,13 @@ class Tobacco(Base):
             year = max(self.year, 2014)
             year = min(year, 2020)
 
-        transition_model = r_utils.load_transitions(f"ncigs/zip/ncigs_{year}_{year + 1}", self.rpy2Modules, path=self.transition_dir)
+        transition_model = self.transition_utils.load_transitions(f"ncigs/zip/ncigs_{year}_{year + 1}", self.rpy2Modules, path=self.transition_dir, cache=self.transition_model_cache)
         # The calculation relies on the R predict method and the model that has already been specified
-        nextWaveTobacco = r_utils.predict_next_timestep_zip(model=transition_model,
-                                                            rpy2Modules= self.rpy2Modules,
-                                                            current=pop,
-                                                            dependent='ncigs')
+        nextWaveTobacco = self.transition_utils.predict_next_timestep_zip(model=transition_model,
+                                                                          rpy2Modules= self.rpy2Modules,
+                                                                          current=pop,
+                                                                          dependent='ncigs',
+                                                                          draws=self.random.get_draw(pop.index))
         return nextWaveTobacco
 
     def plot(self, pop, config):
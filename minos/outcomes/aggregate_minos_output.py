@@ -5,18 +5,7 @@ import argparse
 import os
 import yaml
 from datetime import datetime
-from multiprocessing import Pool
-from itertools import repeat
-from aggregate_subset_functions import dynamic_subset_function
-
-
-def aggregate_csv(filename, v, agg_method, subset_func_string, mode):
-    'converts a filename to a pandas dataframe'
-    df = pd.read_csv(filename, low_memory=False)
-    if subset_func_string:
-       df = dynamic_subset_function(df, subset_func_string, mode)
-    #print(f"For substring chain {subset_func_string} there are {df.shape[0]} eligible individuals in the dataset.")
-    return agg_method(df[v])
+from minos.outcomes.aggregation_engine import aggregate_batches, get_variable_frame, get_method_name
 
 
 def aggregate_variables_by_year(source, mode, years, tag, v, method, subset_func_string):
@@ -34,6 +23,9 @@ def aggregate_variables_by_year(source, mode, years, tag, v, method, subset_func
     This is repeated over all years to produce an output dataframe with 1000 rows.
     Each row is an aggregated v value for each iteration and year pair.
 
+    Files are processed by the streaming engine in aggregation_engine.py. Use aggregate_batches directly to aggregate
+    several sources, variables or methods in one pass.
+
     Parameters
     ----------
     source: str
@@ -51,61 +43,45 @@ def aggregate_variables_by_year(source, mode, years, tag, v, method, subset_func
         Data frame with columns year, tag and v. Year is year of observation, tag is MINOS batch run and intervention
         it has come from, v is aggregated variable. Usually SF12.
     """
-
-    df = pd.DataFrame()
-    for year in years:
-        files = glob.glob(os.path.join(source, f"*{year}.csv"))  # grab all files at source with suffix year.csv.
-
-        # 2018 is special case - not simulated yet and therefore doesn't have any of the tags for subset functions
-        # Therefore we are just going to get everyone alive for now
-        # TODO: Set this value from the config file so it only happens for the year before simulation (currently 2020) and isn't hardcoded
-        if year == 2020 and tag == "Baseline":
-            with Pool() as pool:
-                aggregated_means = pool.starmap(aggregate_csv,
-                                                zip(files, repeat(v), repeat(method), repeat("who_alive"), repeat(mode)))
-        elif year == 2020 and tag != "Baseline":
-            continue # skip processing here. ignoring starting data from interventions.
-        else:
-            with Pool() as pool:
-                aggregated_means = pool.starmap(aggregate_csv,
-                                                zip(files, repeat(v), repeat(method), repeat(subset_func_string), repeat(mode)))
-
-        new_df = pd.DataFrame(aggregated_means)
-        new_df.columns = [v]
-        new_df['year'] = year
-        new_df['tag'] = tag
-        df = pd.concat([df, new_df])
-    return df
+    batches = [{'source': source, 'tag': tag, 'years': years, 'subset': subset_func_string}]
+    aggregates = aggregate_batches(batches, [v], [method], mode)
+    return get_variable_frame(aggregates, v, method)
 
 
-def main(source, mode, years, tag, v, method, subset_function_string):
+def main(batches, mode, variables, methods, use_manifest=True):
     """
     Parameters
     ----------
-    source: list
-        MINOS batch run to process.
-    years: list
-        Range of years to plot.
-    tag: list
-        Corresponding name of the MINOS batch source. Usually what intervention was used. Baseline Uplift, etc..
-    v: str
-        What variable to aggregate on. Defaults to SF_12
-    method: func
-        What function to aggregate over. Default np.nanmean.
-    destination: str
-        Where to save final plots. Defaults to original source.
-    subset_function_string : str
-        What chain of subset functions are aggregated on?
+    batches: list
+        MINOS batch runs to process. Dicts with keys source (batch run directory), tag (corresponding name of the MINOS
+        batch source. Usually what intervention was used. Baseline Uplift, etc..), years (range of years to aggregate)
+        and subset (what chain of subset functions are aggregated on?)
+    variables: list
+        What variables to aggregate on. Defaults to SF_12
+    methods: list
+        What functions to aggregate over. Default nanmean.
+    use_manifest: bool
+        Reuse partial aggregates of unchanged files from each source's aggregation manifest.
     Returns
     -------
-    df: pd.DataFrame
-        Dataframe df containing 3 columns year, tag, v. Long frame of aggregates by year and source.
+    aggregates: pd.DataFrame
+        Long frame of aggregates for every file, variable and method. A csv with 3 columns year, tag, v is saved in
+        each source directory for every variable and method.
     """
-    print(f"Aggregating for source {source}, tag {tag} using {method.__name__} over {v}")
-    destination = os.path.join(source, f"{tag}_aggregated_{v}_by_{method.__name__}.csv")
-    df = aggregate_variables_by_year(source, mode, years, tag, v, method, subset_function_string)
-    df.to_csv(destination, index=False)
-    print(f"Saved file to {destination}")
+    for batch in batches:
+        print(f"Aggregating for source {batch['source']}, tag {batch['tag']} using "
+              f"{', '.join(get_method_name(method) for method in methods)} over {', '.join(variables)}")
+    aggregates = aggregate_batches(batches, variables, methods, mode, use_manifest=use_manifest)
+
+    for batch in batches:
+        batch_aggregates = aggregates.loc[aggregates['source'] == batch['source']]
+        for v in variables:
+            for method in methods:
+                destination = os.path.join(batch['source'],
+                                           f"{batch['tag']}_aggregated_{v}_by_{get_method_name(method)}.csv")
+                get_variable_frame(batch_aggregates, v, method).to_csv(destination, index=False)
+                print(f"Saved file to {destination}")
+    return aggregates
 
 
 if __name__ == '__main__':
@@ -118,32 +94,28 @@ if __name__ == '__main__':
     parser.add_argument("-t", "--tags", required=True, type=str,
                         help="Corresponding name tags for which data is being processed. I.E which intervention Baseline/£20 Uplift etc. Used as label in later plots.")
     parser.add_argument("-v", "--variable", required=False, type=str, default='SF_12',
-                        help="What variable from Minos is being aggregated. Defaults to SF12.")
+                        help="What variables from Minos are being aggregated separated by commas. Defaults to SF12.")
     parser.add_argument("-a", "--aggregate_method", required=False, type=str, default="nanmean",
-                        help="What method is used to aggregate population. Defaults to np.nanmean.")
+                        help="What methods are used to aggregate population separated by commas. Defaults to np.nanmean. "
+                             "See AGGREGATE_METHODS in aggregation_engine.py for the options.")
     parser.add_argument("-f", "--subset_function", required=False, type=str, default=None,
                         help="What subset of the population is used in analysis. E.g. only look at the treated subset of the population")
+    parser.add_argument("--no_manifest", action='store_false', dest='use_manifest',
+                        help="Read every file rather than reusing partial aggregates from aggregation_manifest.json.")
 
     args = vars(parser.parse_args())
     mode = args['mode']
     directories = args['directories']
     tags = args['tags']
-    v = args['variable']
-    method = args['aggregate_method']
+    variables = args['variable'].split(",")
+    methods = args['aggregate_method'].split(",")
     subset_functions = args['subset_function']
 
-    if method == "nanmean":
-        method = np.nanmean
-    else:
-        #TODO no better way to do this to my knowledge without eval() which shouldn't be used.
-        raise ValueError("Unknown aggregate function specified. Please add specifc function required at 'aggregate_minos_output.py")
-        #TODO replace this if...else... with a try...except block around the main function below.
-
-
     directories = directories.split(",")
     tags = tags.split(",")
     subset_functions = subset_functions.split(',')
 
+    batches = []
     for directory, tag, subset_function_string in zip(directories, tags, subset_functions):
 
         # Handle the datetime folder inside the output. Select most recent run
@@ -167,4 +139,7 @@ if __name__ == '__main__':
             end_year = config['time']['end']['year']
             years = np.arange(start_year, end_year)
         #print(batch_source, years)
-        df = main(batch_source, mode, years, tag, v, method, subset_function_string)
+        batches.append({'source': batch_source, 'tag': tag, 'years': years, 'subset': subset_function_string})
+
+    # Aggregate every directory in one pass with one pool of workers.
+    main(batches, mode, variables, methods, args['use_manifest'])
@@ -3,10 +3,10 @@
 import numpy as np
 import pandas as pd
 
-def dynamic_subset_function(data, subset_chain_string=None, mode = 'default_config'):
-
+def get_subset_chain(subset_chain_string=None, mode='default_config'):
+    """ List of subset functions applied for a subset chain string such as who_kids."""
     if subset_chain_string == None:
-        function_string = "who_alive"
+        subset_chain_string = "who_alive"
         print("No subset defined. Defaulting to who_alive..")
 
     subset_chains = {"who": [],
@@ -17,7 +17,7 @@ def dynamic_subset_function(data, subset_chain_string=None, mode = 'default_conf
                     "who_kids": [who_alive, who_kids],
                     "who_below_poverty_line_and_kids": [who_alive, who_kids, who_below_poverty_line],
                     "who_scottish": [who_alive, who_scottish],
-                    "who_bottom_income_quintile": who_bottom_income_quintile,
+                    "who_bottom_income_quintile": [who_bottom_income_quintile],
                     # Scottish gov sgugested vulnerable subgroups.
                     "who_disabled": [who_alive, who_kids, who_disabled],
                     "who_ethnic_minority": [who_alive, who_kids, who_ethnic_minority],
@@ -41,12 +41,56 @@ def dynamic_subset_function(data, subset_chain_string=None, mode = 'default_conf
     if mode == 'scotland_mode':  # if in scotland mode add it to the .
         subset_chain.append(who_scottish)
 
-    for subset_function in subset_chain:
+    return subset_chain
+
+
+def dynamic_subset_function(data, subset_chain_string=None, mode = 'default_config'):
+
+    for subset_function in get_subset_chain(subset_chain_string, mode):
         data = subset_function(data)
 
     return data
 
 
+# Columns each subset function reads. Used to only load these (and the aggregated variables) from output files.
+SUBSET_COLUMNS = {"who_alive": ['alive'],
+                  "who_adult": ['age'],
+                  "who_below_living_wage": ['hourly_wage', 'region'],
+                  "who_bottom_income_quintile": ['alive', 'hh_income'],
+                  "who_below_poverty_line": ['hh_income'],
+                  "who_boosted": ['income_boosted'],
+                  "who_disabled": ['labour_state'],
+                  "who_ethnic_minority": ['ethnicity'],
+                  "who_female": ['sex'],
+                  "who_kids": ['nkids'],
+                  "who_no_formal_education": ['education_state'],
+                  "who_scottish": ['region'],
+                  "who_single": ['marstat'],
+                  "who_three_kids": ['nkids'],
+                  "who_unemployed": ['labour_state'],
+                  "who_young_adults": ['age'],
+                  "who_uses_energy": ['yearly_energy'],
+                  }
+
+# Subset functions that depend on the whole population (quantiles, medians) rather than each row on its own.
+# Chains containing these can't be applied to a file in chunks.
+POPULATION_SUBSET_FUNCTIONS = ["who_bottom_income_quintile", "who_below_poverty_line"]
+
+
+def get_subset_columns(subset_chain_string=None, mode='default_config'):
+    """ Columns needed to apply a subset chain. """
+    columns = []
+    for subset_function in get_subset_chain(subset_chain_string, mode):
+        columns += [column for column in SUBSET_COLUMNS[subset_function.__name__] if column not in columns]
+    return columns
+
+
+def is_row_wise(subset_chain_string=None, mode='default_config'):
+    """ Can the subset chain be applied to chunks of a population independently?"""
+    return not any(subset_function.__name__ in POPULATION_SUBSET_FUNCTIONS
+                   for subset_function in get_subset_chain(subset_chain_string, mode))
+
+
 def who_alive(df):
     """ Get who is alive.
     Parameters
@@ -0,0 +1,341 @@
+"""Streaming aggregation of MINOS batch output.
+
+A batch run writes one population file per run and year. Aggregating a variable used to mean loading every file in
+full with a fresh process pool for each year. Here each file is read once for every variable and aggregation method
+needed, only loading the aggregated variables and the columns read by the subset function chain (see
+aggregate_subset_functions.SUBSET_COLUMNS). Files are processed in chunks of rows where the subset chain allows it, and
+all files for all years and tags are spread over a single pool of worker processes.
+
+Partial aggregates of each file (count, sum, sum of squares, min, max and quantiles of each variable for each subset
+chain) are kept in an aggregation manifest in the batch directory, keyed by a hash of the file contents. Re-running an
+aggregation over the same batch (e.g. with another subset chain or method) only reads new or changed files.
+"""
+
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from minos.outcomes.aggregate_subset_functions import dynamic_subset_function, get_subset_columns, is_row_wise
+from minos.utils import iter_population, get_population_files, hash_file
+
+# Aggregation methods that can be requested by name (e.g. -a nanmean in aggregate_minos_output.py).
+AGGREGATE_METHODS = {"nanmean": np.nanmean,
+                     "nanmedian": np.nanmedian,
+                     "nansum": np.nansum,
+                     "nanstd": np.nanstd,
+                     "nanmin": np.nanmin,
+                     "nanmax": np.nanmax,
+                     }
+
+# Rows read at once from each file.
+DEFAULT_CHUNKSIZE = 250000
+
+# Quantiles stored for each file in the aggregation manifest. Includes 0.5 so medians are exact.
+QUANTILES = np.linspace(0, 1, 101)
+
+
+def summarise(values):
+    """ Partial aggregates of an array of values. NaNs are ignored as with the np.nan* functions.
+
+    Returns
+    -------
+    partial : dict
+        count, sum, sumsq (sum of squares), min, max and quantiles (at QUANTILES) of the non missing values.
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {'count': 0, 'sum': 0.0, 'sumsq': 0.0, 'min': np.nan, 'max': np.nan,
+                'quantiles': [np.nan] * len(QUANTILES)}
+    return {'count': int(len(values)),
+            'sum': float(values.sum()),
+            'sumsq': float(np.square(values).sum()),
+            'min': float(values.min()),
+            'max': float(values.max()),
+            'quantiles': np.quantile(values, QUANTILES).tolist()}
+
+
+def _partial_mean(partial):
+    return partial['sum'] / partial['count'] if partial['count'] else np.nan
+
+
+def _partial_std(partial):
+    if not partial['count']:
+        return np.nan
+    return np.sqrt(max(partial['sumsq'] / partial['count'] - _partial_mean(partial) ** 2, 0))
+
+
+# Aggregation methods that can be computed from the partial aggregates of summarise.
+PARTIAL_METHODS = {"nanmean": _partial_mean,
+                   "nanmedian": lambda partial: partial['quantiles'][len(QUANTILES) // 2],
+                   "nansum": lambda partial: partial['sum'],
+                   "nanstd": _partial_std,
+                   "nanmin": lambda partial: partial['min'],
+                   "nanmax": lambda partial: partial['max'],
+                   }
+
+
+class AggregationManifest:
+    """ Partial aggregates of the population files in a batch output directory.
+
+    Saved as aggregation_manifest.json in the directory. Partials are keyed by the hash of the file they came from and
+    a string describing how they were made (subset chain, mode, variable etc.). File sizes and modification times are
+    recorded so unchanged files don't need hashing again.
+    """
+
+    FILE_NAME = "aggregation_manifest.json"
+
+    def __init__(self, source):
+        self.path = os.path.join(source, self.FILE_NAME)
+        self.files = {}
+        self.partials = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                manifest = json.load(f)
+            self.files = manifest['files']
+            self.partials = manifest['partials']
+
+    def file_hash(self, file_name):
+        """ Hash of a file if it is unchanged since it was last recorded. None if new or changed."""
+        record = self.files.get(os.path.basename(file_name))
+        stat = os.stat(file_name)
+        if record and record['size'] == stat.st_size and record['mtime_ns'] == stat.st_mtime_ns:
+            return record['hash']
+        return None
+
+    def set_file_hash(self, file_name, file_hash):
+        stat = os.stat(file_name)
+        self.files[os.path.basename(file_name)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                                   'hash': file_hash}
+
+    def get(self, file_hash, key):
+        return self.partials.get(file_hash, {}).get(key)
+
+    def set(self, file_hash, key, partial):
+        self.partials.setdefault(file_hash, {})[key] = partial
+
+    def save(self):
+        # Write then rename so an interrupted save doesn't leave a broken manifest.
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, 'w') as f:
+            json.dump({'files': self.files, 'partials': self.partials}, f)
+        os.replace(temporary_path, self.path)
+
+
+def get_partial_key(subset_func_string, mode, v):
+    """ Manifest key for the partial aggregates of variable v under a subset chain."""
+    return f"subset={subset_func_string}|mode={mode}|variable={v}"
+
+
+def get_aggregate_method(method):
+    """ Get an aggregate function from its name. Functions are passed through."""
+    if callable(method):
+        return method
+    if method not in AGGREGATE_METHODS:
+        raise ValueError(f"Unknown aggregate function {method}. Please use one of {list(AGGREGATE_METHODS)} or add "
+                         f"the function required to AGGREGATE_METHODS in aggregation_engine.py")
+    return AGGREGATE_METHODS[method]
+
+
+def get_method_name(method):
+    return method if isinstance(method, str) else method.__name__
+
+
+def subset_file(file_name, variables, subset_func_string=None, mode='default_config', chunksize=DEFAULT_CHUNKSIZE):
+    """ Values of variables for the subset of a population file selected by a subset function chain.
+
+    Parameters
+    ----------
+    file_name : str
+        Population file (csv, parquet or feather).
+    variables : list
+        Variables to return.
+    subset_func_string : str
+        Subset function chain from aggregate_subset_functions. E.g. who_alive. No subsetting if None.
+    mode : str
+        MINOS mode. Adds the who_scottish subset in scotland_mode.
+    chunksize : int
+        Rows read at a time. The whole file is read at once if the subset chain needs the whole population
+        (e.g. income quintiles).
+    Returns
+    -------
+    values : dict
+        Values of each variable for the subset population.
+    """
+    columns = list(variables)
+    if subset_func_string:
+        columns += [column for column in get_subset_columns(subset_func_string, mode) if column not in columns]
+        if not is_row_wise(subset_func_string, mode):
+            chunksize = None
+
+    values = {v: [] for v in variables}
+    for chunk in iter_population(file_name, columns, chunksize):
+        if subset_func_string:
+            chunk = dynamic_subset_function(chunk, subset_func_string, mode)
+        for v in variables:
+            values[v].append(chunk[v].to_numpy())
+    return {v: np.concatenate(parts) for v, parts in values.items()}
+
+
+def aggregate_file(file_name, variables, methods, subset_func_string=None, mode='default_config',
+                   chunksize=DEFAULT_CHUNKSIZE):
+    """ Aggregate each variable in a population file by each method in one pass over the file.
+
+    Returns
+    -------
+    aggregates : dict
+        Aggregate value for each (variable, method name) pair.
+    """
+    values = subset_file(file_name, variables, subset_func_string, mode, chunksize)
+    return {(v, get_method_name(method)): get_aggregate_method(method)(values[v])
+            for v in variables for method in methods}
+
+
+def _aggregate_task(task):
+    """ Aggregate the file of a task built by get_aggregation_tasks. Used by the worker pool.
+
+    Returns
+    -------
+    result : dict
+        hash (of the file), partials (summarise output for each variable) and aggregates (for each variable and any
+        method that can't be computed from partials).
+    """
+    values = subset_file(task['file'], task['variables'], task['subset'], task['mode'], task['chunksize'])
+    file_hash = task['hash']
+    if file_hash is None and task['use_manifest']:
+        file_hash = hash_file(task['file'])
+    return {'hash': file_hash,
+            'partials': {v: summarise(values[v]) for v in task['variables']},
+            'aggregates': {(v, get_method_name(method)): get_aggregate_method(method)(values[v])
+                           for v in task['variables'] for method in task['methods']
+                           if get_method_name(method) not in PARTIAL_METHODS}}
+
+
+def get_aggregation_tasks(batches, variables, methods, mode='default_config', chunksize=DEFAULT_CHUNKSIZE):
+    """ One task for every population file in every batch.
+
+    Parameters
+    ----------
+    batches : list
+        Dicts with keys source (batch output directory), tag, years and subset (subset function chain).
+    Returns
+    -------
+    tasks : list
+    """
+    tasks = []
+    for batch in batches:
+        for year in batch['years']:
+            subset = batch['subset']
+            # 2020 is special case - not simulated yet and therefore doesn't have any of the tags for subset functions
+            # Therefore we are just going to get everyone alive for now
+            # TODO: Set this value from the config file so it only happens for the year before simulation (currently 2020) and isn't hardcoded
+            if year == 2020 and batch['tag'] == "Baseline":
+                subset = "who_alive"
+            elif year == 2020:
+                continue  # skip processing here. ignoring starting data from interventions.
+
+            for file_name in get_population_files(batch['source'], year):
+                tasks.append({'file': file_name, 'source': batch['source'], 'tag': batch['tag'], 'year': year,
+                              'variables': list(variables), 'methods': list(methods), 'subset': subset,
+                              'mode': mode, 'chunksize': chunksize, 'hash': None})
+    return tasks
+
+
+def aggregate_batches(batches, variables, methods, mode='default_config', processes=None,
+                      chunksize=DEFAULT_CHUNKSIZE, use_manifest=True):
+    """ Aggregate several variables by several methods over every file in several MINOS batch runs.
+
+    Every file is read once and all files of all batches share one pool of worker processes. With use_manifest, files
+    whose partial aggregates are already in their batch's aggregation manifest are not read at all.
+
+    Parameters
+    ----------
+    batches : list
+        Dicts with keys source (batch output directory), tag, years and subset (subset function chain).
+    variables : list
+        Variables to aggregate. E.g. SF_12.
+    methods : list
+        Aggregate function names (see AGGREGATE_METHODS) or functions.
+    mode : str
+        MINOS mode. Adds the who_scottish subset in scotland_mode.
+    processes : int
+        (Optional) Number of worker processes. Defaults to the number of CPUs.
+    chunksize : int
+        Rows read from each file at a time.
+    use_manifest : bool
+        Reuse and update the partial aggregates in each batch's AggregationManifest. Methods not in PARTIAL_METHODS
+        always need the files to be read.
+    Returns
+    -------
+    df : pd.DataFrame
+        Long frame with columns source, tag, year, file, variable, method and value. One row for every file, variable
+        and method.
+    """
+    for method in methods:
+        get_aggregate_method(method)  # check methods before starting any work.
+    tasks = get_aggregation_tasks(batches, variables, methods, mode, chunksize)
+    partials_only = all(get_method_name(method) in PARTIAL_METHODS for method in methods)
+
+    # Use partials from the manifests where every variable is already there for an unchanged file.
+    manifests = {}
+    pending = []
+    for task in tasks:
+        task['partials'] = None
+        task['use_manifest'] = use_manifest
+        if use_manifest:
+            manifest = manifests.setdefault(task['source'], AggregationManifest(task['source']))
+            task['hash'] = manifest.file_hash(task['file'])
+            if task['hash'] is not None and partials_only:
+                partials = {v: manifest.get(task['hash'], get_partial_key(task['subset'], mode, v)) for v in variables}
+                if all(partial is not None for partial in partials.values()):
+                    task['partials'] = partials
+        if task['partials'] is None:
+            pending.append(task)
+    if use_manifest:
+        print(f"Reusing partial aggregates for {len(tasks) - len(pending)} of {len(tasks)} files. "
+              f"Reading {len(pending)} files.")
+
+    with Pool(processes) as pool:
+        results = pool.map(_aggregate_task, pending, chunksize=1)
+    for task, result in zip(pending, results):
+        task['partials'] = result['partials']
+        task['aggregates'] = result['aggregates']
+        if use_manifest:
+            manifest = manifests[task['source']]
+            manifest.set_file_hash(task['file'], result['hash'])
+            for v, partial in result['partials'].items():
+                manifest.set(result['hash'], get_partial_key(task['subset'], mode, v), partial)
+    for manifest in manifests.values():
+        manifest.save()
+
+    rows = []
+    for task in tasks:
+        for v in variables:
+            for method in map(get_method_name, methods):
+                if method in PARTIAL_METHODS:
+                    value = PARTIAL_METHODS[method](task['partials'][v])
+                else:
+                    value = task['aggregates'][(v, method)]
+                rows.append({'source': task['source'], 'tag': task['tag'], 'year': task['year'],
+                             'file': task['file'], 'variable': v, 'method': method, 'value': value})
+    return pd.DataFrame(rows, columns=['source', 'tag', 'year', 'file', 'variable', 'method', 'value'])
+
+
+def get_variable_frame(aggregates, v, method):
+    """ Frame of aggregates for one variable and method in the year, tag, v format used by aggregate_long_stack.py.
+
+    Parameters
+    ----------
+    aggregates : pd.DataFrame
+        Output of aggregate_batches.
+    Returns
+    -------
+    df : pd.DataFrame
+        Columns v, year and tag. One row per file.
+    """
+    df = aggregates.loc[(aggregates['variable'] == v) & (aggregates['method'] == get_method_name(method)),
+                        ['value', 'year', 'tag']]
+    return df.rename(columns={'value': v}).reset_index(drop=True)
@@ -10,6 +10,8 @@ import glob
 import os
 from datetime import datetime
 from minos.outcomes.aggregate_subset_functions import dynamic_subset_function
+from minos.outcomes.aggregation_engine import AggregationManifest, hash_file
+from minos.utils import read_population, get_population_files
 from multiprocessing import Pool
 from itertools import repeat
 import sys
@@ -53,7 +55,7 @@ def get_latest_minos_files(source):
 
 
 def get_minos_files(source):
-    return glob.glob(source + f"/*{year}.csv")
+    return get_population_files(source, year)
 
 
 def get_spatial_data():
@@ -219,7 +221,7 @@ def attach_spatial_component(minos_data, spatial_data, v, method=np.nanmean):
 
 
 def load_synthetic_data(minos_file, subset_function, v, method=np.nanmean):
-    minos_data = pd.read_csv(minos_file)
+    minos_data = read_population(minos_file)
 
     if subset_function:
         minos_data = dynamic_subset_function(minos_data, subset_function)
@@ -229,7 +231,7 @@ def load_synthetic_data(minos_file, subset_function, v, method=np.nanmean):
 
 
 def load_data_and_attach_spatial_component(minos_file, spatial_data, subset_function, v, method=np.nanmean):
-    minos_data = pd.read_csv(minos_file)
+    minos_data = read_population(minos_file)
     if subset_function:
         minos_data = dynamic_subset_function(minos_data, subset_function)
     minos_data = minos_data[['pidp', v]]
@@ -238,6 +240,70 @@ def load_data_and_attach_spatial_component(minos_file, spatial_data, subset_func
     return minos_data
 
 
+def get_zone_partials(minos_data, v):
+    """ Count, sum and sum of squares of v in each ZoneID. NaN values of v are ignored."""
+    grouped = minos_data.groupby("ZoneID")[v]
+    counts = grouped.count()
+    return {"ZoneID": counts.index.tolist(),
+            "count": counts.tolist(),
+            "sum": grouped.sum().tolist(),
+            "sumsq": (minos_data[v] ** 2).groupby(minos_data["ZoneID"]).sum().tolist()}
+
+
+def get_zone_means(zone_partials, v):
+    """ Mean of v in each ZoneID from get_zone_partials. Same as group_by_and_aggregate with np.nanmean."""
+    counts = np.array(zone_partials["count"], dtype=float)
+    means = np.divide(zone_partials["sum"], counts, out=np.full(len(counts), np.nan), where=counts > 0)
+    return pd.DataFrame({v: means, "ZoneID": zone_partials["ZoneID"]})
+
+
+def load_zone_partials(minos_file, spatial_data, subset_function, v, is_synthetic_pop):
+    """ Hash and zone partials (get_zone_partials) of a minos file for the aggregation manifest."""
+    minos_data = read_population(minos_file)
+    if subset_function:
+        minos_data = dynamic_subset_function(minos_data, subset_function)
+    if is_synthetic_pop:
+        minos_data = minos_data[['pidp', "ZoneID", v]]
+    else:
+        minos_data = attach_spatial_component(minos_data[['pidp', v]], spatial_data, v)
+    return hash_file(minos_file), get_zone_partials(minos_data, v)
+
+
+def load_minos_data_with_manifest(minos_files, subset_function, is_synthetic_pop, v, region, manifest):
+    """ load_minos_data for np.nanmean using per file zone partials cached in an AggregationManifest.
+
+    Only files that are new or changed since the last aggregation with the same region, subset function and variable
+    are read.
+    """
+    key = f"spatial|region={'synthetic' if is_synthetic_pop else region}|subset={subset_function}|variable={v}"
+    zone_partials = {}
+    pending = []
+    for minos_file in minos_files:
+        file_hash = manifest.file_hash(minos_file)
+        partial = manifest.get(file_hash, key) if file_hash is not None else None
+        if partial is None:
+            pending.append(minos_file)
+        else:
+            zone_partials[minos_file] = partial
+    print(f"Reusing zone aggregates for {len(zone_partials)} of {len(minos_files)} files. Reading {len(pending)} files.")
+
+    if pending:
+        spatial_data = None
+        if not is_synthetic_pop:
+            spatial_data = get_spatial_data()
+            spatial_data = subset_lsoas_by_region(spatial_data, get_region_lsoas(region))
+        with Pool() as pool:
+            results = pool.starmap(load_zone_partials, zip(pending, repeat(spatial_data), repeat(subset_function),
+                                                           repeat(v), repeat(is_synthetic_pop)))
+        for minos_file, (file_hash, partial) in zip(pending, results):
+            manifest.set_file_hash(minos_file, file_hash)
+            manifest.set(file_hash, key, partial)
+            zone_partials[minos_file] = partial
+        manifest.save()
+
+    return pd.concat([get_zone_means(zone_partials[minos_file], v) for minos_file in minos_files])
+
+
 def load_minos_data(minos_files, subset_function, is_synthetic_pop, v, region='glasgow'):
     # Get spatial data and subset LSOAs for desired region.
     # Pooled as there can be hundreds of datasets here and it gets silly.
@@ -262,7 +328,7 @@ def load_minos_data(minos_files, subset_function, is_synthetic_pop, v, region='g
     return total_minos_data
 
 
-def main(source, year, region, subset_function, is_synthetic_pop, v, method=np.nanmean):
+def main(source, year, region, subset_function, is_synthetic_pop, v, method=np.nanmean, use_manifest=True):
     """ Aggregate some attribute v to LSOA level and put it in a geojson map.
 
     - Merge minos data onto spatially weighted LSOAs.
@@ -281,13 +347,19 @@ def main(source, year, region, subset_function, is_synthetic_pop, v, method=np.n
          with groupby.apply though
     save_type: str
         What type of file is the output saved to? csv or geojson.
+    use_manifest : bool
+        Reuse per file zone aggregates from the source's aggregation manifest (np.nanmean only).
     Returns
     -------
     None
     """
     print(f"Aggregating MINOS data at {source} for {year} and {region} region.")
     minos_files = get_minos_files(source)
-    total_minos_data = load_minos_data(minos_files, subset_function, is_synthetic_pop, v, region)
+    if use_manifest and method is np.nanmean:
+        total_minos_data = load_minos_data_with_manifest(minos_files, subset_function, is_synthetic_pop, v, region,
+                                                         AggregationManifest(source))
+    else:
+        total_minos_data = load_minos_data(minos_files, subset_function, is_synthetic_pop, v, region)
 
     # aggregate repeat minos runs again by LSOA to get grand mean change in SF_12 by lsoa.
     total_minos_data = group_by_and_aggregate(total_minos_data, "ZoneID", v, method)
@@ -344,6 +416,8 @@ if __name__ == "__main__":
                         help="Is this a synthetic population? If yes it has a spatial component that can be used directly.")
     parser.add_argument("-v", "--aggregation_variable", default="", type=str,
                         help="Which variable should we aggregate and subsequently plot as our key outcome measure.")
+    parser.add_argument("--no_manifest", action='store_false', dest='use_manifest',
+                        help="Read every file rather than reusing zone aggregates from aggregation_manifest.json.")
 
     # get args an
     args = vars(parser.parse_args())
@@ -363,4 +437,4 @@ if __name__ == "__main__":
     # get subset function from specified subset function string.
     source = get_latest_minos_files(os.path.join("output", mode, intervention))
 
-    main(source, year, region, subset_function, is_synthetic_pop, v)
+    main(source, year, region, subset_function, is_synthetic_pop, v, use_manifest=args['use_manifest'])
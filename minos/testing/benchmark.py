@@ -0,0 +1,478 @@
+"""
+=========
+Benchmark
+=========
+Reproducible throughput benchmark for the Minos modules.
+
+Synthesises populations of a given size with the column schema of the data/final_US/*_US_cohort.csv files, swaps the
+transition models for stubs that return correctly shaped predictions without R or any fitted models, and times one
+year step of every component in components_map and SIPHER7_components_map on its own and of the full component list
+of a config. Simulations are built with the same setup_simulation as real runs (so the MockArtifactManager data
+store, rate tables, household index and time step profiler are all as in a real run). Each record is appended to a
+history csv with the package versions and git revision so results from before and after a vivarium or pandas upgrade
+can be compared.
+
+Example
+-------
+python minos/testing/benchmark.py -c config/default.yaml -n 10000 100000 1000000
+"""
+
+import argparse
+import datetime
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+import minos.utils as utils
+import minos.modules.r_utils as r_utils
+import minos.modules.native_utils as native_utils
+from minos.modules.model_predictors import ModelPredictors
+import minos.minosPipeline.RunPipeline as RunPipeline
+
+# Regions and ethnicity groups used as keys in the mortality and fertility rate tables.
+REGIONS = ['North East', 'North West', 'Yorkshire and The Humber', 'East Midlands', 'West Midlands',
+           'East of England', 'London', 'South East', 'South West', 'Wales', 'Scotland', 'Northern Ireland']
+ETHNICITIES = ['WBI', 'WHO', 'BAN', 'BLA', 'BLC', 'CHI', 'IND', 'MIX', 'OAS', 'OBL', 'OTH', 'PAK']
+
+HISTORY_COLUMNS = ['timestamp', 'git_revision', 'python', 'numpy', 'pandas', 'vivarium', 'config', 'population_size',
+                   'scope', 'component', 'setup_time', 'step_time', 'module_time', 'rows', 'rss_change_mb', 'error']
+
+
+def synthetic_population(n, year=2020, seed=0):
+    """ Synthetic population with the columns of a final_US cohort file.
+
+    Values are drawn independently for each column with roughly the ranges and categories of the real data. Only the
+    schema and the sizes matter for benchmarking, not the joint distribution.
+
+    Parameters
+    ----------
+    n : int
+        Number of simulants.
+    year : int
+        Year of the cohort (time column).
+    seed : int
+        Seed for the random generator.
+    Returns
+    -------
+    population : pd.DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    age = rng.integers(16, 95, n)
+    # Households of 1 to 4 members with contiguous ids.
+    hidp = np.repeat(np.arange(n), rng.integers(1, 5, n))[:n] + 1
+    hhsize = pd.Series(hidp).map(pd.Series(hidp).value_counts()).to_numpy()
+    nkids = rng.choice([0, 0, 0, 1, 2, 3], n)
+    child_ages = np.where(nkids > 0,
+                          ["_".join(str(a) for a in sorted(rng.integers(0, 16, k), reverse=True)) for k in nkids],
+                          None)
+    hh_income = rng.normal(1500, 800, n)
+    job_hours = np.where(age < 66, rng.normal(35, 10, n).clip(0), 0)
+    hourly_wage = np.where(job_hours > 0, rng.lognormal(2.6, 0.4, n), np.nan)
+    SF_12 = rng.normal(50, 9, n).clip(0, 100)
+
+    population = pd.DataFrame({
+        'pidp': np.arange(n) + 1,
+        'hidp': hidp,
+        'age': age,
+        'sex': rng.choice(['Male', 'Female'], n),
+        'ethnicity': rng.choice(ETHNICITIES, n, p=[0.78] + [0.02] * 11),
+        'region': rng.choice(REGIONS, n),
+        'alive': 'alive',
+        'time': year,
+        'exit_time': np.nan,
+        'education_state': rng.integers(0, 8, n),
+        'max_educ': rng.integers(0, 8, n),
+        'academic_year': year,
+        'birth_month': rng.integers(1, 13, n),
+        'birth_year': year - age,
+        'hh_int_y': year,
+        'hh_int_m': rng.integers(1, 13, n),
+        'Date': f"{year}-01-01",
+        'nobs': rng.integers(1, 12, n),
+        'weight': rng.uniform(0.5, 2, n),
+        'depression': rng.integers(0, 2, n),
+        'job_industry': rng.integers(1, 22, n),
+        'job_occupation': rng.integers(1, 10, n),
+        'job_sec': rng.integers(1, 6, n),
+        'job_sector': rng.integers(1, 3, n),
+        'job_duration_m': rng.integers(0, 12, n),
+        'job_duration_y': rng.integers(0, 30, n),
+        'job_hours': job_hours,
+        'job_hours_se': job_hours,
+        'job_hours_diff': rng.normal(0, 3, n),
+        'job_inc': hh_income,
+        'jb_inc_per': rng.integers(1, 5, n),
+        'gross_pay_se': hh_income,
+        'gross_paypm': hh_income,
+        'hourly_wage': hourly_wage,
+        'hourly_wage_diff': rng.normal(0, 1, n),
+        'hh_income': hh_income,
+        'hh_income_diff': rng.normal(0, 200, n),
+        'yearly_energy': rng.normal(1500, 400, n).clip(0),
+        'SF_12': SF_12,
+        'SF_12p': rng.normal(50, 9, n).clip(0, 100),
+        'SF_12_diff': rng.normal(0, 5, n),
+        'phealth': rng.integers(1, 6, n),
+        'housing_quality': rng.choice(['Low', 'Medium', 'High'], n),
+        'housing_tenure': rng.integers(1, 7, n),
+        'neighbourhood_safety': rng.integers(1, 4, n),
+        'loneliness': rng.integers(1, 4, n),
+        'financial_situation': rng.integers(1, 6, n),
+        'heating': rng.integers(0, 2, n),
+        'urban': rng.integers(1, 3, n),
+        'ncigs': rng.choice([0, 0, 0, 5, 10, 20], n),
+        'smoker': rng.integers(0, 2, n),
+        'alcohol_spending': rng.choice([0, 0, 10, 50, 100], n),
+        'ndrinks': rng.integers(0, 6, n),
+        'nutrition_quality': rng.normal(20, 5, n),
+        'nutrition_quality_diff': rng.integers(-3, 4, n),
+        'marital_status': rng.choice(['Single', 'Partnered', 'Separated', 'Widowed'], n),
+        'hh_comp': rng.integers(1, 5, n),
+        'hhsize': hhsize,
+        'nkids': nkids.astype(float),
+        'nkids_ind': nkids,
+        'child_ages': child_ages,
+        'labour_state': rng.choice(['Employed', 'PT Employed', 'Retired', 'Student', 'Unemployed', 'Family Care'], n),
+        'S7_labour_state': rng.choice(['FT Employed', 'PT Employed', 'Job Seeking', 'FT Education', 'Family Care',
+                                       'Not Working'], n),
+        'S7_housing_quality': rng.choice(['No to all', 'Yes to some', 'Yes to all'], n),
+        'S7_neighbourhood_safety': rng.choice(['Often', 'Some of the time', 'Hardly ever'], n),
+        'S7_physical_health': rng.integers(1, 6, n),
+        'S7_mental_health': rng.integers(1, 6, n),
+        'equivalent_income': hh_income,
+    })
+    return population
+
+
+def synthetic_replenishing_population(n, start_year, end_year, seed=0):
+    """ Synthetic replenishing population of 16 year olds for each year in [start_year, end_year].
+
+    Parameters
+    ----------
+    n : int
+        Number of new simulants each year.
+    """
+    waves = []
+    for year in range(start_year, end_year + 1):
+        wave = synthetic_population(n, year, seed + year)
+        wave['age'] = 16
+        wave['pidp'] += year * 10 ** 8
+        wave['hidp'] += year * 10 ** 8
+        waves.append(wave)
+    return pd.concat(waves, ignore_index=True)
+
+
+def _levels(current, dependent, default=3):
+    """ Number of levels of an ordinal dependent in current. Used to size stub probability tables."""
+    if dependent in current.columns:
+        return max(current[dependent].nunique(), 2)
+    return default
+
+
+def _uniform_probabilities(current, columns):
+    return pd.DataFrame(1 / len(columns), index=current.index, columns=columns)
+
+
+def _continuous(current, dependent):
+    """ Stub continuous prediction. Last value of the dependent plus some noise, so downstream code sees a realistic
+    spread of values."""
+    if dependent in current.columns:
+        values = pd.to_numeric(current[dependent], errors='coerce').fillna(0).to_numpy(dtype=float)
+    else:
+        values = np.zeros(current.shape[0])
+    return values + np.random.normal(0, 1, current.shape[0])
+
+
+class StubTransitionModels:
+    """ Stand ins for the load_transitions and predict functions of r_utils and native_utils.
+
+    Each predict stub returns an output of the same type and shape as the function it replaces. Use with
+    stub_transition_models.
+    """
+
+    @staticmethod
+    def load_transitions(component, rpy2_modules, path='data/transitions/', cache=None):
+        return component
+
+    @staticmethod
+    def get_model_predictors(model, rpy2_modules=None):
+        return ModelPredictors(['pidp', 'age', 'sex', 'ethnicity', 'region'])
+
+    @staticmethod
+    def predict_next_timestep_ols(model, rpy2_modules, current, dependent):
+        return pd.DataFrame({dependent: _continuous(current, dependent)}, index=current.index)
+
+    @staticmethod
+    def predict_next_timestep_ols_diff(model, rpy2_modules, current, dependent, year):
+        predicted = np.random.normal(0, 1, current.shape[0])
+        return pd.DataFrame({'new_dependent': _continuous(current, dependent) + predicted, 'predicted': predicted},
+                            index=current.index)
+
+    @staticmethod
+    def predict_next_timestep_clm(model, rpy2modules, current, dependent):
+        return _uniform_probabilities(current, list(range(_levels(current, dependent))))
+
+    @staticmethod
+    def predict_nnet(model, rpy2Modules, current, columns):
+        return _uniform_probabilities(current, list(columns))
+
+    @staticmethod
+    def predict_next_timestep_zip(model, rpy2Modules, current, dependent, draws=None):
+        counts = np.random.poisson(5, current.shape[0])
+        return native_utils.zero_inflated_draw(counts, np.full(current.shape[0], 0.5), draws)
+
+    @staticmethod
+    def predict_next_timestep_gee(model, rpy2_modules, current, dependent, noise_std):
+        return pd.DataFrame({dependent: _continuous(current, dependent)}, index=current.index)
+
+    @staticmethod
+    def predict_next_timestep_yj_gaussian_lmm(model, rpy2_modules, current, dependent, reflect, yeo_johnson,
+                                              noise=None):
+        return pd.DataFrame({dependent: _continuous(current, dependent)})
+
+    @staticmethod
+    def predict_next_timestep_yj_gamma_glmm(model, rpy2_modules, current, dependent, reflect, yeo_johnson,
+                                            noise=None):
+        return pd.DataFrame({dependent: _continuous(current, dependent)})
+
+    @staticmethod
+    def predict_next_rf(model, rpy2_modules, current, dependent):
+        return pd.DataFrame({dependent: _continuous(current, dependent)}, index=current.index)
+
+
+@contextmanager
+def stub_transition_models():
+    """ Replace the transition model functions of r_utils and native_utils with StubTransitionModels and skip the R
+    package imports of RunPipeline. Everything is restored on exit."""
+    replaced = []
+    for module in (r_utils, native_utils):
+        for name, stub in vars(StubTransitionModels).items():
+            if isinstance(stub, staticmethod) and hasattr(module, name):
+                replaced.append((module, name, getattr(module, name)))
+                setattr(module, name, stub.__func__)
+    rpy2_modules = RunPipeline.RPY2_MODULES
+    RunPipeline.RPY2_MODULES = {}
+    try:
+        yield
+    finally:
+        for module, name, function in replaced:
+            setattr(module, name, function)
+        RunPipeline.RPY2_MODULES = rpy2_modules
+
+
+def write_synthetic_inputs(benchmark_dir, n, start_year, end_year, seed=0):
+    """ Write a synthetic starting cohort and replenishing population to benchmark_dir in the data/ layout the
+    replenishment modules expect.
+
+    Returns
+    -------
+    input_data_dir, replenishing_dir : str
+    """
+    input_data_dir = os.path.join(benchmark_dir, 'data', 'final_US')
+    replenishing_dir = os.path.join(benchmark_dir, 'data', 'replenishing')
+    os.makedirs(input_data_dir, exist_ok=True)
+    os.makedirs(replenishing_dir, exist_ok=True)
+
+    population = synthetic_population(n, start_year, seed)
+    # Replenishment takes its column list from the 2020 cohort.
+    for year in {start_year, 2020}:
+        population.assign(time=year).to_csv(os.path.join(input_data_dir, f"{year}_US_cohort.csv"), index=False)
+    replenishing = synthetic_replenishing_population(max(n // 100, 1), start_year, end_year, seed)
+    replenishing.to_csv(os.path.join(replenishing_dir, "replenishing_pop_2015-2070.csv"), index=False)
+    return input_data_dir, replenishing_dir
+
+
+def benchmark_config(config_file, components, n, input_data_dir, replenishing_dir, seed=0):
+    """ Read config_file and point it at the synthetic inputs.
+
+    Paths to persistent data and transition models are made absolute as the benchmark runs from its own directory.
+    """
+    config = utils.read_config(config_file)
+    config.update({
+        'components': list(components),
+        'input_data_dir': input_data_dir,
+        'replenishing_dir': replenishing_dir,
+        'persistent_data_dir': os.path.abspath(config.persistent_data_dir),
+        'transition_dir': os.path.abspath(config.transition_dir),
+        'population': {'population_size': n},
+        'randomness': {'random_seed': seed},
+        'profile': True,
+    })
+    return config
+
+
+def time_year_step(config_file, components, n, input_data_dir, replenishing_dir, seed=0):
+    """ Time the setup and a single year step of a simulation of components.
+
+    Returns
+    -------
+    setup_time, step_time : float
+        Wall time in seconds.
+    profile : pd.DataFrame
+        Time step profile of each module (see profiling.TimeStepProfiler).
+    """
+    config = benchmark_config(config_file, components, n, input_data_dir, replenishing_dir, seed)
+    start = perf_counter()
+    simulation, _ = RunPipeline.setup_simulation(config)
+    setup_time = perf_counter() - start
+
+    start = perf_counter()
+    simulation.run_for(duration=pd.Timedelta(days=config.time.step_size))
+    step_time = perf_counter() - start
+    return setup_time, step_time, simulation._data.load("time_step_profiler").to_frame()
+
+
+def get_git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def get_versions():
+    """ Versions of the packages that matter most for throughput."""
+    try:
+        import vivarium
+        vivarium_version = vivarium.__version__
+    except ImportError:
+        vivarium_version = ''
+    return {'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'vivarium': vivarium_version}
+
+
+def run_benchmark(config_file, sizes, components=None, full_step=True, replenishment='Replenishment()', seed=0):
+    """ Time every component on its own and the full config as a year step for each population size.
+
+    Parameters
+    ----------
+    config_file : str
+        Config to take time, rate table files and the full component list from.
+    sizes : Iterable[int]
+        Population sizes to benchmark.
+    components : Iterable[str]
+        (Optional) Components to time on their own. Defaults to everything in components_map and
+        SIPHER7_components_map.
+    full_step : bool
+        Also time a year step of all components in config_file together.
+    replenishment : str
+        Replenishment component used to load the synthetic population in component benchmarks.
+    seed : int
+        Seed for the synthetic populations and simulations.
+    Returns
+    -------
+    results : pd.DataFrame
+        One row per population size and component with columns HISTORY_COLUMNS.
+    """
+    if components is None:
+        components = list(RunPipeline.components_map) + list(RunPipeline.SIPHER7_components_map)
+    config = utils.read_config(config_file)
+    start_year, end_year = config.time.start.year, config.time.end.year
+    run_info = {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+                'git_revision': get_git_revision(),
+                'config': config_file,
+                **get_versions()}
+    config_file = os.path.abspath(config_file)
+    cwd = os.getcwd()
+
+    records = []
+    for n in sizes:
+        # Each size gets its own scratch directory. Replenishment reads data/final_US relative to the working
+        # directory so the benchmark runs from there.
+        with tempfile.TemporaryDirectory(prefix='minos_benchmark_') as benchmark_dir, stub_transition_models():
+            input_data_dir, replenishing_dir = write_synthetic_inputs(benchmark_dir, n, start_year, end_year, seed)
+            os.chdir(benchmark_dir)
+            try:
+                benchmarks = [('component', component, [replenishment, component]) for component in components
+                              if component != replenishment]
+                if full_step:
+                    benchmarks.append(('full_year_step', 'full_year_step', list(config.components)))
+
+                for scope, name, benchmark_components in benchmarks:
+                    record = {**run_info, 'population_size': n, 'scope': scope, 'component': name, 'error': ''}
+                    try:
+                        setup_time, step_time, profile = time_year_step(config_file, benchmark_components, n,
+                                                                        input_data_dir, replenishing_dir, seed)
+                        if scope == 'component':
+                            profile = profile[profile['module'] == name]
+                        record.update({'setup_time': setup_time,
+                                       'step_time': step_time,
+                                       'module_time': profile['wall_time'].sum(),
+                                       'rows': profile['rows'].max(),
+                                       'rss_change_mb': profile['rss_change_mb'].sum()})
+                    except Exception as error:
+                        # Modules that need inputs the benchmark doesn't provide are recorded and skipped.
+                        record['error'] = f"{type(error).__name__}: {error}".replace('\n', ' ')
+                    print(f"{n} {name}: {record.get('module_time', np.nan):.3f}s {record['error']}")
+                    records.append(record)
+            finally:
+                os.chdir(cwd)
+                utils.CSV_CACHE.clear()
+    return pd.DataFrame(records, columns=HISTORY_COLUMNS)
+
+
+def append_history(results, history_file):
+    """ Append benchmark results to the history csv, creating it if needed."""
+    os.makedirs(os.path.dirname(os.path.abspath(history_file)), exist_ok=True)
+    results.to_csv(history_file, mode='a', index=False, header=not os.path.exists(history_file))
+
+
+def compare_history(history_file, baseline=None):
+    """ Module time of each component and population size for every benchmarked revision in the history file.
+
+    Parameters
+    ----------
+    history_file : str
+        History csv written by append_history.
+    baseline : str
+        (Optional) Git revision to divide by, giving relative times. Defaults to absolute times in seconds.
+    Returns
+    -------
+    comparison : pd.DataFrame
+        Rows for each population size, scope and component. A column for each revision (oldest first).
+    """
+    history = pd.read_csv(history_file)
+    history['revision'] = history['git_revision'].astype(str) + ' ' + history['timestamp'].astype(str)
+    history['time'] = history['module_time'].where(history['scope'] == 'component', history['step_time'])
+    comparison = history.pivot_table(index=['population_size', 'scope', 'component'], columns='revision',
+                                     values='time', aggfunc='last')
+    if baseline is not None:
+        baseline_columns = [column for column in comparison.columns if column.startswith(f"{baseline} ")]
+        comparison = comparison.div(comparison[baseline_columns[-1]], axis=0)
+    return comparison
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Minos modules on synthetic populations.")
+    parser.add_argument("-c", "--config", type=str, dest='config', default="config/default.yaml",
+                        help="Model config file (YAML). Provides time, rate tables and the full year step components.")
+    parser.add_argument("-n", "--sizes", type=int, nargs='+', dest='sizes', default=[10000, 100000, 1000000],
+                        help="Population sizes to benchmark.")
+    parser.add_argument("-m", "--components", type=str, nargs='+', dest='components', default=None,
+                        help="(Optional) Components to benchmark on their own e.g. 'Ageing()'. Defaults to all of "
+                             "components_map and SIPHER7_components_map.")
+    parser.add_argument("--no_full_step", action='store_false', dest='full_step',
+                        help="Only benchmark components on their own.")
+    parser.add_argument("-o", "--history", type=str, dest='history', default="output/benchmark/benchmark_history.csv",
+                        help="History csv to append results to.")
+    parser.add_argument("--compare", type=str, dest='compare', default=None, nargs='?', const='',
+                        help="Print the history compared to this git revision (or absolute times if empty) and exit.")
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        pd.set_option('display.max_rows', None, 'display.width', 200)
+        print(compare_history(args.history, args.compare or None))
+        sys.exit()
+
+    results = run_benchmark(args.config, args.sizes, args.components, args.full_step)
+    append_history(results, args.history)
+    print(f"Appended {len(results)} benchmark results to {args.history}")
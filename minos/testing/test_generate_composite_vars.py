@@ -0,0 +1,63 @@
+"""
+Equivalence test for the grouped calculate_children in generate_composite_vars against the per pidp loop it replaced.
+
+Run with python -m pytest minos/testing/test_generate_composite_vars.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from minos.data_generation.generate_composite_vars import calculate_children, PARITY_MAX_DEFAULT
+
+
+def calculate_children_loop(data, parity_max=PARITY_MAX_DEFAULT):
+    """ calculate_children as it was before vectorising. One filter of the whole frame per female pidp."""
+    pidps = data[data['sex'] == 'Female']['pidp'].unique()
+    data['nkids_ind'] = data['nkids_ind_raw']
+    for pidp in pidps:
+        subframe = data[data['pidp'] == pidp][['pidp', 'nkids_ind_raw', 'nkids_ind_new', 'time']]
+        if (2 in subframe['nkids_ind_new'].values) and not (subframe['nkids_ind_raw'].lt(0).any()):
+            data.loc[subframe.index, 'nkids_ind'] = subframe['nkids_ind_raw'] + (subframe['nkids_ind_new'] == 2).astype(int).cumsum()
+    data.loc[(data['nkids_ind'] > parity_max) & (data['sex'] == "Female"), 'nkids_ind'] = parity_max
+    data.drop(labels=['nkids_ind_raw', 'nkids_ind_new'], axis=1, inplace=True)
+    return data
+
+
+def synthetic_panel(n=500, years=range(2009, 2020), seed=0):
+    """ Multi-wave panel in the layout of US_utils.load_multiple_data (waves stacked by year, unique index).
+
+    Covers invalid (negative) counts, pidps with no pregnancies, pidps whose sex changes between waves and counts
+    above the parity maximum.
+    """
+    rng = np.random.default_rng(seed)
+    sex = pd.Series(rng.choice(['Female', 'Male'], n), index=np.arange(n))
+    waves = []
+    for year in years:
+        pidps = np.sort(rng.choice(n, size=int(n * 0.8), replace=False))
+        wave_sex = sex[pidps].to_numpy().copy()
+        # a few people have a different sex recorded in some waves.
+        switched = rng.random(len(pidps)) < 0.05
+        wave_sex[switched] = np.where(wave_sex[switched] == 'Female', 'Male', 'Female')
+        waves.append(pd.DataFrame({'pidp': pidps,
+                                   'time': year,
+                                   'sex': wave_sex,
+                                   'nkids_ind_raw': rng.choice([-9, -8, 0, 1, 2, 3, 9, 12], len(pidps),
+                                                               p=[0.02, 0.01, 0.4, 0.2, 0.2, 0.1, 0.05, 0.02]),
+                                   'nkids_ind_new': rng.choice([-8, 1, 2], len(pidps), p=[0.1, 0.75, 0.15])}))
+    return pd.concat(waves).reset_index(drop=True)
+
+
+def test_calculate_children_matches_loop():
+    data = synthetic_panel()
+    pregnancies = (data['nkids_ind_new'] == 2).groupby(data['pidp']).any()
+    invalid = data['nkids_ind_raw'].lt(0).groupby(data['pidp']).any()
+    sexes = data.groupby('pidp')['sex'].nunique()
+    # the panel must cover each case the loop handles differently.
+    assert (~pregnancies).any()
+    assert (pregnancies & invalid).any()
+    assert (pregnancies & ~invalid).any()
+    assert (sexes > 1).any()
+
+    expected = calculate_children_loop(data.copy())
+    result = calculate_children(data.copy())
+    pd.testing.assert_frame_equal(result, expected)
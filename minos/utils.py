@@ -6,6 +6,8 @@ import argparse
 import yaml
 import numpy as np
 import os
+import glob
+import hashlib
 from os.path import dirname as up
 import pandas as pd
 import datetime
@@ -133,6 +135,214 @@ def get_time():
     return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
+# File extensions for each supported population output format. Set with output_format in the config.
+OUTPUT_FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+
+
+def encode_categoricals(data):
+    """ Store string columns (alive, sex, region, S7_labour_state etc.) as categoricals.
+
+    Columnar formats store categoricals as dictionary encoded integer codes rather than repeating every string.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Population to encode.
+
+    Returns
+    -------
+    data : pd.DataFrame
+        Copy of data with object columns converted to categoricals.
+    """
+    data = data.copy()
+    for column in data.select_dtypes(include=['object', 'string']).columns:
+        if pd.api.types.infer_dtype(data[column], skipna=True) not in ('string', 'empty'):
+            # mixed types (e.g. strings and numbers) need a single type for the category dictionary.
+            data[column] = data[column].where(data[column].isna(), data[column].astype(str))
+        data[column] = data[column].astype('category')
+    return data
+
+
+def write_population(data, file_path, output_format='csv'):
+    """ Save a population frame in the given output format.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Population to save.
+    file_path : str
+        Path to save to. The extension is replaced to match output_format.
+    output_format : str
+        One of csv, parquet or feather. csv is kept for compatibility with older outputs and scripts.
+
+    Returns
+    -------
+    file_path : str
+        Path the population was saved to.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format}. Please use one of {list(OUTPUT_FORMATS)}.")
+    file_path = os.path.splitext(file_path)[0] + OUTPUT_FORMATS[output_format]
+
+    if output_format == 'csv':
+        data.to_csv(file_path)
+    elif output_format == 'parquet':
+        encode_categoricals(data).to_parquet(file_path, compression='zstd')
+    elif output_format == 'feather':
+        # feather can't store a non default index so keep it as a column like to_csv does.
+        encode_categoricals(data).reset_index().to_feather(file_path, compression='zstd')
+    return file_path
+
+
+def read_population(file_path, columns=None):
+    """ Load a population frame saved by write_population. The format is taken from the file extension.
+
+    Parameters
+    ----------
+    file_path : str
+        Population file to load.
+    columns : list
+        (Optional) Subset of columns to load. Columnar formats only read these columns from disk.
+
+    Returns
+    -------
+    data : pd.DataFrame
+    """
+    extension = os.path.splitext(file_path)[1]
+    if extension == '.parquet':
+        return pd.read_parquet(file_path, columns=columns)
+    elif extension == '.feather':
+        return pd.read_feather(file_path, columns=columns)
+    elif extension == '.csv':
+        return pd.read_csv(file_path, usecols=columns, low_memory=False)
+    raise ValueError(f"Unknown population file type {extension} for {file_path}. "
+                     f"Expected one of {list(OUTPUT_FORMATS.values())}.")
+
+
+def iter_population(file_path, columns=None, chunksize=None):
+    """ Load a population file saved by write_population in chunks of rows.
+
+    csv files are read with pd.read_csv(chunksize) and parquet files a row batch at a time so only one chunk is in
+    memory at once. feather files are read whole.
+
+    Parameters
+    ----------
+    file_path : str
+        Population file to load.
+    columns : list
+        (Optional) Subset of columns to load.
+    chunksize : int
+        (Optional) Number of rows per chunk. Defaults to reading the whole file as one chunk.
+
+    Yields
+    ------
+    chunk : pd.DataFrame
+    """
+    extension = os.path.splitext(file_path)[1]
+    if chunksize is None or extension == '.feather':
+        yield read_population(file_path, columns)
+    elif extension == '.parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    elif extension == '.csv':
+        with pd.read_csv(file_path, usecols=columns, chunksize=chunksize, low_memory=False) as reader:
+            for chunk in reader:
+                yield chunk
+    else:
+        raise ValueError(f"Unknown population file type {extension} for {file_path}. "
+                         f"Expected one of {list(OUTPUT_FORMATS.values())}.")
+
+
+def get_population_files(source, year):
+    """ Get all population files in source for a given year in any output format.
+
+    Parameters
+    ----------
+    source : str
+        Directory containing MINOS output.
+    year : int
+        Year of output files.
+
+    Returns
+    -------
+    files : list
+    """
+    files = []
+    for extension in OUTPUT_FORMATS.values():
+        files += glob.glob(os.path.join(source, f"*{year}{extension}"))
+    return sorted(files)
+
+
+# Frames read by read_csv_cached. Keyed on resolved path, modification time and read_csv arguments.
+CSV_CACHE = {}
+
+
+def read_csv_cached(file_path, copy=True, **kwargs):
+    """ pd.read_csv for input files that are read by every run (starting cohorts, rate tables etc.).
+
+    Each file is only parsed once per process. Batch runs (scripts/run.py --batch) read them before forking workers so
+    every worker shares the parsed frames.
+
+    Parameters
+    ----------
+    file_path : str
+        csv file to read.
+    copy : bool
+        Return a copy of the cached frame so callers can modify it freely. Only use False for read only access.
+    kwargs
+        Passed to pd.read_csv.
+
+    Returns
+    -------
+    data : pd.DataFrame
+    """
+    path = os.path.realpath(file_path)
+    key = (path, os.stat(path).st_mtime_ns, repr(sorted(kwargs.items())))
+    if key not in CSV_CACHE:
+        CSV_CACHE[key] = pd.read_csv(path, **kwargs)
+    if copy:
+        return CSV_CACHE[key].copy()
+    return CSV_CACHE[key]
+
+
+def hash_file(file_name, block_size=2 ** 20):
+    """ blake2b hash of a file's contents."""
+    file_hash = hashlib.blake2b(digest_size=16)
+    with open(file_name, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def read_csv_partitioned(file_path, column='time', **kwargs):
+    """ Read a csv once per process and split it into a frame for each value of column.
+
+    Used for the replenishing populations, so each year's cohort is a dictionary lookup rather than a filter over
+    every year in the file.
+
+    Parameters
+    ----------
+    file_path : str
+        csv file to read.
+    column : str
+        Column to partition the data on. Defaults to time (year).
+    kwargs
+        Passed to pd.read_csv.
+
+    Returns
+    -------
+    partitions : dict
+        Frames for each value of column. These are shared so copy any frame before modifying it.
+    """
+    path = os.path.realpath(file_path)
+    key = (path, os.stat(path).st_mtime_ns, repr(sorted(kwargs.items())), column)
+    if key not in CSV_CACHE:
+        data = pd.read_csv(path, **kwargs)
+        CSV_CACHE[key] = {value: partition for value, partition in data.groupby(column, sort=False)}
+    return CSV_CACHE[key]
+
+
 def make_uniform_pop_data(age_bin_midpoint=False):
     age_bins = [(n, n + 5) for n in range(0, 100, 5)]
     sexes = ('Male', 'Female')
@@ -9,12 +9,19 @@ import argparse
 import yaml
 import logging
 import datetime
+import multiprocessing
+from itertools import repeat
 
-from minos.minosPipeline.RunPipeline import RunPipeline
+import numpy as np
 
+from minos.minosPipeline.RunPipeline import RunPipeline, setup_simulation
+
+# Transition model cache shared by every run in a batch. Filled before batch workers are forked.
+BATCH_TRANSITION_MODEL_CACHE = None
 
-def run(args):
-    """
+
+def setup_run(args):
+    """ Read the config, create output directories and start logging for a model run.
 
     Parameters
     ----------
@@ -22,8 +29,8 @@ def run(args):
        Command line arguments of parameters for the model run
     Returns
     -------
-    simulation : Vivarium.Simulation.InteractiveContext
-        Simulation object after running for n timesteps
+    config : vivarium.config_tree.ConfigTree
+        Config for the run.
     """
 
     ############## READ CONFIG AND ARGS ##############
@@ -52,7 +59,7 @@ def run(args):
     year_start = config['time']['start']['year']
 
     # start_population_size (use size of prepared input population in start year)
-    start_population_size = pd.read_csv(f"{config['input_data_dir']}/{year_start}_US_cohort.csv").shape[0]
+    start_population_size = utils.read_csv_cached(f"{config['input_data_dir']}/{year_start}_US_cohort.csv").shape[0]
     print(f'Start Population Size: {start_population_size}')
 
 
@@ -104,6 +111,13 @@ def run(args):
             'run_ID': args.runID,
             'run_ID_names': 'run_id'
         }, source=str(Path(__file__).resolve()))
+    # Each run ID is a separate replicate so it needs its own random seed. Runs sharing a process (--batch) always do.
+    # All randomness comes from vivarium's CRN streams (transitions, transition noise, zero-inflated draws), so
+    # the seed alone decides how replicates differ.
+    if args.runID or getattr(args, 'batch', None):
+        add_to_config.update({
+            'randomness': {'random_seed': args.runID or 0},
+        })
 
     # Now update the Vivarium ConfigTree object
     config.update(add_to_config)
@@ -146,20 +160,93 @@ def run(args):
     logging.info(f"Running with configuration file: {args.config}")
     logging.info(f"Output directory: {run_output_dir}")
     logging.info(f"Beginning a {scenario} simulation.")
+    if 'randomness' in config.keys():
+        logging.info(f"Random seed: {config['randomness']['random_seed']}")
     if args.runID:
         logging.info(f"This is run {args.runID} of a batch run.")
     logging.info(f"Beginning simulation in {config.time.start.year}, running for {config.time.num_years} years until {config.time.end.year}")
     logging.info("Pipeline start...")
     #TODO: Add more here.
 
+    return config
+
+
+def run(args):
+    """
+
+    Parameters
+    ----------
+    args : ArgumentParser.Namespace
+       Command line arguments of parameters for the model run
+    Returns
+    -------
+    simulation : Vivarium.Simulation.InteractiveContext
+        Simulation object after running for n timesteps
+    """
+    config = setup_run(args)
+
     ############## RUN PIPELINE ##############
     # Different call for intervention or cross_validation
     if args.intervention:
-        RunPipeline(config, intervention=args.intervention)
+        simulation = RunPipeline(config, intervention=args.intervention,
+                                 transition_model_cache=BATCH_TRANSITION_MODEL_CACHE)
     else:
-        RunPipeline(config)
+        simulation = RunPipeline(config, transition_model_cache=BATCH_TRANSITION_MODEL_CACHE)
 
     print('Finished running the full simulation')
+    return simulation
+
+
+def run_batch_member(args, run_id):
+    """ Run one iteration of a batch inside a batch worker process.
+
+    Parameters
+    ----------
+    args : ArgumentParser.Namespace
+       Command line arguments for the batch.
+    run_id : int
+        Run ID of this iteration. Used in output file names and as the random seed.
+    """
+    run_args = argparse.Namespace(**vars(args))
+    run_args.runID = run_id
+    # Forked workers start with identical numpy random states.
+    np.random.seed(run_id)
+    run(run_args)
+    return run_id
+
+
+def run_batch(args):
+    """ Run args.batch iterations of the model in args.workers processes.
+
+    The expensive setup that is the same for every iteration (R package imports, rate tables, input cohort,
+    replenishment population and transition models loaded at setup) is done once here. Worker processes are then forked
+    so they inherit it all rather than repeating it for every run ID as separate run.py calls do.
+
+    Parameters
+    ----------
+    args : ArgumentParser.Namespace
+       Command line arguments for the batch.
+    """
+    global BATCH_TRANSITION_MODEL_CACHE
+
+    # Every run in the batch writes to the same output directory.
+    if not args.runtime:
+        args.runtime = str(datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S"))
+
+    # Build one simulation up to the end of setup. This reads everything the runs share into process level caches.
+    setup_args = argparse.Namespace(**vars(args))
+    setup_args.runID = None
+    config = setup_run(setup_args)
+    logging.info(f"Loading shared setup for a batch of {args.batch} runs with {args.workers} workers.")
+    simulation, BATCH_TRANSITION_MODEL_CACHE = setup_simulation(config, args.intervention)
+    del simulation
+
+    run_ids = range(args.runID or 1, (args.runID or 1) + args.batch)
+    with multiprocessing.get_context('fork').Pool(args.workers) as pool:
+        for run_id in pool.starmap(run_batch_member, zip(repeat(args), run_ids), chunksize=1):
+            print(f"Finished batch run {run_id}")
+
+    print(f'Finished running {args.batch} simulations')
 
 
 # This __main__ function is used to run this script in a console. See daedalus github for examples.
@@ -191,7 +278,16 @@ if __name__ == "__main__":
                                    - livingWageIntervention
                                    - energyDownlift""")
 
+    parser.add_argument("-b", "--batch", type=int, dest="batch", default=None,
+                        help="(Optional) Run a batch of this many runs in one call, sharing setup between them. Run IDs "
+                             "start from --run_id (default 1).")
+    parser.add_argument("-w", "--workers", type=int, dest="workers", default=1,
+                        help="(Optional) Number of worker processes for a --batch run.")
+
     args = parser.parse_args()
     configuration_file = args.config
 
-    run(args)
+    if args.batch:
+        run_batch(args)
+    else:
+        run(args)